@@ -0,0 +1,138 @@
+import asyncio
+import os
+import re
+
+from fastapi.responses import JSONResponse
+
+from app.database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+from app.metrics import register_metrics
+
+ADMISSION_HEAVY_LIMIT = int(os.getenv("ADMISSION_HEAVY_LIMIT") or max(1, DB_POOL_SIZE // 2))
+ADMISSION_CHEAP_LIMIT = int(
+    os.getenv("ADMISSION_CHEAP_LIMIT")
+    or max(1, DB_POOL_SIZE + DB_MAX_OVERFLOW - ADMISSION_HEAVY_LIMIT)
+)
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "50"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+HEAVY_PATHS = [
+    re.compile(pattern)
+    for pattern in (
+        r"^/api/ref/counterparties/summary$",
+        r"^/api/ref/counterparties/search$",
+        r"^/api/ref/objects/[^/]+/structure$",
+        r"^/api/ref/objects/structures$",
+        r"^/api/ref/employees/internal$",
+        r"^/api/ref/batch$",
+        r"^/api/ref/snapshot$",
+    )
+]
+EXEMPT_PATHS = frozenset({"/ready", "/metrics", "/slow-queries"})
+
+
+class RouteClass:
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    async def acquire(self) -> bool:
+        semaphore = self.semaphore
+        if semaphore.locked():
+            if self.waiting >= self.queue_size:
+                self.rejected_queue_full += 1
+                return False
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.timeout)
+            except TimeoutError:
+                self.rejected_timeout += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            await semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+        self.semaphore.release()
+
+    def as_dict(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+route_classes = {
+    "cheap": RouteClass(
+        "cheap", ADMISSION_CHEAP_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+    ),
+    "heavy": RouteClass(
+        "heavy", ADMISSION_HEAVY_LIMIT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+    ),
+}
+
+register_metrics(
+    "admission", lambda: {name: item.as_dict() for name, item in route_classes.items()}
+)
+
+
+def classify(path: str) -> RouteClass:
+    if any(pattern.match(path) for pattern in HEAVY_PATHS):
+        return route_classes["heavy"]
+    return route_classes["cheap"]
+
+
+class AdmissionControl:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["path"])
+        if route_class.limit <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        if not await route_class.acquire():
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Сервис перегружен, повторите запрос позже"},
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_class.release()
@@ -1,13 +1,71 @@
-from fastapi import FastAPI
+import os
 
-from app.database import init_db
-from app.routes import main_router
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 
-init_db()
+from app.admission import AdmissionControl
+from app.compression import GZIP_LEVEL, GZIP_MINIMUM_SIZE
+from app.database import EDGE_DATABASE
+from app.edge import EdgeMode
+from app.lifespan import FirstRequestTimer, lifespan, startup_state
+from app.metrics import collect_metrics, metrics_authorized
+from app.profiling import ProfilingMiddleware, authorized, profiler
+from app.routes import main_router
+from app.slow_queries import RouteContext, slow_query_log
+from app.traffic import TRAFFIC_CAPTURE_PATH, TrafficCapture
 
 app = FastAPI(
     title="ReferenceService",
-    debug=True,
+    debug=os.getenv("APP_DEBUG") == "1",
+    lifespan=lifespan,
 )
 
+app.add_middleware(RouteContext)
+app.add_middleware(FirstRequestTimer)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_LEVEL)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(AdmissionControl)
+if EDGE_DATABASE:
+    app.add_middleware(EdgeMode)
+if TRAFFIC_CAPTURE_PATH:
+    app.add_middleware(TrafficCapture)
 app.include_router(main_router)
+
+
+def require_token(x_profile: str | None = Header(default=None)) -> None:
+    if not authorized(x_profile):
+        raise HTTPException(status_code=403, detail="Требуется токен X-Profile")
+
+
+def require_metrics_token(authorization: str | None = Header(default=None)) -> None:
+    if not metrics_authorized(authorization):
+        raise HTTPException(status_code=403, detail="Требуется токен METRICS_TOKEN")
+
+
+@app.get("/ready", include_in_schema=False)
+def ready():
+    return JSONResponse(
+        status_code=200 if startup_state.ready else 503,
+        content=startup_state.as_dict(),
+    )
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def metrics():
+    return collect_metrics()
+
+
+@app.get("/slow-queries", include_in_schema=False, dependencies=[Depends(require_token)])
+def slow_queries():
+    return slow_query_log.report()
+
+
+@app.get("/profiles/{profile_id}", include_in_schema=False)
+def get_profile(profile_id: str, x_profile: str | None = Header(default=None)):
+    if not authorized(x_profile):
+        raise HTTPException(status_code=403, detail="Профилирование недоступно")
+    report = profiler.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return report
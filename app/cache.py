@@ -0,0 +1,665 @@
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy import Table, event
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import visitors
+
+from app.compression import EncodedBody
+from app.database import replica_router
+from app.lifespan import register_warmup
+from app.metrics import register_metrics
+from app.single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "sqlite")
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_WARMUP = os.getenv("RESPONSE_CACHE_WARMUP", "1") == "1"
+SHARED_BACKENDS = frozenset({"sqlite", "redis"})
+
+SWR_REFRESH_WORKERS = int(os.getenv("SWR_REFRESH_WORKERS", "2"))
+SWR_SCHEDULER_INTERVAL = float(os.getenv("SWR_SCHEDULER_INTERVAL", "5"))
+SWR_REFRESH_AHEAD = float(os.getenv("SWR_REFRESH_AHEAD", "0.8"))
+SWR_HOT_SECONDS = float(os.getenv("SWR_HOT_SECONDS", "300"))
+SWR_HOT_KEYS = int(os.getenv("SWR_HOT_KEYS", "100"))
+
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2000"))
+QUERY_CACHE_MAX_ROWS = int(os.getenv("QUERY_CACHE_MAX_ROWS", "5000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+
+_TAGS_KEY = "response_cache_tags"
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    def versions(self, tags: Iterable[str]) -> tuple[int, ...]: ...
+
+    @abstractmethod
+    def set(
+        self, key: str, value: bytes, ttl: float, tags: Iterable[str], versions: tuple[int, ...]
+    ) -> bool: ...
+
+    @abstractmethod
+    def invalidate(self, tags: Iterable[str]) -> None: ...
+
+
+class NullBackend(CacheBackend):
+    def get(self, key: str) -> bytes | None:
+        return None
+
+    def versions(self, tags: Iterable[str]) -> tuple[int, ...]:
+        return ()
+
+    def set(self, key, value, ttl, tags, versions) -> bool:
+        return False
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, bytes, tuple[str, ...]]] = OrderedDict()
+        self._keys_by_tag: dict[str, set[str]] = {}
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def versions(self, tags: Iterable[str]) -> tuple[int, ...]:
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def set(self, key, value, ttl, tags, versions) -> bool:
+        tags = tuple(tags)
+        with self._lock:
+            if tuple(self._versions.get(tag, 0) for tag in tags) != versions:
+                return False
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return True
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+                for key in self._keys_by_tag.pop(tag, ()):
+                    self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+
+
+class SQLiteBackend(CacheBackend):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS cache_entries "
+        "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT NOT NULL, key TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_cache_tags_tag ON cache_tags (tag)",
+        "CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key)",
+        "CREATE TABLE IF NOT EXISTS cache_versions (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+    )
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        conn = self._connect()
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> bytes | None:
+        query = "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?"
+        row = self._connect().execute(query, (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _versions(self, conn: sqlite3.Connection, tags: tuple[str, ...]) -> tuple[int, ...]:
+        if not tags:
+            return ()
+        rows = dict(
+            conn.execute(
+                f"SELECT tag, version FROM cache_versions WHERE tag IN ({','.join('?' * len(tags))})",
+                tags,
+            ).fetchall()
+        )
+        return tuple(rows.get(tag, 0) for tag in tags)
+
+    def versions(self, tags: Iterable[str]) -> tuple[int, ...]:
+        return self._versions(self._connect(), tuple(tags))
+
+    def set(self, key, value, ttl, tags, versions) -> bool:
+        tags = tuple(tags)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._versions(conn, tags) != versions:
+                return False
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            )
+            conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+            conn.executemany(
+                "INSERT INTO cache_tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags]
+            )
+            self._evict(conn, now)
+            return True
+        finally:
+            conn.execute("COMMIT")
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        tags = tuple(tags)
+        if not tags:
+            return
+        placeholders = ",".join("?" * len(tags))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO cache_versions (tag, version) VALUES (?, 1) "
+                "ON CONFLICT (tag) DO UPDATE SET version = version + 1",
+                [(tag,) for tag in tags],
+            )
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key IN "
+                f"(SELECT key FROM cache_tags WHERE tag IN ({placeholders}))",
+                tags,
+            )
+            conn.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)")
+        finally:
+            conn.execute("COMMIT")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        count = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+        excess = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key IN "
+                "(SELECT key FROM cache_entries ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            )
+        conn.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)")
+
+
+class RedisBackend(CacheBackend):
+    def __init__(self, url: str) -> None:
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(f"cache:{key}")
+
+    def versions(self, tags: Iterable[str]) -> tuple[int, ...]:
+        tags = tuple(tags)
+        if not tags:
+            return ()
+        values = self.client.mget([f"cache-version:{tag}" for tag in tags])
+        return tuple(int(value or 0) for value in values)
+
+    def set(self, key, value, ttl, tags, versions) -> bool:
+        tags = tuple(tags)
+        if self.versions(tags) != versions:
+            return False
+        pipeline = self.client.pipeline()
+        pipeline.set(f"cache:{key}", value, px=int(ttl * 1000))
+        for tag in tags:
+            pipeline.sadd(f"cache-tag:{tag}", key)
+        pipeline.execute()
+        return True
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            pipeline = self.client.pipeline()
+            pipeline.incr(f"cache-version:{tag}")
+            pipeline.smembers(f"cache-tag:{tag}")
+            pipeline.delete(f"cache-tag:{tag}")
+            _, keys, _ = pipeline.execute()
+            if keys:
+                self.client.delete(*(b"cache:" + key for key in keys))
+
+
+def create_backend(name: str, url: str) -> CacheBackend:
+    if name == "memory":
+        return MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES)
+    if name == "sqlite":
+        return SQLiteBackend(url or "response_cache.db", RESPONSE_CACHE_MAX_ENTRIES)
+    if name == "redis":
+        return RedisBackend(url or "redis://localhost:6379/0")
+    return NullBackend()
+
+
+response_cache = create_backend(RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_URL)
+
+
+class Freshness:
+    def __init__(self, fresh: float, max_stale: float) -> None:
+        self.fresh = fresh
+        self.max_stale = max_stale
+
+    @classmethod
+    def from_env(cls, name: str, fresh: float, max_stale: float) -> "Freshness":
+        return cls(
+            float(os.getenv(f"SWR_{name}_FRESH", fresh)),
+            float(os.getenv(f"SWR_{name}_MAX_STALE", max_stale)),
+        )
+
+    @property
+    def ttl(self) -> float:
+        return self.fresh + self.max_stale
+
+
+def _pack(body: EncodedBody, stored_at: float) -> bytes:
+    return b"t" + struct.pack("!d", stored_at) + body.dumps()
+
+
+def _unpack(data: bytes) -> tuple[float, EncodedBody] | None:
+    if data[:1] != b"t":
+        return None
+    return struct.unpack("!d", data[1:9])[0], EncodedBody.loads(data[9:])
+
+
+def _store(
+    key: str, body: EncodedBody, tags: tuple[str, ...], versions: tuple[int, ...], ttl: float
+) -> None:
+    try:
+        response_cache.set(key, _pack(body, time.time()), ttl, tags, versions)
+    except Exception as exc:
+        logger.warning("Не удалось сохранить ответ в кэш: %s", exc)
+
+
+class HotKey:
+    __slots__ = ("freshness", "last_access", "refresh", "tags")
+
+    def __init__(
+        self, tags: tuple[str, ...], freshness: Freshness, refresh: Callable[[], object]
+    ) -> None:
+        self.tags = tags
+        self.freshness = freshness
+        self.refresh = refresh
+        self.last_access = time.time()
+
+
+class Revalidator:
+    def __init__(self) -> None:
+        self.hot_keys: OrderedDict[str, HotKey] = OrderedDict()
+        self.refreshed = 0
+        self.failed = 0
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+
+    def touch(
+        self,
+        key: str,
+        tags: tuple[str, ...],
+        freshness: Freshness,
+        refresh: Callable[[], object],
+    ) -> None:
+        with self._lock:
+            self.hot_keys[key] = HotKey(tags, freshness, refresh)
+            self.hot_keys.move_to_end(key)
+            while len(self.hot_keys) > SWR_HOT_KEYS:
+                self.hot_keys.popitem(last=False)
+
+    def schedule(self, key: str) -> None:
+        with self._lock:
+            hot = self.hot_keys.get(key)
+            if hot is None or key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=SWR_REFRESH_WORKERS, thread_name_prefix="swr"
+                )
+        self._executor.submit(self._refresh, key, hot)
+
+    def _refresh(self, key: str, hot: HotKey) -> None:
+        try:
+            versions = response_cache.versions(hot.tags)
+            body = EncodedBody.from_content(hot.refresh())
+            _store(key, body, hot.tags, versions, hot.freshness.ttl)
+            self.refreshed += 1
+        except Exception as exc:
+            self.failed += 1
+            logger.warning("Фоновое обновление %s не удалось: %s", key, exc)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def tick(self) -> None:
+        now = time.time()
+        with self._lock:
+            items = list(self.hot_keys.items())
+        for key, hot in items:
+            if now - hot.last_access > SWR_HOT_SECONDS:
+                with self._lock:
+                    if self.hot_keys.get(key) is hot:
+                        del self.hot_keys[key]
+                continue
+            try:
+                entry = _unpack(response_cache.get(key) or b"")
+            except Exception:
+                continue
+            if entry is None or now - entry[0] >= hot.freshness.fresh * SWR_REFRESH_AHEAD:
+                self.schedule(key)
+
+    def start(self) -> None:
+        if self._thread is not None or SWR_SCHEDULER_INTERVAL <= 0:
+            return
+
+        def run() -> None:
+            while True:
+                time.sleep(SWR_SCHEDULER_INTERVAL)
+                try:
+                    self.tick()
+                except Exception as exc:
+                    logger.warning("Планировщик обновления кэша: %s", exc)
+
+        self._thread = threading.Thread(target=run, name="swr-scheduler", daemon=True)
+        self._thread.start()
+
+    def as_dict(self) -> dict:
+        return {
+            "hot_keys": len(self.hot_keys),
+            "refreshing": len(self._refreshing),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+        }
+
+
+revalidator = Revalidator()
+
+register_metrics("revalidation", revalidator.as_dict)
+
+
+@register_warmup
+def start_revalidation() -> None:
+    revalidator.start()
+
+
+def cache_key(request: Request) -> str:
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def cached_response(
+    request: Request,
+    db: Session,
+    tags: tuple[str, ...],
+    build: Callable[[], object],
+    ttl: float | None = None,
+    freshness: Freshness | None = None,
+    refresh: Callable[[], object] | None = None,
+) -> Response:
+    if replica_router.enabled and replica_router.recently_wrote(request):
+        # Запись читает основную БД, а в кэше может лежать ответ отстающей реплики.
+        body = EncodedBody.from_content(build())
+        return body.response(request, headers={"X-Cache": "BYPASS", "Age": "0"})
+
+    key = cache_key(request)
+    swr = freshness is not None and refresh is not None
+    try:
+        entry = _unpack(response_cache.get(key) or b"")
+    except Exception as exc:
+        logger.warning("Кэш ответов недоступен: %s", exc)
+        entry = None
+    if entry is not None:
+        stored_at, body = entry
+        if swr:
+            revalidator.touch(key, tags, freshness, refresh)
+        age = max(0.0, time.time() - stored_at)
+        state = "HIT"
+        if freshness is not None and age > freshness.fresh:
+            state = "STALE"
+            revalidator.schedule(key)
+        return body.response(request, headers={"X-Cache": state, "Age": str(int(age))})
+
+    try:
+        versions = response_cache.versions(tags)
+    except Exception:
+        versions = None
+
+    def compute() -> EncodedBody:
+        body = EncodedBody.from_content(build())
+        if freshness is not None:
+            store_ttl = freshness.ttl
+        else:
+            store_ttl = RESPONSE_CACHE_TTL if ttl is None else ttl
+        if getattr(db, "read_bind", None) is not None:
+            store_ttl = min(store_ttl, replica_router.max_lag_seconds)
+        if versions is not None and store_ttl > 0:
+            _store(key, body, tags, versions, store_ttl)
+        return body
+
+    body = single_flight.do(f"{key}#{versions}", compute)
+    if swr:
+        revalidator.touch(key, tags, freshness, refresh)
+    return body.response(request, headers={"X-Cache": "MISS", "Age": "0"})
+
+
+class _QueryEntry:
+    __slots__ = ("expires_at", "rows", "tags", "versions")
+
+    def __init__(
+        self, expires_at: float, tags: tuple[str, ...], versions: tuple[int, ...], rows: list
+    ) -> None:
+        self.expires_at = expires_at
+        self.tags = tags
+        self.versions = versions
+        self.rows = rows
+
+
+class QueryResultCache:
+    def __init__(self, max_entries: int, max_rows: int, ttl: float, shared: bool) -> None:
+        self.max_entries = max_entries
+        self.shared = shared
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.evictions = 0
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self.invalidations: Counter[str] = Counter()
+        self._entries: OrderedDict[str, _QueryEntry] = OrderedDict()
+        self._keys_by_tag: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.shared and self.max_entries > 0 and self.ttl > 0
+
+    @staticmethod
+    def describe(statement, dialect) -> tuple[str, tuple[str, ...]]:
+        compiled = statement.compile(dialect=dialect)
+        params = sorted(compiled.params.items())
+        tables = {item.name for item in visitors.iterate(statement) if isinstance(item, Table)}
+        return f"{compiled}\x00{params!r}", tuple(sorted(tables))
+
+    def all(self, db: Session, query: Query) -> list:
+        if (
+            not self.enabled
+            or db.new
+            or db.dirty
+            or db.deleted
+            or db.info.get(_TAGS_KEY)
+            or any(isinstance(item["expr"], type) for item in query.column_descriptions)
+        ):
+            return query.all()
+
+        bind = db.get_bind()
+        key, tags = self.describe(query.statement, bind.dialect)
+        # Результаты реплик и основной БД хранятся раздельно: после записи
+        # чтение с основной БД не должно получить строки отстающей реплики.
+        key = f"{bind.url}\x00{key}"
+        try:
+            versions = response_cache.versions(tags)
+        except Exception:
+            return query.all()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry.versions == versions
+                and entry.expires_at > time.monotonic()
+            ):
+                self._entries.move_to_end(key)
+                self.hits.update(tags)
+                return list(entry.rows)
+            self.misses.update(tags)
+
+        rows = query.all()
+        if len(rows) > self.max_rows:
+            return rows
+        ttl = self.ttl
+        if getattr(db, "read_bind", None) is not None:
+            ttl = min(ttl, replica_router.max_lag_seconds)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = _QueryEntry(time.monotonic() + ttl, tags, versions, list(rows))
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return rows
+
+    def first(self, db: Session, query: Query):
+        rows = self.all(db, query.limit(1))
+        return rows[0] if rows else None
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                self.invalidations[tag] += 1
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._discard(key)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            tags = set(self.hits) | set(self.misses) | set(self.invalidations)
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "tags": {
+                    tag: {
+                        "entries": len(self._keys_by_tag.get(tag, ())),
+                        "hits": self.hits[tag],
+                        "misses": self.misses[tag],
+                        "invalidations": self.invalidations[tag],
+                    }
+                    for tag in sorted(tags)
+                },
+            }
+
+
+# Записи сверяются с версиями тегов в кэше ответов. В памяти процесса
+# сброс из одного воркера не виден остальным, поэтому нужен общий бэкенд.
+query_cache = QueryResultCache(
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_MAX_ROWS,
+    QUERY_CACHE_TTL,
+    shared=RESPONSE_CACHE_BACKEND in SHARED_BACKENDS,
+)
+
+register_metrics("query_cache", query_cache.as_dict)
+
+
+def invalidate_tags(tags: Iterable[str]) -> None:
+    tags = sorted(tags)
+    query_cache.invalidate(tags)
+    try:
+        response_cache.invalidate(tags)
+    except Exception as exc:
+        logger.warning("Не удалось сбросить кэш ответов: %s", exc)
+
+
+def invalidate_tables(db: Session, *tables: str) -> None:
+    db.info.setdefault(_TAGS_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_tables(session: Session, flush_context, instances) -> None:
+    changed = {
+        instance.__table__.name
+        for instance in (*session.new, *session.dirty, *session.deleted)
+        if hasattr(instance, "__table__")
+    }
+    if changed:
+        invalidate_tables(session, *changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _broadcast_invalidation(session: Session) -> None:
+    tags = session.info.pop(_TAGS_KEY, None)
+    if tags:
+        invalidate_tags(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_tables(session: Session) -> None:
+    session.info.pop(_TAGS_KEY, None)
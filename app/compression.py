@@ -0,0 +1,81 @@
+import gzip
+import json
+import os
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+
+def render_json(content) -> bytes:
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class EncodedBody:
+    __slots__ = ("_raw", "_gzipped")
+
+    def __init__(self, raw: bytes | None = None, gzipped: bytes | None = None) -> None:
+        if raw is None and gzipped is None:
+            raise ValueError("Не задано тело ответа")
+        self._raw = raw
+        self._gzipped = gzipped
+
+    @classmethod
+    def from_content(cls, content) -> "EncodedBody":
+        return cls(render_json(content))
+
+    @classmethod
+    def loads(cls, data: bytes) -> "EncodedBody":
+        if data[:1] == b"g":
+            return cls(gzipped=data[1:])
+        return cls(raw=data[1:])
+
+    def dumps(self) -> bytes:
+        if len(self.raw) >= GZIP_MINIMUM_SIZE:
+            return b"g" + self.gzipped
+        return b"r" + self.raw
+
+    @property
+    def raw(self) -> bytes:
+        if self._raw is None:
+            self._raw = gzip.decompress(self._gzipped)
+        return self._raw
+
+    @property
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.raw, compresslevel=GZIP_LEVEL, mtime=0)
+        return self._gzipped
+
+    @property
+    def size(self) -> int:
+        return len(self._raw or b"") + len(self._gzipped or b"")
+
+    def response(
+        self, request: Request, status_code: int = 200, headers: dict[str, str] | None = None
+    ) -> Response:
+        headers = {"Vary": "Accept-Encoding", **(headers or {})}
+        compressible = self._gzipped is not None or len(self._raw) >= GZIP_MINIMUM_SIZE
+        if compressible and accepts_gzip(request):
+            headers["Content-Encoding"] = "gzip"
+            body = self.gzipped
+        else:
+            body = self.raw
+        return Response(
+            content=body,
+            status_code=status_code,
+            media_type="application/json",
+            headers=headers,
+        )
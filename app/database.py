@@ -2,28 +2,112 @@ import os
 from typing import Annotated, Generator
 
 from dotenv import load_dotenv
-from fastapi import Depends
-from sqlalchemy import create_engine
+from fastapi import Depends, Request, Response
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 
+from app.replication import READ_METHODS, ReplicaRouter, RoutingSession
+
 load_dotenv()
 
+EDGE_DATABASE = os.getenv("EDGE_DATABASE", "")
+EDGE_DB_URL = f"sqlite:///{EDGE_DATABASE}" if EDGE_DATABASE else ""
+EDGE_PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA cache_size = -{int(os.getenv('EDGE_CACHE_MB', '64')) * 1024}",
+    f"PRAGMA mmap_size = {int(os.getenv('EDGE_MMAP_MB', '256')) * 1024 * 1024}",
+)
+
 REFERENCE_DB_URL = (
-    f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    EDGE_DB_URL
+    or os.getenv("REFERENCE_DB_URL")
+    or (
+        f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    )
 )
 
 AUTH_DB_URL = (
-    f"mysql+pymysql://{os.getenv('AUTH_DB_USER', os.getenv('DB_USER'))}"
-    f":{os.getenv('AUTH_DB_PASSWORD', os.getenv('DB_PASSWORD'))}"
-    f"@{os.getenv('AUTH_DB_HOST', os.getenv('DB_HOST'))}"
-    f":{os.getenv('AUTH_DB_PORT', os.getenv('DB_PORT'))}"
-    f"/{os.getenv('AUTH_DB_NAME', os.getenv('DB_NAME'))}"
+    os.getenv("AUTH_DB_URL")
+    or EDGE_DB_URL
+    or (
+        f"mysql+pymysql://{os.getenv('AUTH_DB_USER', os.getenv('DB_USER'))}"
+        f":{os.getenv('AUTH_DB_PASSWORD', os.getenv('DB_PASSWORD'))}"
+        f"@{os.getenv('AUTH_DB_HOST', os.getenv('DB_HOST'))}"
+        f":{os.getenv('AUTH_DB_PORT', os.getenv('DB_PORT'))}"
+        f"/{os.getenv('AUTH_DB_NAME', os.getenv('DB_NAME'))}"
+    )
 )
 
-reference_engine = create_engine(REFERENCE_DB_URL)
-auth_engine = create_engine(AUTH_DB_URL)
+REFERENCE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("REFERENCE_REPLICA_URLS", "").split(",") if url.strip()
+]
+if EDGE_DATABASE:
+    REFERENCE_REPLICA_URLS = []
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+
+PROFILE_QUERY_WORKERS = int(os.getenv("PROFILE_QUERY_WORKERS", "1"))
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+CHANGE_FEED_SETTLE_SECONDS = float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", "2"))
+IDENTIFIER_LOOKUP_MAX = int(os.getenv("IDENTIFIER_LOOKUP_MAX", "100"))
+
+pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_recycle": DB_POOL_RECYCLE,
+}
+
+# Потоки подзапросов профиля и пакетных запросов берут соединения сверх тех,
+# что держат обработчики запросов.
+PROFILE_QUERY_CONNECTIONS = PROFILE_QUERY_WORKERS if PROFILE_QUERY_WORKERS > 1 else 0
+BATCH_CONNECTIONS = BATCH_MAX_WORKERS if BATCH_MAX_WORKERS > 1 else 0
+
+reference_pool_options = {
+    **pool_options,
+    "max_overflow": DB_MAX_OVERFLOW + PROFILE_QUERY_CONNECTIONS + BATCH_CONNECTIONS,
+}
+auth_pool_options = {**pool_options, "max_overflow": DB_MAX_OVERFLOW + BATCH_CONNECTIONS}
+
+reference_engine = create_engine(REFERENCE_DB_URL, **reference_pool_options)
+auth_engine = create_engine(AUTH_DB_URL, **auth_pool_options)
+
+if EDGE_DATABASE:
+
+    @event.listens_for(reference_engine, "connect")
+    def _edge_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in EDGE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+replica_engines = [
+    create_engine(url, pool_pre_ping=True, **reference_pool_options)
+    for url in REFERENCE_REPLICA_URLS
+]
+
+replica_router = ReplicaRouter(
+    primary=reference_engine,
+    replicas=replica_engines,
+    max_lag_seconds=REPLICA_MAX_LAG_SECONDS,
+    check_interval=REPLICA_CHECK_INTERVAL,
+    read_your_writes_seconds=READ_YOUR_WRITES_SECONDS,
+)
 
-ReferenceSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=reference_engine)
+ReferenceSessionLocal = sessionmaker(
+    class_=RoutingSession,
+    router=replica_router,
+    autocommit=False,
+    autoflush=False,
+    bind=reference_engine,
+)
 AuthSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=auth_engine)
 
 
@@ -31,8 +115,23 @@ class Base(DeclarativeBase):
     pass
 
 
-def get_db() -> Generator[Session, None, None]:  # pyright: ignore[reportInvalidTypeForm]
+def get_db(request: Request, response: Response) -> Generator[Session, None, None]:  # pyright: ignore[reportInvalidTypeForm]
+    db = ReferenceSessionLocal()
+    if replica_router.enabled:
+        if request.method not in READ_METHODS:
+            replica_router.remember_write(response)
+        elif not replica_router.recently_wrote(request):
+            db.use_replica()
+    try:
+        yield db  # pyright: ignore[reportReturnType]
+    finally:
+        db.close()
+
+
+def get_read_db(request: Request) -> Generator[Session, None, None]:  # pyright: ignore[reportInvalidTypeForm]
     db = ReferenceSessionLocal()
+    if replica_router.enabled and not replica_router.recently_wrote(request):
+        db.use_replica()
     try:
         yield db  # pyright: ignore[reportReturnType]
     finally:
@@ -52,4 +151,5 @@ def init_db():
 
 
 DbSession = Annotated[Session, Depends(get_db)]
+ReadDbSession = Annotated[Session, Depends(get_read_db)]
 AuthDbSession = Annotated[Session, Depends(get_auth_db)]
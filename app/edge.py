@@ -0,0 +1,356 @@
+import logging
+import os
+import threading
+import time
+from datetime import UTC, datetime
+
+import httpx
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import (
+    Column,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    delete,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.cache import invalidate_tags
+from app.database import EDGE_DATABASE, Base, reference_engine
+from app.lifespan import register_warmup
+from app.metrics import register_metrics
+from app.models.reference import (
+    BankAccountDB,
+    ChangeLogDB,
+    ContractDB,
+    CounterpartyAdditionalDB,
+    CounterpartyDB,
+    CounterpartySummaryDB,
+    DetailsIPDB,
+    DetailsLLCDB,
+    DetailsPhysDB,
+    EmployeeDB,
+    InternalEmployeeDB,
+    ObjectDB,
+    ObjectLevelDB,
+    PersonDB,
+    WorkTypeDB,
+)
+from app.models.session import SessionDB
+from app.replication import READ_METHODS
+from app.services.reference_service import ReferenceService
+
+logger = logging.getLogger(__name__)
+
+EDGE_UPSTREAM_URL = os.getenv("EDGE_UPSTREAM_URL", "").rstrip("/")
+EDGE_UPSTREAM_TIMEOUT = float(os.getenv("EDGE_UPSTREAM_TIMEOUT", "10"))
+EDGE_POLL_INTERVAL = float(os.getenv("EDGE_POLL_INTERVAL", "1"))
+EDGE_SYNC_BATCH = int(os.getenv("EDGE_SYNC_BATCH", "1000"))
+
+EDGE_READ_ONLY_POSTS = frozenset({"/api/ref/batch"})
+HOP_HEADERS = frozenset(
+    {"host", "connection", "content-length", "transfer-encoding", "content-encoding", "keep-alive"}
+)
+
+edge_state = Table(
+    "edge_state",
+    MetaData(),
+    Column("name", String(50), primary_key=True),
+    Column("value", String(200), nullable=False),
+)
+
+# Какие строки перечитать из основной базы при событии ленты изменений:
+# таблица и колонка, по которой строки относятся к сущности.
+ENTITY_TABLES = {
+    "counterparty": [
+        (CounterpartyDB, "id"),
+        (DetailsLLCDB, "counterparties_id"),
+        (DetailsIPDB, "counterparty_id"),
+        (DetailsPhysDB, "counterparty_id"),
+        (CounterpartyAdditionalDB, "counterparty_id"),
+        (BankAccountDB, "counterparty_id"),
+    ],
+    "person": [(PersonDB, "id")],
+    "employee": [(EmployeeDB, "id")],
+    "object": [(ObjectDB, "id")],
+    "level": [(ObjectLevelDB, "id")],
+    "contract": [(ContractDB, "id")],
+    "work_type": [(WorkTypeDB, "id")],
+}
+# Производные таблицы не попадают в ленту и копируются целиком.
+DERIVED_TABLES = (CounterpartySummaryDB, InternalEmployeeDB)
+
+REFERENCE_TABLES = [table for table in Base.metadata.sorted_tables if table.name != "sessions"]
+
+
+def get_state(conn: Connection) -> dict[str, str]:
+    if not inspect(conn).has_table(edge_state.name):
+        return {}
+    return {row.name: row.value for row in conn.execute(select(edge_state))}
+
+
+def _set_state(conn: Connection, **values) -> None:
+    conn.execute(delete(edge_state).where(edge_state.c.name.in_(values)))
+    conn.execute(
+        insert(edge_state), [{"name": name, "value": str(value)} for name, value in values.items()]
+    )
+
+
+def _copy(source: Connection, target: Connection, table: Table, where=None) -> int:
+    query = select(table)
+    removal = delete(table)
+    if where is not None:
+        query = query.where(where)
+        removal = removal.where(where)
+    rows = [dict(row) for row in source.execute(query).mappings()]
+    target.execute(removal)
+    if rows:
+        target.execute(insert(table), rows)
+    return len(rows)
+
+
+def _mark_synced(target: Connection, cursor: int, state: dict[str, str]) -> None:
+    _set_state(
+        target,
+        cursor=cursor,
+        version=int(state.get("version", 0)) + 1,
+        synced_at=datetime.now(UTC).isoformat(),
+    )
+
+
+def full_export(source: Engine, target: Engine) -> int:
+    with Session(bind=source) as db:
+        cursor = ReferenceService(db).change_cursor()
+
+    Base.metadata.create_all(target, tables=REFERENCE_TABLES)
+    edge_state.create(target, checkfirst=True)
+    copied = 0
+    with source.connect() as source_conn, target.begin() as target_conn:
+        state = get_state(target_conn)
+        for table in REFERENCE_TABLES:
+            copied += _copy(source_conn, target_conn, table)
+        _mark_synced(target_conn, cursor, state)
+    logger.info("Полная выгрузка: %d строк, курсор %d", copied, cursor)
+    return copied
+
+
+def apply_changes(source: Engine, target: Engine) -> int:
+    with target.connect() as conn:
+        state = get_state(conn)
+    cursor = int(state["cursor"])
+    applied = 0
+
+    while True:
+        with Session(bind=source) as db:
+            feed = ReferenceService(db).list_changes(cursor, EDGE_SYNC_BATCH)
+        changes = feed["changes"]
+        if not changes:
+            return applied
+
+        entity_ids: dict[str, set[str]] = {}
+        for change in changes:
+            entity_ids.setdefault(change["entity"], set()).add(change["id"])
+
+        change_log = ChangeLogDB.__table__
+        with source.connect() as source_conn, target.begin() as target_conn:
+            for entity, ids in entity_ids.items():
+                for model, key in ENTITY_TABLES.get(entity, ()):
+                    table = model.__table__
+                    _copy(source_conn, target_conn, table, table.c[key].in_(sorted(ids)))
+            if not feed["has_more"]:
+                for model in DERIVED_TABLES:
+                    _copy(source_conn, target_conn, model.__table__)
+            target_conn.execute(
+                delete(change_log).where(change_log.c.id.in_([item["cursor"] for item in changes]))
+            )
+            target_conn.execute(
+                insert(change_log),
+                [
+                    {
+                        "id": item["cursor"],
+                        "entity": item["entity"],
+                        "entity_id": item["id"],
+                        "action": item["action"],
+                        "changed_at": item["changed_at"],
+                    }
+                    for item in changes
+                ],
+            )
+            state = get_state(target_conn)
+            cursor = feed["next_cursor"]
+            _mark_synced(target_conn, cursor, state)
+        applied += len(changes)
+        if not feed["has_more"]:
+            return applied
+
+
+def copy_auth(source: Engine, target: Engine) -> int:
+    sessions = SessionDB.__table__
+    sessions.create(target, checkfirst=True)
+    now = datetime.now(UTC)
+    with source.connect() as source_conn, target.begin() as target_conn:
+        copied = _copy(source_conn, target_conn, sessions, sessions.c.expires_at > now)
+        target_conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS users (id CHAR(36) PRIMARY KEY, name VARCHAR(100), "
+                "surname VARCHAR(100), patronymic VARCHAR(100))"
+            )
+        )
+        users = source_conn.execute(text("SELECT id, name, surname, patronymic FROM users"))
+        target_conn.execute(text("DELETE FROM users"))
+        rows = [dict(row) for row in users.mappings()]
+        if rows:
+            target_conn.execute(
+                text(
+                    "INSERT INTO users (id, name, surname, patronymic) "
+                    "VALUES (:id, :name, :surname, :patronymic)"
+                ),
+                rows,
+            )
+    return copied + len(rows)
+
+
+def target_engine(path: str) -> Engine:
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+    return engine
+
+
+def sync(
+    source: Engine, target: Engine, auth_source: Engine | None = None, full: bool = False
+) -> dict:
+    with target.connect() as conn:
+        exported = full or "cursor" not in get_state(conn)
+    result = {"full": exported}
+    if exported:
+        result["rows"] = full_export(source, target)
+    result["changes"] = apply_changes(source, target)
+    if auth_source is not None:
+        result["auth_rows"] = copy_auth(auth_source, target)
+    return result
+
+
+class EdgeWatcher:
+    def __init__(self) -> None:
+        self.state: dict[str, str] = {}
+        self.invalidations = 0
+        self.forwarded = 0
+        self.rejected = 0
+        self._thread: threading.Thread | None = None
+
+    def poll(self) -> None:
+        with reference_engine.connect() as conn:
+            state = get_state(conn)
+        previous = self.state.get("version")
+        self.state = state
+        if previous is not None and state.get("version") != previous:
+            invalidate_tags(table.name for table in REFERENCE_TABLES)
+            self.invalidations += 1
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.poll()
+        if EDGE_POLL_INTERVAL <= 0:
+            return
+
+        def run() -> None:
+            while True:
+                time.sleep(EDGE_POLL_INTERVAL)
+                try:
+                    self.poll()
+                except Exception as exc:
+                    logger.warning("Не удалось прочитать состояние локальной копии: %s", exc)
+
+        self._thread = threading.Thread(target=run, name="edge-watcher", daemon=True)
+        self._thread.start()
+
+    def as_dict(self) -> dict:
+        return {
+            "database": EDGE_DATABASE,
+            "upstream": EDGE_UPSTREAM_URL or None,
+            "cursor": int(self.state.get("cursor", 0)),
+            "version": int(self.state.get("version", 0)),
+            "synced_at": self.state.get("synced_at"),
+            "invalidations": self.invalidations,
+            "forwarded": self.forwarded,
+            "rejected": self.rejected,
+        }
+
+
+edge_watcher = EdgeWatcher()
+
+if EDGE_DATABASE:
+    register_metrics("edge", edge_watcher.as_dict)
+
+    @register_warmup
+    def start_edge_watcher() -> None:
+        edge_watcher.start()
+
+
+class EdgeMode:
+    def __init__(self, app) -> None:
+        self.app = app
+        self._client: httpx.AsyncClient | None = None
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in READ_METHODS
+            or scope["path"] in EDGE_READ_ONLY_POSTS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if not EDGE_UPSTREAM_URL:
+            edge_watcher.rejected += 1
+            response = JSONResponse(
+                status_code=405,
+                content={"detail": "Узел работает только на чтение"},
+                headers={"Allow": "GET, HEAD"},
+            )
+            await response(scope, receive, send)
+            return
+
+        response = await self._forward(scope, receive)
+        await response(scope, receive, send)
+
+    async def _forward(self, scope, receive) -> Response:
+        body = bytearray()
+        while True:
+            message = await receive()
+            body.extend(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=EDGE_UPSTREAM_TIMEOUT)
+        headers = [
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in scope["headers"]
+            if name.decode("latin-1") not in HOP_HEADERS
+        ]
+        url = EDGE_UPSTREAM_URL + scope["path"]
+        if scope.get("query_string"):
+            url += "?" + scope["query_string"].decode("latin-1")
+        try:
+            upstream = await self._client.request(
+                scope["method"], url, headers=headers, content=bytes(body)
+            )
+        except httpx.HTTPError as exc:
+            logger.warning("Основной сервис недоступен: %s", exc)
+            return JSONResponse(status_code=502, content={"detail": "Основной сервис недоступен"})
+
+        edge_watcher.forwarded += 1
+        response = Response(content=upstream.content, status_code=upstream.status_code)
+        for name, value in upstream.headers.multi_items():
+            if name.lower() not in HOP_HEADERS:
+                response.headers.append(name, value)
+        return response
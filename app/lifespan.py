@@ -0,0 +1,136 @@
+import logging
+import os
+import time
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+from fastapi import FastAPI
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import configure_mappers
+from starlette.concurrency import run_in_threadpool
+
+from app.database import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+    Base,
+    auth_engine,
+    init_db,
+    reference_engine,
+    replica_engines,
+    replica_router,
+)
+
+logger = logging.getLogger(__name__)
+
+DB_SCHEMA_MODE = os.getenv("DB_SCHEMA_MODE", "check")
+DB_WARMUP_CONNECTIONS = int(os.getenv("DB_WARMUP_CONNECTIONS", "5"))
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE") or DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+PROCESS_STARTED = time.monotonic()
+
+warmup_hooks: list[Callable[[], None]] = []
+
+
+def register_warmup(hook: Callable[[], None]) -> Callable[[], None]:
+    warmup_hooks.append(hook)
+    return hook
+
+
+class StartupState:
+    def __init__(self) -> None:
+        self.ready = False
+        self.startup_seconds: float | None = None
+        self.first_request_seconds: float | None = None
+        self.timings: dict[str, float] = {}
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "startup_seconds": self.startup_seconds,
+            "time_to_first_request_seconds": self.first_request_seconds,
+            "timings": self.timings,
+        }
+
+
+startup_state = StartupState()
+
+
+def check_schema(engine: Engine) -> None:
+    existing = set(inspect(engine).get_table_names())
+    missing = sorted(
+        name for name in Base.metadata.tables if name != "sessions" and name not in existing
+    )
+    if missing:
+        raise RuntimeError(f"В базе отсутствуют таблицы: {', '.join(missing)}")
+
+
+def warm_pool(engine: Engine, size: int) -> None:
+    connections = []
+    try:
+        for _ in range(size):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def _timed(name: str, func: Callable[[], None]) -> None:
+    started = time.perf_counter()
+    func()
+    startup_state.timings[name] = round(time.perf_counter() - started, 4)
+
+
+def startup() -> None:
+    started = time.perf_counter()
+    _timed("mappers", configure_mappers)
+
+    if DB_SCHEMA_MODE == "create":
+        _timed("schema", init_db)
+    elif DB_SCHEMA_MODE == "check":
+        _timed("schema", lambda: check_schema(reference_engine))
+
+    if DB_WARMUP_CONNECTIONS > 0:
+        for name, engine in [
+            ("pool_reference", reference_engine),
+            ("pool_auth", auth_engine),
+            *((f"pool_replica_{index}", engine) for index, engine in enumerate(replica_engines)),
+        ]:
+            _timed(name, lambda engine=engine: warm_pool(engine, DB_WARMUP_CONNECTIONS))
+
+    if replica_router.enabled:
+        _timed("replicas", replica_router.start)
+
+    for hook in warmup_hooks:
+        _timed(f"warmup_{hook.__name__}", hook)
+
+    startup_state.startup_seconds = round(time.perf_counter() - started, 4)
+    startup_state.ready = True
+    logger.info("Сервис готов за %.3f с", startup_state.startup_seconds)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    await run_in_threadpool(startup)
+    try:
+        yield
+    finally:
+        startup_state.ready = False
+
+
+class FirstRequestTimer:
+    def __init__(self, app) -> None:
+        self.app = app
+        self.seen = False
+
+    async def __call__(self, scope, receive, send):
+        if not self.seen and scope["type"] == "http" and scope["path"] != "/ready":
+            self.seen = True
+            elapsed = round(time.monotonic() - PROCESS_STARTED, 4)
+            startup_state.first_request_seconds = elapsed
+            logger.info("Первый запрос через %.3f с после старта процесса", elapsed)
+        await self.app(scope, receive, send)
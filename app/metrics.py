@@ -0,0 +1,26 @@
+import hmac
+import os
+from collections.abc import Callable
+
+# Токен для GET /metrics (Authorization: Bearer ...); пусто — без проверки
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+metrics_sources: dict[str, Callable[[], dict]] = {}
+
+
+def register_metrics(name: str, source: Callable[[], dict]) -> Callable[[], dict]:
+    metrics_sources[name] = source
+    return source
+
+
+def collect_metrics() -> dict:
+    return {name: source() for name, source in metrics_sources.items()}
+
+
+def metrics_authorized(authorization: str | None) -> bool:
+    if not METRICS_TOKEN:
+        return True
+    scheme, _, token = (authorization or "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(
+        token.strip().encode(), METRICS_TOKEN.encode()
+    )
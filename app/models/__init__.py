@@ -1,8 +1,10 @@
 from app.models.reference import (
     BankAccountDB,
+    ChangeLogDB,
     ContractDB,
     CounterpartyAdditionalDB,
     CounterpartyDB,
+    CounterpartySummaryDB,
     DetailsIPDB,
     DetailsLLCDB,
     DetailsPhysDB,
@@ -17,9 +19,11 @@ from app.models.session import SessionDB
 
 __all__ = [
     "BankAccountDB",
+    "ChangeLogDB",
     "ContractDB",
     "CounterpartyAdditionalDB",
     "CounterpartyDB",
+    "CounterpartySummaryDB",
     "DetailsIPDB",
     "DetailsLLCDB",
     "DetailsPhysDB",
@@ -1,4 +1,4 @@
-from sqlalchemy import CHAR, Boolean, Column, Date, DateTime, Integer, String, Text
+from sqlalchemy import CHAR, BigInteger, Boolean, Column, Date, DateTime, Integer, String, Text
 
 from app.database import Base
 
@@ -17,16 +17,26 @@ class BankAccountDB(Base):
     is_main = Column(Boolean, nullable=False)
 
 
+class ChangeLogDB(Base):
+    __tablename__ = "change_log"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    entity = Column(String(30), nullable=False)
+    entity_id = Column(String(36), nullable=False, index=True)
+    action = Column(String(10), nullable=False)
+    changed_at = Column(DateTime, nullable=False, index=True)
+
+
 class CounterpartyDB(Base):
     __tablename__ = "counterparties"
 
     id = Column(CHAR(36), primary_key=True)
-    type = Column(String(10), nullable=False)
-    short_name = Column(String(100), nullable=False)
+    type = Column(String(10), nullable=False, index=True)
+    short_name = Column(String(100), nullable=False, index=True)
     full_name = Column(String(200), nullable=False)
     is_internal = Column(Boolean, nullable=False)
     contract_prefix = Column(String(10))
-    created_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
     updated_at = Column(DateTime)
 
 
@@ -37,13 +47,32 @@ class CounterpartyAdditionalDB(Base):
     additional_okved = Column(Text, primary_key=True)
 
 
+class CounterpartySummaryDB(Base):
+    __tablename__ = "counterparty_summaries"
+
+    counterparty_id = Column(CHAR(36), primary_key=True)
+    type = Column(String(10), nullable=False, index=True)
+    short_name = Column(String(100), nullable=False, index=True)
+    full_name = Column(String(200), nullable=False)
+    is_internal = Column(Boolean, nullable=False)
+    opf = Column(String(20))
+    address = Column(Text)
+    phone = Column(String(200))
+    email = Column(String(200))
+    inn = Column(String(200), index=True)
+    ogrn = Column(String(200))
+    kpp = Column(String(50))
+    inn_ogrn_kpp = Column(String(500), nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+
 class DetailsIPDB(Base):
     __tablename__ = "details_ip"
 
     id = Column(Integer, primary_key=True)
     counterparty_id = Column(CHAR(36), nullable=False)
-    inn = Column(String(200), nullable=False)
-    ogrnip = Column(String(200))
+    inn = Column(String(200), nullable=False, index=True)
+    ogrnip = Column(String(200), index=True)
     okpo = Column(String(200))
     okved = Column(String(200))
     okopf = Column(String(200))
@@ -60,9 +89,9 @@ class DetailsLLCDB(Base):
 
     id = Column(Integer, primary_key=True)
     counterparties_id = Column(CHAR(36), nullable=False)
-    inn = Column(String(50), nullable=False)
+    inn = Column(String(50), nullable=False, index=True)
     kpp = Column(String(50), nullable=False)
-    ogrn = Column(String(50), nullable=False)
+    ogrn = Column(String(50), nullable=False, index=True)
     okpo = Column(String(200))
     okogu = Column(String(200))
     okato = Column(String(200))
@@ -90,7 +119,7 @@ class DetailsPhysDB(Base):
     passport_date_issued = Column(Date)
     passport_date = Column(Date)
     department_code = Column(String(7))
-    inn = Column(String(200))
+    inn = Column(String(200), index=True)
     address_registration = Column(Text)
     address_living = Column(Text)
     phone = Column(String(18))
@@ -101,14 +130,14 @@ class EmployeeDB(Base):
     __tablename__ = "employees"
 
     id = Column(CHAR(36), primary_key=True)
-    counterparty_id = Column(CHAR(36), nullable=False)
-    person_id = Column(CHAR(36), nullable=False)
+    counterparty_id = Column(CHAR(36), nullable=False, index=True)
+    person_id = Column(CHAR(36), nullable=False, index=True)
     position = Column(String(100))
     phone_work = Column(String(18))
     phone_extra = Column(String(18))
     email_work = Column(String(100))
     email_extra = Column(String(100))
-    role_type = Column(String(20))
+    role_type = Column(String(20), index=True)
     comment = Column(Text)
 
 
@@ -126,7 +155,7 @@ class ContractDB(Base):
     __tablename__ = "contracts"
 
     id = Column(CHAR(36), primary_key=True)
-    contract_id = Column(CHAR(36))
+    contract_id = Column(CHAR(36), index=True)
     name = Column(Text, nullable=False)
 
 
@@ -141,7 +170,7 @@ class ObjectLevelDB(Base):
     __tablename__ = "object_levels"
 
     id = Column(CHAR(36), primary_key=True)
-    object_id = Column(CHAR(36), nullable=False)
+    object_id = Column(CHAR(36), nullable=False, index=True)
     name = Column(String(255))
     level_type = Column(String(20), nullable=False)
     level_number = Column(Integer, nullable=False)
@@ -156,12 +185,12 @@ class ObjectDB(Base):
     __tablename__ = "objects"
 
     id = Column(String(36), primary_key=True)
-    short_name = Column(String(255))
+    short_name = Column(String(255), index=True)
     full_name = Column(String(500))
     address = Column(Text)
     is_active = Column(Boolean, default=True)
-    manager_id = Column(String(36))
-    created_at = Column(DateTime)
+    manager_id = Column(String(36), index=True)
+    created_at = Column(DateTime, index=True)
     updated_at = Column(DateTime)
 
 
@@ -0,0 +1,278 @@
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_MIN_INTERVAL = float(os.getenv("PROFILE_MIN_INTERVAL", "10"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "15"))
+
+APP_ROOT = str(Path(__file__).resolve().parent)
+
+CATEGORIES = ("sql", "orm_hydration", "dict_building", "serialization", "other")
+CATEGORY_PATHS = [
+    ("sql", ("/sqlalchemy/engine/", "/sqlalchemy/pool/", "/sqlalchemy/dialects/")),
+    ("sql", ("/sqlalchemy/sql/", "/pymysql/", "/MySQLdb/", "/sqlite3/")),
+    ("orm_hydration", ("/sqlalchemy/orm/",)),
+    (
+        "serialization",
+        (
+            "/json/",
+            "/fastapi/encoders.py",
+            "/pydantic/",
+            "/pydantic_core/",
+            "/starlette/responses.py",
+            "/starlette/middleware/gzip.py",
+            "/gzip.py",
+            f"{APP_ROOT}/compression.py",
+        ),
+    ),
+    (
+        "dict_building",
+        (f"{APP_ROOT}/services/", f"{APP_ROOT}/routes/", f"{APP_ROOT}/repositories/"),
+    ),
+]
+
+current_profile: ContextVar["ProfileRun | None"] = ContextVar("current_profile", default=None)
+
+
+def classify_frame(frame) -> tuple[str, str]:
+    innermost = frame
+    while frame is not None:
+        filename = frame.f_code.co_filename.replace(os.sep, "/")
+        for category, paths in CATEGORY_PATHS:
+            if any(path in filename for path in paths):
+                return category, _function(innermost)
+        frame = frame.f_back
+    return "other", _function(innermost)
+
+
+def _function(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename.replace(os.sep, '/').rsplit('/', 1)[-1]}:{code.co_firstlineno}({code.co_name})"
+
+
+def _contains(frame, match) -> bool:
+    while frame is not None:
+        if match(frame):
+            return True
+        frame = frame.f_back
+    return False
+
+
+class ProfileRun:
+    def __init__(self, scope, frame) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.scope = scope
+        self.frame = frame
+        self.loop_thread = threading.get_ident()
+        self.threads: set[int] = set()
+        self.categories: Counter[str] = Counter()
+        self.functions: Counter[str] = Counter()
+        self.ticks = 0
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.started = time.perf_counter()
+        self.finished = self.started
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, PROFILE_SAMPLE_INTERVAL / 4))
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+        self._stop.set()
+        self._sampler.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self) -> None:
+        while not self._stop.wait(PROFILE_SAMPLE_INTERVAL):
+            self.sample(sys._current_frames())
+
+    def sample(self, frames: dict) -> None:
+        self.ticks += 1
+        endpoint = getattr(self.scope.get("route"), "endpoint", None)
+        code = getattr(endpoint, "__code__", None)
+        for ident, frame in frames.items():
+            if ident == self.loop_thread:
+                if not _contains(frame, lambda item: item is self.frame):
+                    continue
+            elif ident not in self.threads or code is None:
+                continue
+            elif not _contains(frame, lambda item: item.f_code is code):
+                continue
+            category, function = classify_frame(frame)
+            self.categories[category] += 1
+            self.functions[function] += 1
+
+    def report(self, status: int) -> dict:
+        wall = self.finished - self.started
+        interval = wall / self.ticks if self.ticks else PROFILE_SAMPLE_INTERVAL
+        route = self.scope.get("route")
+        return {
+            "id": self.id,
+            "method": self.scope["method"],
+            "path": self.scope["path"],
+            "route": getattr(route, "path", None),
+            "status": status,
+            "wall_ms": round(wall * 1000, 3),
+            "sample_interval_ms": round(interval * 1000, 3),
+            "samples": sum(self.categories.values()),
+            "breakdown_ms": {
+                category: round(self.categories[category] * interval * 1000, 3)
+                for category in CATEGORIES
+            },
+            "sql": {
+                "statements": self.sql_statements,
+                "ms": round(self.sql_seconds * 1000, 3),
+            },
+            "top_functions": [
+                {"function": function, "samples": count}
+                for function, count in self.functions.most_common(PROFILE_TOP_FUNCTIONS)
+            ],
+        }
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    run = current_profile.get()
+    if run is not None:
+        run.threads.add(threading.get_ident())
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    run = current_profile.get()
+    if run is not None and conn.info.get("profile_started"):
+        run.sql_statements += 1
+        run.sql_seconds += time.perf_counter() - conn.info["profile_started"].pop()
+
+
+def server_timing(report: dict) -> str:
+    parts = [f"{name};dur={value}" for name, value in report["breakdown_ms"].items()]
+    parts.append(f"total;dur={report['wall_ms']}")
+    return ", ".join(parts)
+
+
+def authorized(token: str | None) -> bool:
+    return bool(PROFILE_TOKEN) and bool(token) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.reports: deque[dict] = deque(maxlen=PROFILE_KEEP)
+        self.active = False
+        self.last_started = float("-inf")
+        self.profiled = 0
+        self.rate_limited = 0
+
+    def requested(self, scope) -> bool:
+        if not PROFILE_TOKEN or scope["path"].startswith("/profiles/"):
+            return False
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return authorized(value.decode("latin-1"))
+        query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        return authorized(query.get("profile"))
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        if self.active or now - self.last_started < PROFILE_MIN_INTERVAL:
+            self.rate_limited += 1
+            return False
+        self.active = True
+        self.last_started = now
+        return True
+
+    def release(self, report: dict) -> None:
+        self.active = False
+        self.profiled += 1
+        self.reports.append(report)
+        logger.info(
+            "Профиль %s %s %s: %s",
+            report["id"],
+            report["method"],
+            report["path"],
+            server_timing(report),
+        )
+
+    def get(self, profile_id: str) -> dict | None:
+        return next((report for report in self.reports if report["id"] == profile_id), None)
+
+    def as_dict(self) -> dict:
+        return {
+            "enabled": bool(PROFILE_TOKEN),
+            "profiled": self.profiled,
+            "rate_limited": self.rate_limited,
+            "stored": len(self.reports),
+        }
+
+
+profiler = Profiler()
+
+register_metrics("profiling", profiler.as_dict)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not profiler.acquire():
+
+            async def skipped_send(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", []).append((b"x-profile", b"rate-limited"))
+                await send(message)
+
+            await self.app(scope, receive, skipped_send)
+            return
+
+        messages = []
+
+        async def buffered_send(message):
+            messages.append(message)
+
+        run = ProfileRun(scope, sys._getframe())
+        token = current_profile.set(run)
+        run.start()
+        try:
+            await self.app(scope, receive, buffered_send)
+        finally:
+            run.stop()
+            current_profile.reset(token)
+            start = next((item for item in messages if item["type"] == "http.response.start"), None)
+            report = run.report(start["status"] if start else 500)
+            profiler.release(report)
+
+        start["headers"] = [
+            *start.get("headers", []),
+            (b"x-profile-id", report["id"].encode()),
+            (b"server-timing", server_timing(report).encode()),
+        ]
+        for message in messages:
+            await send(message)
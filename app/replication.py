@@ -0,0 +1,175 @@
+import itertools
+import logging
+import threading
+import time
+
+from fastapi import Request, Response
+from sqlalchemy import Delete, Insert, Update, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+READ_YOUR_WRITES_COOKIE = "ref_primary_until"
+
+
+def replica_lag_seconds(engine: Engine) -> float | None:
+    with engine.connect() as conn:
+        if conn.dialect.name != "mysql":
+            conn.exec_driver_sql("SELECT 1")
+            return 0.0
+        try:
+            row = conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+        except OperationalError:
+            row = conn.exec_driver_sql("SHOW SLAVE STATUS").mappings().first()
+    if row is None:
+        return 0.0
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: list[Engine],
+        max_lag_seconds: float,
+        check_interval: float,
+        read_your_writes_seconds: float,
+    ) -> None:
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self._health: dict[Engine, bool] = {}
+        self._cursor = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        for replica in replicas:
+            event.listen(replica, "handle_error", self._on_replica_error)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def read_engine(self) -> Engine:
+        # Только закэшированное состояние: проверка отставания идёт в фоне.
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                index = next(self._cursor) % len(self.replicas)
+            replica = self.replicas[index]
+            if self._health.get(replica, True):
+                return replica
+        return self.primary
+
+    def mark_failed(self, engine: Engine) -> None:
+        with self._lock:
+            self._health[engine] = False
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            healthy = self._probe(replica)
+            with self._lock:
+                self._health[replica] = healthy
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self.check()
+
+        def run() -> None:
+            while True:
+                time.sleep(self.check_interval)
+                try:
+                    self.check()
+                except Exception as exc:
+                    logger.warning("Проверка реплик: %s", exc)
+
+        self._thread = threading.Thread(target=run, name="replica-checker", daemon=True)
+        self._thread.start()
+
+    def _probe(self, engine: Engine) -> bool:
+        try:
+            lag = replica_lag_seconds(engine)
+        except SQLAlchemyError as exc:
+            logger.warning("Реплика %s недоступна: %s", engine.url, exc)
+            return False
+        healthy = lag is not None and lag <= self.max_lag_seconds
+        if lag is not None and not healthy:
+            logger.warning("Реплика %s отстаёт на %.1f с", engine.url, lag)
+        return healthy
+
+    def _on_replica_error(self, context) -> None:
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+            if context.engine is not None:
+                self.mark_failed(context.engine)
+
+    def recently_wrote(self, request: Request) -> bool:
+        until = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+        if not until:
+            return False
+        try:
+            return float(until) > time.time()
+        except ValueError:
+            return False
+
+    def remember_write(self, response: Response) -> None:
+        window = self.read_your_writes_seconds
+        if window <= 0:
+            return
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            str(time.time() + window),
+            max_age=int(window) + 1,
+            httponly=True,
+            samesite="lax",
+        )
+
+
+class RoutingSession(Session):
+    def __init__(self, *args, router: ReplicaRouter, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self.read_bind: Engine | None = None
+
+    def use_replica(self) -> None:
+        if self.router.enabled:
+            self.read_bind = self.router.read_engine()
+
+    def use_primary(self) -> None:
+        self.read_bind = None
+
+    def execute(self, statement, *args, **kwargs):
+        replica = self.read_bind
+        if replica is None:
+            return super().execute(statement, *args, **kwargs)
+        try:
+            return super().execute(statement, *args, **kwargs)
+        except DBAPIError as exc:
+            if not (exc.connection_invalidated or isinstance(exc, OperationalError)):
+                raise
+            logger.warning(
+                "Чтение с реплики %s не удалось, повтор на основной БД: %s", replica.url, exc
+            )
+            self.router.mark_failed(replica)
+            self.rollback()
+            self.use_primary()
+            return super().execute(statement, *args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.read_bind is not None
+            and not self._flushing
+            and not isinstance(clause, (Insert, Update, Delete))
+        ):
+            return self.read_bind
+        return self.router.primary
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _pin_primary_after_flush(session: Session, flush_context) -> None:
+    if isinstance(session, RoutingSession):
+        session.use_primary()
@@ -4,6 +4,8 @@ from datetime import datetime, timezone
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.session_filter import session_filter
+
 
 class SessionRepository:
     def __init__(self, db: Session) -> None:
@@ -11,6 +13,8 @@ class SessionRepository:
 
     def is_valid(self, token: str) -> bool:
         token_hash = hashlib.sha256(token.encode()).hexdigest()
+        if not session_filter.might_contain(token_hash):
+            return False
         now = datetime.now(timezone.utc)
         result = self.db.execute(
             text(
@@ -24,4 +28,5 @@ class SessionRepository:
             ),
             {"token_hash": token_hash, "now": now},
         ).first()
+        session_filter.observe(result is not None)
         return result is not None
@@ -1,7 +1,47 @@
-from fastapi import APIRouter
+import logging
 
-from app.routes.reference_routes import reference_router
+from fastapi import APIRouter, Request
+
+from app.cache import RESPONSE_CACHE_WARMUP
+from app.database import AuthSessionLocal, ReferenceSessionLocal
+from app.lifespan import register_warmup
+from app.routes.batch_routes import batch_router
+from app.routes.reference_routes import (
+    list_counterparty_summary,
+    list_internal_employees,
+    reference_router,
+)
+from app.routes.snapshot_routes import snapshot_router
+
+logger = logging.getLogger(__name__)
 
 main_router = APIRouter(prefix="/api/ref")
 
 main_router.include_router(reference_router)
+main_router.include_router(batch_router)
+main_router.include_router(snapshot_router)
+
+
+def _warmup_request(path: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": main_router.prefix + path,
+            "query_string": b"",
+            "headers": [],
+        }
+    )
+
+
+@register_warmup
+def warm_response_cache() -> None:
+    if not RESPONSE_CACHE_WARMUP:
+        return
+    # Самые тяжёлые ответы собираются до готовности, а не первым запросом.
+    try:
+        with ReferenceSessionLocal() as db, AuthSessionLocal() as auth_db:
+            list_counterparty_summary(_warmup_request("/counterparties/summary"), db)
+            list_internal_employees(_warmup_request("/employees/internal"), db, auth_db)
+    except Exception as exc:
+        logger.warning("Не удалось прогреть кэш ответов: %s", exc)
@@ -0,0 +1,142 @@
+import inspect
+import json
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
+from typing import Annotated, Any, get_origin
+from urllib.parse import parse_qsl, urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.params import Depends as DependsParam
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter, ValidationError
+from pydantic.fields import FieldInfo
+from sqlalchemy.orm import Session
+from starlette.routing import Match
+
+from app.database import (
+    BATCH_MAX_REQUESTS,
+    BATCH_MAX_WORKERS,
+    AuthDbSession,
+    AuthSessionLocal,
+    DbSession,
+    ReadDbSession,
+)
+from app.middleware.auth_middleware import get_session
+from app.routes.reference_routes import reference_router
+from app.schemas import BatchRequest, BatchSubRequest
+
+API_PREFIX = "/api/ref"
+
+batch_router = APIRouter(
+    prefix="/batch", tags=["Пакетные запросы"], dependencies=[Depends(get_session)]
+)
+
+# Общий ограниченный пул на процесс: его соединения заложены в max_overflow
+# (см. app.database), поэтому пакеты не выбирают пул обработчиков запросов.
+_batch_executor = (
+    ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="batch")
+    if BATCH_MAX_WORKERS > 1
+    else None
+)
+
+
+@lru_cache(maxsize=256)
+def _adapter(annotation, default) -> TypeAdapter:
+    if isinstance(default, FieldInfo):
+        return TypeAdapter(Annotated[annotation, default])
+    return TypeAdapter(annotation)
+
+
+def _resolve(path: str) -> tuple[APIRoute, dict[str, Any], Request]:
+    parts = urlsplit(path)
+    route_path = parts.path.removeprefix(API_PREFIX) or "/"
+    scope = {"type": "http", "method": "GET", "path": route_path}
+    for route in reference_router.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            request = Request(
+                {
+                    "type": "http",
+                    "method": "GET",
+                    "path": API_PREFIX + route_path,
+                    "query_string": parts.query.encode(),
+                    "headers": [],
+                }
+            )
+            return route, child_scope["path_params"], request
+    raise HTTPException(status_code=404, detail="Маршрут не найден")
+
+
+def _call(
+    route: APIRoute,
+    path_params: dict,
+    request: Request,
+    db: Session,
+    auth_db: Callable[[], Session],
+):
+    query = dict(parse_qsl(request.url.query))
+    kwargs = {}
+    for name, parameter in inspect.signature(route.endpoint).parameters.items():
+        annotation = parameter.annotation
+        if annotation is Request:
+            kwargs[name] = request
+        elif annotation is DbSession:
+            kwargs[name] = db
+        elif annotation is AuthDbSession:
+            kwargs[name] = auth_db()
+        elif get_origin(annotation) is Annotated or isinstance(parameter.default, DependsParam):
+            raise HTTPException(status_code=400, detail="Маршрут недоступен в пакетном режиме")
+        elif name in path_params or name in query:
+            value = path_params.get(name, query.get(name))
+            try:
+                kwargs[name] = _adapter(annotation, parameter.default).validate_python(value)
+            except ValidationError as exc:
+                raise HTTPException(
+                    status_code=422, detail=f"Некорректный параметр {name}"
+                ) from exc
+        elif parameter.default is inspect.Parameter.empty:
+            raise HTTPException(status_code=422, detail=f"Не указан параметр {name}")
+        elif isinstance(parameter.default, FieldInfo):
+            kwargs[name] = parameter.default.default
+    return route.endpoint(**kwargs)
+
+
+def _execute(item: BatchSubRequest, db: Session, auth_db: Callable[[], Session]) -> dict:
+    try:
+        route, path_params, request = _resolve(item.path)
+        body = _call(route, path_params, request, db, auth_db)
+    except HTTPException as exc:
+        return {"id": item.id, "status": exc.status_code, "body": {"detail": exc.detail}}
+    if isinstance(body, Response):
+        return {"id": item.id, "status": body.status_code, "body": json.loads(body.body)}
+    return {"id": item.id, "status": 200, "body": body}
+
+
+@batch_router.post("", summary="Пакет GET-запросов к справочникам")
+def run_batch(payload: BatchRequest, db: ReadDbSession, auth_db: AuthDbSession):
+    if len(payload.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=400, detail=f"Не более {BATCH_MAX_REQUESTS} запросов в пакете"
+        )
+
+    if not payload.parallel or _batch_executor is None:
+        results = [_execute(item, db, lambda: auth_db) for item in payload.requests]
+        return jsonable_encoder(results)
+
+    bind = db.get_bind()
+
+    def run(item: BatchSubRequest) -> dict:
+        # Сессия авторизации открывается только для маршрутов, которым она нужна.
+        with Session(bind=bind) as item_db, ExitStack() as stack:
+
+            def item_auth_db() -> Session:
+                return stack.enter_context(AuthSessionLocal())
+
+            return jsonable_encoder(_execute(item, item_db, item_auth_db))
+
+    return list(_batch_executor.map(run, payload.requests))
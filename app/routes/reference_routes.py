@@ -1,6 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-
-from app.database import AuthDbSession, DbSession
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+
+from app.cache import Freshness, cached_response
+from app.database import (
+    IDENTIFIER_LOOKUP_MAX,
+    AuthDbSession,
+    AuthSessionLocal,
+    DbSession,
+    ReferenceSessionLocal,
+)
 from app.middleware.auth_middleware import get_session
 from app.schemas import (
     BankAccountCreate,
@@ -11,6 +18,7 @@ from app.schemas import (
     DetailsLLCCreate,
     DetailsPhysCreate,
     EmployeeCreate,
+    LevelBulkRequest,
     ObjectLevelCreate,
     ObjectCreate,
     ObjectUpdate,
@@ -31,18 +39,94 @@ counterparties_router = APIRouter(
     tags=["Контрагенты"],
     dependencies=base_dependencies,
 )
+changes_router = APIRouter(prefix="/changes", tags=["Изменения"], dependencies=base_dependencies)
+
+STRUCTURE_TABLES = (
+    "objects",
+    "object_levels",
+    "employees",
+    "persons",
+    "contracts",
+    "work_types",
+)
+PROFILE_TABLES = (
+    "counterparties",
+    "details_llc",
+    "details_ip",
+    "details_phys",
+    "counterparties_additional",
+    "bank_accounts",
+    "employees",
+    "persons",
+)
+SUMMARY_TABLES = (
+    "counterparty_summaries",
+    "counterparties",
+    "details_llc",
+    "details_ip",
+    "details_phys",
+    "persons",
+    "employees",
+)
+INTERNAL_EMPLOYEE_TABLES = (
+    "internal_employees",
+    "counterparties",
+    "details_llc",
+    "persons",
+    "employees",
+)
+
+SUMMARY_FRESHNESS = Freshness.from_env("SUMMARY", fresh=30, max_stale=600)
+INTERNAL_EMPLOYEE_FRESHNESS = Freshness.from_env("INTERNAL_EMPLOYEES", fresh=60, max_stale=900)
+
+
+def _identifiers(value: str) -> list[str]:
+    identifiers = sorted({item.strip() for item in value.split(",") if item.strip()})
+    if not identifiers:
+        raise HTTPException(status_code=400, detail="Не указаны реквизиты для поиска")
+    if len(identifiers) > IDENTIFIER_LOOKUP_MAX:
+        raise HTTPException(
+            status_code=400, detail=f"Не более {IDENTIFIER_LOOKUP_MAX} значений в запросе"
+        )
+    return identifiers
 
 
 @objects_router.get("", summary="Список объектов")
-def list_objects(db: DbSession):
+def list_objects(
+    request: Request, db: DbSession, fields: str | None = None, sort: str | None = None
+):
     service = ReferenceService(db)
-    return service.list_objects()
+    try:
+        return service.list_objects(fields, request.query_params, sort)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@objects_router.get("/structures", summary="Структуры нескольких объектов")
+def get_object_structures(
+    request: Request,
+    db: DbSession,
+    ids: str | None = None,
+    manager_id: str | None = None,
+):
+    if ids is None and manager_id is None:
+        raise HTTPException(status_code=400, detail="Укажите ids или manager_id")
+    object_ids = _identifiers(ids) if ids is not None else None
+    return cached_response(
+        request,
+        db,
+        STRUCTURE_TABLES,
+        lambda: ReferenceService(db).get_object_structures(object_ids, manager_id),
+    )
 
 
 @objects_router.get("/{object_id}", summary="Получить объект по ID")
-def get_object(object_id: str, db: DbSession):
+def get_object(object_id: str, db: DbSession, fields: str | None = None):
     service = ReferenceService(db)
-    obj = service.get_object(object_id)
+    try:
+        obj = service.get_object(object_id, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     if not obj:
         raise HTTPException(status_code=404, detail="Объект не найден")
     return obj
@@ -76,12 +160,14 @@ def list_object_levels(object_id: str, db: DbSession):
 
 
 @objects_router.get("/{object_id}/structure", summary="Структура объекта")
-def get_object_structure(object_id: str, db: DbSession):
-    service = ReferenceService(db)
-    data = service.get_object_structure(object_id)
-    if not data:
-        raise HTTPException(status_code=404, detail="Объект не найден")
-    return data
+def get_object_structure(object_id: str, request: Request, db: DbSession):
+    def build():
+        data = ReferenceService(db).get_object_structure(object_id)
+        if not data:
+            raise HTTPException(status_code=404, detail="Объект не найден")
+        return data
+
+    return cached_response(request, db, STRUCTURE_TABLES, build)
 
 
 @objects_router.post("/{object_id}/levels", summary="Создать уровень объекта")
@@ -93,16 +179,34 @@ def create_object_level(object_id: str, payload: ObjectLevelCreate, db: DbSessio
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
+@objects_router.post("/{object_id}/levels/bulk", summary="Пакетное изменение уровней объекта")
+def apply_level_operations(object_id: str, payload: LevelBulkRequest, db: DbSession):
+    service = ReferenceService(db)
+    try:
+        data = service.apply_level_operations(object_id, payload.operations)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if not data:
+        raise HTTPException(status_code=404, detail="Объект не найден")
+    return data
+
+
 @persons_router.get("", summary="Список лиц")
-def list_persons(db: DbSession, search: str | None = None):
+def list_persons(db: DbSession, search: str | None = None, fields: str | None = None):
     service = ReferenceService(db)
-    return service.list_persons(search)
+    try:
+        return service.list_persons(search, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @persons_router.get("/{person_id}", summary="Получить лицо по ID")
-def get_person(person_id: str, db: DbSession):
+def get_person(person_id: str, db: DbSession, fields: str | None = None):
     service = ReferenceService(db)
-    data = service.get_person(person_id)
+    try:
+        data = service.get_person(person_id, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     if not data:
         raise HTTPException(status_code=404, detail="Лицо не найдено")
     return data
@@ -115,21 +219,39 @@ def create_person(payload: PersonCreate, db: DbSession):
 
 
 @employees_router.get("", summary="Список сотрудников")
-def list_employees(db: DbSession):
+def list_employees(
+    request: Request, db: DbSession, fields: str | None = None, sort: str | None = None
+):
     service = ReferenceService(db)
-    return service.list_employees()
+    try:
+        return service.list_employees(fields, request.query_params, sort)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @employees_router.get("/{employee_id}/objects", summary="Объекты менеджера")
-def get_employee_objects(employee_id: str, db: DbSession):
+def get_employee_objects(employee_id: str, db: DbSession, fields: str | None = None):
     service = ReferenceService(db)
-    return service.list_objects_by_employee(employee_id)
+    try:
+        return service.list_objects_by_employee(employee_id, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @employees_router.get("/internal", summary="Список сотрудников по отделам")
-def list_internal_employees(db: DbSession, auth_db: AuthDbSession):
-    service = ReferenceService(db)
-    return service.list_internal_employees(auth_db)
+def list_internal_employees(request: Request, db: DbSession, auth_db: AuthDbSession):
+    def refresh():
+        with ReferenceSessionLocal() as ref_db, AuthSessionLocal() as user_db:
+            return ReferenceService(ref_db).list_internal_employees(user_db)
+
+    return cached_response(
+        request,
+        db,
+        INTERNAL_EMPLOYEE_TABLES,
+        lambda: ReferenceService(db).list_internal_employees(auth_db),
+        freshness=INTERNAL_EMPLOYEE_FRESHNESS,
+        refresh=refresh,
+    )
 
 
 @employees_router.get("/internal/departments", summary="Список отделов")
@@ -145,15 +267,23 @@ def create_employee(payload: EmployeeCreate, db: DbSession):
 
 
 @contracts_router.get("", summary="Список договоров")
-def list_contracts(db: DbSession):
+def list_contracts(
+    request: Request, db: DbSession, fields: str | None = None, sort: str | None = None
+):
     service = ReferenceService(db)
-    return service.list_contracts()
+    try:
+        return service.list_contracts(fields, request.query_params, sort)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @contracts_router.get("/{contract_id}", summary="Получить договор по ID")
-def get_contract(contract_id: str, db: DbSession):
+def get_contract(contract_id: str, db: DbSession, fields: str | None = None):
     service = ReferenceService(db)
-    data = service.get_contract(contract_id)
+    try:
+        data = service.get_contract(contract_id, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     if not data:
         raise HTTPException(status_code=404, detail="Договор не найден")
     return data
@@ -166,15 +296,21 @@ def create_contract(payload: ContractCreate, db: DbSession):
 
 
 @work_types_router.get("", summary="Список видов работ")
-def list_work_types(db: DbSession):
+def list_work_types(db: DbSession, fields: str | None = None):
     service = ReferenceService(db)
-    return service.list_work_types()
+    try:
+        return service.list_work_types(fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @work_types_router.get("/{work_type_id}", summary="Получить вид работ по ID")
-def get_work_type(work_type_id: str, db: DbSession):
+def get_work_type(work_type_id: str, db: DbSession, fields: str | None = None):
     service = ReferenceService(db)
-    data = service.get_work_type(work_type_id)
+    try:
+        data = service.get_work_type(work_type_id, fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     if not data:
         raise HTTPException(status_code=404, detail="Вид работ не найден")
     return data
@@ -188,12 +324,18 @@ def create_work_type(payload: WorkTypeCreate, db: DbSession):
 
 @counterparties_router.get("", summary="Список контрагентов")
 def list_counterparties(
+    request: Request,
     db: DbSession,
     type: str | None = None,
     is_internal: bool | None = None,
+    fields: str | None = None,
+    sort: str | None = None,
 ):
     service = ReferenceService(db)
-    return service.list_counterparties(type, is_internal)
+    try:
+        return service.list_counterparties(type, is_internal, fields, request.query_params, sort)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @counterparties_router.get("/llc/{counterparty_id}", summary="ООО: детальная информация")
@@ -229,12 +371,51 @@ def search_counterparties(q: str, db: DbSession):
     return service.search_counterparties(q)
 
 
+@counterparties_router.get("/by-inn/{inn}", summary="Контрагенты по ИНН (через запятую)")
+def find_by_inn(inn: str, request: Request, db: DbSession, kpp: str | None = None):
+    inns = _identifiers(inn)
+    return cached_response(
+        request,
+        db,
+        PROFILE_TABLES,
+        lambda: ReferenceService(db).find_counterparties_by_inn(inns, kpp),
+    )
+
+
+@counterparties_router.get("/by-ogrn/{ogrn}", summary="Контрагенты по ОГРН/ОГРНИП (через запятую)")
+def find_by_ogrn(ogrn: str, request: Request, db: DbSession):
+    ogrns = _identifiers(ogrn)
+    return cached_response(
+        request, db, PROFILE_TABLES, lambda: ReferenceService(db).find_counterparties_by_ogrn(ogrns)
+    )
+
+
 @counterparties_router.get(
     "/summary", summary="Сводная информация по всем контрагентам"
 )
-def list_counterparty_summary(db: DbSession):
-    service = ReferenceService(db)
-    return service.list_counterparty_summaries()
+def list_counterparty_summary(
+    request: Request,
+    db: DbSession,
+    type: str | None = None,
+    is_internal: bool | None = None,
+    name: str | None = None,
+    sort: str | None = None,
+):
+    def build(session=db):
+        try:
+            return ReferenceService(session).list_counterparty_summaries(
+                type, is_internal, name, sort
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    def refresh():
+        with ReferenceSessionLocal() as ref_db:
+            return build(ref_db)
+
+    return cached_response(
+        request, db, SUMMARY_TABLES, build, freshness=SUMMARY_FRESHNESS, refresh=refresh
+    )
 
 
 @counterparties_router.get(
@@ -256,12 +437,14 @@ def get_bank_accounts(counterparty_id: str, db: DbSession):
 @counterparties_router.get(
     "/{counterparty_id}/full-profile", summary="Полный профиль контрагента"
 )
-def get_full_profile(counterparty_id: str, db: DbSession):
-    service = ReferenceService(db)
-    data = service.get_full_profile(counterparty_id)
-    if not data:
-        raise HTTPException(status_code=404, detail="Контрагент не найден")
-    return data
+def get_full_profile(counterparty_id: str, request: Request, db: DbSession):
+    def build():
+        data = ReferenceService(db).get_full_profile(counterparty_id)
+        if not data:
+            raise HTTPException(status_code=404, detail="Контрагент не найден")
+        return data
+
+    return cached_response(request, db, PROFILE_TABLES, build)
 
 
 @counterparties_router.post("", summary="Создать контрагента")
@@ -309,6 +492,20 @@ def create_bank_account(counterparty_id: str, payload: BankAccountCreate, db: Db
     return service.create_bank_account(payload)
 
 
+@changes_router.get("", summary="Лента изменений справочников")
+def list_changes(
+    db: DbSession,
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    entity: str | None = None,
+):
+    service = ReferenceService(db)
+    try:
+        return service.list_changes(since, limit, entity)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
 reference_router = APIRouter()
 reference_router.include_router(objects_router)
 reference_router.include_router(persons_router)
@@ -316,3 +513,4 @@ reference_router.include_router(employees_router)
 reference_router.include_router(contracts_router)
 reference_router.include_router(work_types_router)
 reference_router.include_router(counterparties_router)
+reference_router.include_router(changes_router)
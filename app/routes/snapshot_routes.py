@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import FileResponse
+
+from app.compression import EncodedBody, accepts_gzip
+from app.database import DbSession
+from app.middleware.auth_middleware import get_session
+from app.services.reference_service import ReferenceService
+from app.snapshot import ensure_snapshot
+
+snapshot_router = APIRouter(
+    prefix="/snapshot", tags=["Снимок справочников"], dependencies=[Depends(get_session)]
+)
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip() for tag in header.split(",")}
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+
+@snapshot_router.get("", summary="Полный снимок справочников")
+def get_snapshot(request: Request, db: DbSession):
+    service = ReferenceService(db)
+    version = service.change_cursor()
+    headers = {
+        "ETag": f'W/"{version}"',
+        "Cache-Control": "no-cache",
+        "X-Snapshot-Version": str(version),
+    }
+    if _matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    path = ensure_snapshot(version, lambda: service.build_snapshot(version))
+    if accepts_gzip(request):
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+        return FileResponse(path, media_type="application/json", headers=headers)
+    return EncodedBody(gzipped=path.read_bytes()).response(request, headers=headers)
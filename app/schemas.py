@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -161,3 +161,25 @@ class ObjectLevelCreate(BaseModel):
     contract_id: Optional[str] = None
     parent_id: Optional[str] = None
     created_at: Optional[datetime] = None
+
+
+class LevelOperation(BaseModel):
+    op: Literal["move", "renumber", "activate", "deactivate"]
+    level_id: str
+    parent_id: str | None = Field(None, description="move: новый родитель, пусто — корень")
+    level_number: int | None = Field(None, description="renumber: новый номер")
+    subtree: bool = Field(False, description="activate/deactivate: вместе с потомками")
+
+
+class LevelBulkRequest(BaseModel):
+    operations: list[LevelOperation] = Field(..., min_length=1)
+
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None
+    path: str = Field(..., description="GET-путь, например /objects?fields=id,short_name")
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchSubRequest] = Field(..., min_length=1)
+    parallel: bool = False
@@ -0,0 +1,79 @@
+from collections.abc import Iterable
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.reference import (
+    BankAccountDB,
+    ChangeLogDB,
+    ContractDB,
+    CounterpartyAdditionalDB,
+    CounterpartyDB,
+    DetailsIPDB,
+    DetailsLLCDB,
+    DetailsPhysDB,
+    EmployeeDB,
+    ObjectDB,
+    ObjectLevelDB,
+    PersonDB,
+    WorkTypeDB,
+)
+
+ENTITY_MODELS = {
+    CounterpartyDB: "counterparty",
+    PersonDB: "person",
+    EmployeeDB: "employee",
+    ObjectDB: "object",
+    ObjectLevelDB: "level",
+    ContractDB: "contract",
+    WorkTypeDB: "work_type",
+}
+
+# Реквизиты, счета и доп. ОКВЭД отражаются в ленте как изменение контрагента.
+COUNTERPARTY_PARTS = {
+    DetailsLLCDB: lambda row: row.counterparties_id,
+    DetailsIPDB: lambda row: row.counterparty_id,
+    DetailsPhysDB: lambda row: row.counterparty_id,
+    BankAccountDB: lambda row: row.counterparty_id,
+    CounterpartyAdditionalDB: lambda row: row.counterparty_id,
+}
+
+
+def _change_key(instance) -> tuple[str, str] | None:
+    model = type(instance)
+    if model in ENTITY_MODELS:
+        return ENTITY_MODELS[model], instance.id
+    if model in COUNTERPARTY_PARTS:
+        return "counterparty", COUNTERPARTY_PARTS[model](instance)
+    return None
+
+
+def record_changes(
+    db: Session, entity: str, entity_ids: Iterable[str], action: str = "update"
+) -> None:
+    now = datetime.utcnow()
+    db.add_all(
+        ChangeLogDB(entity=entity, entity_id=entity_id, action=action, changed_at=now)
+        for entity_id in dict.fromkeys(entity_ids)
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changes(session: Session, flush_context, instances) -> None:
+    changes: dict[tuple[str, str], str] = {}
+    for instance in session.new:
+        key = _change_key(instance)
+        if key and changes.get(key) != "create":
+            changes[key] = "create" if type(instance) in ENTITY_MODELS else "update"
+    for instance in session.dirty:
+        key = _change_key(instance)
+        if key and session.is_modified(instance):
+            changes.setdefault(key, "update")
+
+    now = datetime.utcnow()
+    session.add_all(
+        ChangeLogDB(entity=entity, entity_id=entity_id, action=action, changed_at=now)
+        for (entity, entity_id), action in changes.items()
+        if entity_id
+    )
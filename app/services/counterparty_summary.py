@@ -0,0 +1,264 @@
+import logging
+from collections.abc import Collection
+from datetime import datetime
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from app.cache import invalidate_tables
+from app.database import EDGE_DATABASE, ReferenceSessionLocal
+from app.lifespan import register_warmup
+from app.models.reference import (
+    CounterpartyDB,
+    CounterpartySummaryDB,
+    DetailsIPDB,
+    DetailsLLCDB,
+    DetailsPhysDB,
+    EmployeeDB,
+    PersonDB,
+)
+
+logger = logging.getLogger(__name__)
+
+OPF_NAMES = {"LLC": "ООО", "IP": "ИП", "PHYSIC": "Физлицо"}
+
+_DIRTY_COUNTERPARTIES = "summary_dirty_counterparties"
+_DIRTY_PERSONS = "summary_dirty_persons"
+
+_COUNTERPARTY_COLUMN = {
+    CounterpartyDB: "id",
+    DetailsLLCDB: "counterparties_id",
+    DetailsIPDB: "counterparty_id",
+    DetailsPhysDB: "counterparty_id",
+    EmployeeDB: "counterparty_id",
+}
+
+
+def build_counterparty_summaries(
+    db: Session, counterparty_ids: Collection[str] | None = None, locking: bool = False
+) -> list[dict]:
+    def read(query):
+        # Блокирующее чтение видит последние зафиксированные строки, а не снимок
+        # транзакции, сделанный до того, как она дождалась блокировки.
+        return query.with_for_update(read=True) if locking else query
+
+    query = db.query(CounterpartyDB)
+    if counterparty_ids is not None:
+        if not counterparty_ids:
+            return []
+        query = query.filter(CounterpartyDB.id.in_(counterparty_ids))
+    counterparties = read(query).all()
+    if not counterparties:
+        return []
+
+    counterparty_ids = [cp.id for cp in counterparties]
+
+    llc_rows = read(
+        db.query(DetailsLLCDB).filter(DetailsLLCDB.counterparties_id.in_(counterparty_ids))
+    ).all()
+    ip_rows = read(
+        db.query(DetailsIPDB).filter(DetailsIPDB.counterparty_id.in_(counterparty_ids))
+    ).all()
+    phys_rows = read(
+        db.query(DetailsPhysDB).filter(DetailsPhysDB.counterparty_id.in_(counterparty_ids))
+    ).all()
+
+    llc_by_id = {row.counterparties_id: row for row in llc_rows}
+    ip_by_id = {row.counterparty_id: row for row in ip_rows}
+    phys_by_id = {row.counterparty_id: row for row in phys_rows}
+
+    person_ids = set()
+    for row in llc_rows:
+        person_ids.add(row.director_person_id)
+    for row in ip_rows:
+        person_ids.add(row.person_id)
+    for row in phys_rows:
+        person_ids.add(row.person_id)
+
+    persons = (
+        read(db.query(PersonDB).filter(PersonDB.id.in_(person_ids))).all() if person_ids else []
+    )
+    persons_by_id = {person.id: person for person in persons}
+
+    employees = (
+        read(
+            db.query(EmployeeDB)
+            .filter(EmployeeDB.counterparty_id.in_(counterparty_ids))
+            .filter(EmployeeDB.person_id.in_(person_ids))
+        ).all()
+        if person_ids
+        else []
+    )
+    employee_by_contact: dict[tuple[str, str], EmployeeDB] = {}
+    for employee in employees:
+        employee_by_contact.setdefault((employee.counterparty_id, employee.person_id), employee)
+
+    def pick_contact(counterparty_id: str, person_id: str | None):
+        if not person_id:
+            return None, None
+        preferred = employee_by_contact.get((counterparty_id, person_id))
+        person = persons_by_id.get(person_id)
+        phone = (
+            preferred.phone_work
+            if preferred and preferred.phone_work
+            else person.phone_personal
+            if person
+            else None
+        )
+        email = (
+            preferred.email_work
+            if preferred and preferred.email_work
+            else person.email_personal
+            if person
+            else None
+        )
+        return phone, email
+
+    now = datetime.utcnow()
+    result = []
+    for cp in counterparties:
+        address = None
+        inn = None
+        ogrn = None
+        kpp = None
+        person_id = None
+
+        if cp.type == "LLC":
+            details = llc_by_id.get(cp.id)
+            if details:
+                address = details.legal_address
+                inn = details.inn
+                ogrn = details.ogrn
+                kpp = details.kpp
+                person_id = details.director_person_id
+        elif cp.type == "IP":
+            details = ip_by_id.get(cp.id)
+            if details:
+                inn = details.inn
+                ogrn = details.ogrnip
+                person_id = details.person_id
+        elif cp.type == "PHYSIC":
+            details = phys_by_id.get(cp.id)
+            if details:
+                address = details.address_registration
+                inn = details.inn
+                person_id = details.person_id
+
+        phone, email = pick_contact(cp.id, person_id)
+        if cp.type == "PHYSIC":
+            details = phys_by_id.get(cp.id)
+            if details:
+                phone = details.phone or phone
+                email = details.email or email
+
+        result.append(
+            {
+                "counterparty_id": cp.id,
+                "type": cp.type,
+                "short_name": cp.short_name,
+                "full_name": cp.full_name,
+                "is_internal": bool(cp.is_internal),
+                "opf": OPF_NAMES.get(cp.type, cp.type),
+                "address": address,
+                "phone": phone,
+                "email": email,
+                "inn": inn,
+                "ogrn": ogrn,
+                "kpp": kpp,
+                "inn_ogrn_kpp": "/".join([inn or "-", ogrn or "-", kpp or "-"]),
+                "updated_at": now,
+            }
+        )
+
+    return result
+
+
+def refresh_counterparty_summaries(db: Session, counterparty_ids: Collection[str]) -> None:
+    if not counterparty_ids:
+        return
+    # Параллельные транзакции по одному контрагенту пересобирают его строку по очереди:
+    # иначе более поздняя фиксация может затереть строку, собранную по новым данным.
+    db.execute(
+        select(CounterpartyDB.id)
+        .where(CounterpartyDB.id.in_(counterparty_ids))
+        .order_by(CounterpartyDB.id)
+        .with_for_update()
+    )
+    rows = build_counterparty_summaries(db, counterparty_ids, locking=True)
+    db.execute(
+        delete(CounterpartySummaryDB).where(
+            CounterpartySummaryDB.counterparty_id.in_(counterparty_ids)
+        )
+    )
+    if rows:
+        db.execute(insert(CounterpartySummaryDB), rows)
+    invalidate_tables(db, CounterpartySummaryDB.__tablename__)
+
+
+def rebuild_counterparty_summaries(db: Session, chunk_size: int = 1000) -> int:
+    rows = build_counterparty_summaries(db)
+    db.execute(delete(CounterpartySummaryDB))
+    for start in range(0, len(rows), chunk_size):
+        db.execute(insert(CounterpartySummaryDB), rows[start : start + chunk_size])
+    invalidate_tables(db, CounterpartySummaryDB.__tablename__)
+    db.commit()
+    return len(rows)
+
+
+@register_warmup
+def backfill_counterparty_summaries() -> None:
+    if EDGE_DATABASE:
+        return
+    with ReferenceSessionLocal() as db:
+        if db.query(CounterpartySummaryDB.counterparty_id).first() is not None:
+            return
+        if db.query(CounterpartyDB.id).first() is None:
+            return
+        count = rebuild_counterparty_summaries(db)
+    logger.info("Сводка контрагентов была пуста, заполнено строк: %d", count)
+
+
+def _counterparties_of_persons(db: Session, person_ids: Collection[str]) -> set[str]:
+    queries = [
+        db.query(DetailsLLCDB.counterparties_id).filter(
+            DetailsLLCDB.director_person_id.in_(person_ids)
+        ),
+        db.query(DetailsIPDB.counterparty_id).filter(DetailsIPDB.person_id.in_(person_ids)),
+        db.query(DetailsPhysDB.counterparty_id).filter(DetailsPhysDB.person_id.in_(person_ids)),
+        db.query(EmployeeDB.counterparty_id).filter(EmployeeDB.person_id.in_(person_ids)),
+    ]
+    return {row[0] for query in queries for row in query.all()}
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_dirty(session: Session, flush_context, instances) -> None:
+    for instance in [*session.new, *session.dirty, *session.deleted]:
+        model = type(instance)
+        if model is PersonDB:
+            if instance in session.dirty and session.is_modified(instance):
+                session.info.setdefault(_DIRTY_PERSONS, set()).add(instance.id)
+        elif model in _COUNTERPARTY_COLUMN:
+            if instance in session.dirty and not session.is_modified(instance):
+                continue
+            column = _COUNTERPARTY_COLUMN[model]
+            dirty = session.info.setdefault(_DIRTY_COUNTERPARTIES, set())
+            dirty.add(getattr(instance, column))
+            # Строка, перенесённая к другому контрагенту, меняет и сводку прежнего.
+            dirty.update(inspect(instance).attrs[column].history.deleted)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_on_commit(session: Session) -> None:
+    session.flush()
+    counterparty_ids = session.info.pop(_DIRTY_COUNTERPARTIES, set())
+    person_ids = session.info.pop(_DIRTY_PERSONS, set())
+    if person_ids:
+        counterparty_ids |= _counterparties_of_persons(session, person_ids)
+    counterparty_ids.discard(None)
+    refresh_counterparty_summaries(session, counterparty_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_dirty(session: Session) -> None:
+    session.info.pop(_DIRTY_COUNTERPARTIES, None)
+    session.info.pop(_DIRTY_PERSONS, None)
@@ -0,0 +1,63 @@
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from sqlalchemy.orm import Query, Session
+
+
+class Field:
+    __slots__ = ("build", "columns", "joins")
+
+    def __init__(
+        self,
+        columns: dict[str, Any],
+        build: Callable[[Any], Any],
+        joins: tuple[str, ...] = (),
+    ) -> None:
+        self.columns = columns
+        self.build = build
+        self.joins = joins
+
+
+def column(name: str, expression, *joins: str, convert: Callable[[Any], Any] | None = None):
+    if convert is None:
+        return Field({name: expression}, lambda row: row._mapping[name], joins)
+    return Field({name: expression}, lambda row: convert(row._mapping[name]), joins)
+
+
+class Projection:
+    def __init__(self, base, fields: dict[str, Field], joins: dict[str, tuple] | None = None):
+        self.base = base
+        self.fields = fields
+        self.joins = joins or {}
+
+    def parse(self, fields: str | None, allowed: Iterable[str] | None = None) -> list[str]:
+        allowed = list(self.fields if allowed is None else allowed)
+        requested = {name.strip() for name in (fields or "").split(",") if name.strip()}
+        if not requested:
+            return allowed
+        unknown = requested.difference(allowed)
+        if unknown:
+            raise ValueError(f"Недопустимые поля: {', '.join(sorted(unknown))}")
+        return [name for name in allowed if name in requested]
+
+    def query(self, db: Session, selected: Iterable[str], **extra) -> Query:
+        columns = dict(extra)
+        required = set()
+        for name in selected:
+            field = self.fields.get(name)
+            if field:
+                columns.update(field.columns)
+                required.update(field.joins)
+
+        query = db.query(*(expression.label(label) for label, expression in columns.items()))
+        query = query.select_from(self.base)
+        # Внутренние соединения отсекают строки, поэтому нужны при любом наборе полей.
+        for name, (target, onclause, outer) in self.joins.items():
+            if not outer:
+                query = query.join(target, onclause)
+            elif name in required:
+                query = query.outerjoin(target, onclause)
+        return query
+
+    def row(self, row, selected: Iterable[str]) -> dict:
+        return {name: self.fields[name].build(row) for name in selected if name in self.fields}
@@ -0,0 +1,116 @@
+from collections.abc import Callable, Mapping
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.orm import Query
+
+OPERATORS = ("eq", "in", "prefix", "gte", "lte")
+# Параметры маршрута, которые приходят вместе с фильтрами и фильтрами не являются
+ROUTE_PARAMS = ("fields", "sort")
+
+
+def boolean(value: str) -> bool:
+    normalized = value.strip().lower()
+    if normalized in ("1", "true", "yes"):
+        return True
+    if normalized in ("0", "false", "no"):
+        return False
+    raise ValueError(value)
+
+
+def timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.strip())
+
+
+class Filter:
+    __slots__ = ("convert", "expression", "indexed", "operators")
+
+    def __init__(
+        self,
+        expression,
+        *operators: str,
+        convert: Callable[[str], Any] = str,
+        indexed: bool = True,
+    ) -> None:
+        self.expression = expression
+        self.operators = operators or ("eq", "in")
+        self.convert = convert
+        self.indexed = indexed
+
+    def condition(self, operator: str, value: Any):
+        if operator == "eq":
+            return self.expression == value
+        if operator == "in":
+            return self.expression.in_(value)
+        if operator == "prefix":
+            return self.expression.startswith(value, autoescape=True)
+        if operator == "gte":
+            return self.expression >= value
+        return self.expression <= value
+
+
+class FilterSet:
+    def __init__(
+        self,
+        filters: dict[str, Filter],
+        sorts: dict[str, Any] | None = None,
+        large: bool = True,
+        params: tuple[str, ...] = ROUTE_PARAMS,
+    ) -> None:
+        self.filters = filters
+        self.sorts = sorts or {}
+        self.large = large
+        self.params = params
+
+    def conditions(self, params: Mapping[str, str]) -> list:
+        conditions = []
+        indexed = False
+        for key, raw in params.items():
+            name, _, operator = key.partition("__")
+            item = self.filters.get(name)
+            if item is None:
+                if operator or key not in self.params:
+                    raise ValueError(f"Неизвестный фильтр {key}")
+                continue
+            operator = operator or "eq"
+            if operator not in item.operators:
+                raise ValueError(f"Оператор {operator} недоступен для поля {name}")
+            try:
+                if operator == "in":
+                    value = [item.convert(part) for part in raw.split(",") if part.strip()]
+                else:
+                    value = item.convert(raw)
+            except ValueError as exc:
+                raise ValueError(f"Некорректное значение фильтра {key}") from exc
+            conditions.append(item.condition(operator, value))
+            indexed = indexed or item.indexed
+        if self.large and conditions and not indexed:
+            raise ValueError(
+                "Фильтр требует полного просмотра таблицы: "
+                f"добавьте условие по одному из полей {', '.join(self._indexed_names())}"
+            )
+        return conditions
+
+    def order_by(self, sort: str | None) -> list:
+        columns = []
+        for item in (sort or "").split(","):
+            name = item.strip()
+            if not name:
+                continue
+            column = self.sorts.get(name.lstrip("-"))
+            if column is None:
+                raise ValueError("Недопустимое поле сортировки")
+            columns.append(column.desc() if name.startswith("-") else column)
+        return columns
+
+    def apply(self, query: Query, params: Mapping[str, str] | None, sort: str | None) -> Query:
+        conditions = self.conditions(params or {})
+        if conditions:
+            query = query.filter(*conditions)
+        columns = self.order_by(sort)
+        if columns:
+            query = query.order_by(*columns)
+        return query
+
+    def _indexed_names(self) -> list[str]:
+        return [name for name, item in self.filters.items() if item.indexed]
@@ -0,0 +1,112 @@
+from collections.abc import Iterable
+from typing import Any
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_LOADER_KEY = "reference_loader"
+
+
+class Loader:
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        self._by_pk: dict[type, dict[Any, Any]] = {}
+        self._pending: dict[type, set] = {}
+        self._by_fk: dict[tuple[type, str], dict[Any, list]] = {}
+        self._pending_fk: dict[tuple[type, str], set] = {}
+
+    @classmethod
+    def of(cls, db: Session) -> "Loader":
+        loader = db.info.get(_LOADER_KEY)
+        if loader is None:
+            loader = db.info[_LOADER_KEY] = cls(db)
+        return loader
+
+    def clear(self) -> None:
+        self._by_pk.clear()
+        self._pending.clear()
+        self._by_fk.clear()
+        self._pending_fk.clear()
+
+    def prefetch(self, model: type, keys: Iterable) -> None:
+        cached = self._by_pk.get(model, {})
+        pending = self._pending.setdefault(model, set())
+        pending.update(key for key in keys if key is not None and key not in cached)
+
+    def prefetch_by(self, model: type, column: str, keys: Iterable) -> None:
+        cached = self._by_fk.get((model, column), {})
+        pending = self._pending_fk.setdefault((model, column), set())
+        pending.update(key for key in keys if key is not None and key not in cached)
+
+    def prime(self, model: type, rows: Iterable) -> None:
+        primary_key = inspect(model).primary_key
+        if len(primary_key) != 1:
+            return
+        key_name = primary_key[0].key
+        cached = self._by_pk.setdefault(model, {})
+        for row in rows:
+            if row is not None:
+                cached[getattr(row, key_name)] = row
+
+    def load_many(self, model: type, keys: Iterable) -> dict:
+        keys = {key for key in keys if key is not None}
+        self.prefetch(model, keys)
+        self._resolve(model)
+        cached = self._by_pk.get(model, {})
+        return {key: cached[key] for key in keys if cached.get(key) is not None}
+
+    def load(self, model: type, key):
+        if key is None:
+            return None
+        return self.load_many(model, [key]).get(key)
+
+    def load_many_by(self, model: type, column: str, keys: Iterable) -> dict[Any, list]:
+        keys = {key for key in keys if key is not None}
+        self.prefetch_by(model, column, keys)
+        self._resolve_by(model, column)
+        cached = self._by_fk.get((model, column), {})
+        return {key: cached.get(key, []) for key in keys}
+
+    def load_by(self, model: type, column: str, key) -> list:
+        if key is None:
+            return []
+        return self.load_many_by(model, column, [key])[key]
+
+    def _resolve_by(self, model: type, column: str) -> None:
+        pending = self._pending_fk.pop((model, column), None)
+        if not pending:
+            return
+        rows = (
+            self.db.query(model)
+            .filter(getattr(model, column).in_(pending))
+            .order_by(*inspect(model).primary_key)
+            .all()
+        )
+        cached = self._by_fk.setdefault((model, column), {})
+        for key in pending:
+            cached[key] = []
+        for row in rows:
+            cached[getattr(row, column)].append(row)
+        self.prime(model, rows)
+
+    def _resolve(self, model: type) -> None:
+        pending = self._pending.pop(model, None)
+        if not pending:
+            return
+        primary_key = inspect(model).primary_key[0]
+        rows = self.db.query(model).filter(primary_key.in_(pending)).all()
+        cached = self._by_pk.setdefault(model, {})
+        for key in pending:
+            cached.setdefault(key, None)
+        self.prime(model, rows)
+
+
+def _clear_loader(session: Session, *args) -> None:
+    loader = session.info.get(_LOADER_KEY)
+    if loader is not None:
+        loader.clear()
+
+
+event.listen(Session, "after_flush", _clear_loader)
+event.listen(Session, "after_commit", _clear_loader)
+event.listen(Session, "after_rollback", _clear_loader)
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
 import uuid
-from datetime import datetime
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any
 
-from sqlalchemy import bindparam, or_, text
+from sqlalchemy import bindparam, delete, func, or_, select, text, union, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
+from app.cache import invalidate_tables, query_cache
+from app.database import CHANGE_FEED_SETTLE_SECONDS, PROFILE_QUERY_WORKERS
 from app.models.reference import (
     BankAccountDB,
+    ChangeLogDB,
     ContractDB,
     CounterpartyAdditionalDB,
     CounterpartyDB,
+    CounterpartySummaryDB,
     DetailsIPDB,
     DetailsLLCDB,
     DetailsPhysDB,
@@ -31,12 +38,39 @@ from app.schemas import (
     DetailsLLCCreate,
     DetailsPhysCreate,
     EmployeeCreate,
+    LevelOperation,
     ObjectLevelCreate,
     ObjectCreate,
     ObjectUpdate,
     PersonCreate,
     WorkTypeCreate,
 )
+from app.services.change_log import ENTITY_MODELS, record_changes
+from app.services.counterparty_summary import rebuild_counterparty_summaries
+from app.services.fields import Field, Projection, column
+from app.services.filters import Filter, FilterSet, boolean, timestamp
+from app.services.loader import Loader
+
+SNAPSHOT_TABLES = {
+    "counterparties": CounterpartyDB,
+    "details_llc": DetailsLLCDB,
+    "details_ip": DetailsIPDB,
+    "details_phys": DetailsPhysDB,
+    "counterparties_additional": CounterpartyAdditionalDB,
+    "bank_accounts": BankAccountDB,
+    "persons": PersonDB,
+    "employees": EmployeeDB,
+    "internal_employees": InternalEmployeeDB,
+    "contracts": ContractDB,
+    "work_types": WorkTypeDB,
+}
+
+SUMMARY_SORT_COLUMNS = {
+    "short_name": CounterpartySummaryDB.short_name,
+    "full_name": CounterpartySummaryDB.full_name,
+    "opf": CounterpartySummaryDB.opf,
+    "inn": CounterpartySummaryDB.inn,
+}
 
 
 def _full_name(person: PersonDB) -> str:
@@ -44,111 +78,262 @@ def _full_name(person: PersonDB) -> str:
     return " ".join(part for part in parts if part)
 
 
+def _manager(row):
+    if not row.manager_employee_id or not row.manager_person_id:
+        return None
+    return {
+        "id": row.manager_employee_id,
+        "name": row.manager_name,
+        "last_name": row.manager_last_name,
+        "position": row.manager_position,
+    }
+
+
+OBJECT_PROJECTION = Projection(
+    ObjectDB,
+    {
+        "id": column("id", ObjectDB.id),
+        "short_name": column("short_name", ObjectDB.short_name),
+        "full_name": column("full_name", ObjectDB.full_name),
+        "address": column("address", ObjectDB.address),
+        "is_active": column("is_active", ObjectDB.is_active, convert=bool),
+        "manager": Field(
+            {
+                "manager_employee_id": EmployeeDB.id,
+                "manager_person_id": PersonDB.id,
+                "manager_name": PersonDB.name,
+                "manager_last_name": PersonDB.last_naem,
+                "manager_position": EmployeeDB.position,
+            },
+            _manager,
+            joins=("employee", "person"),
+        ),
+        "created_at": column("created_at", ObjectDB.created_at),
+        "updated_at": column("updated_at", ObjectDB.updated_at),
+    },
+    joins={
+        "employee": (EmployeeDB, ObjectDB.manager_id == EmployeeDB.id, True),
+        "person": (PersonDB, EmployeeDB.person_id == PersonDB.id, True),
+    },
+)
+OBJECT_FIELDS_WITHOUT_MANAGER = [name for name in OBJECT_PROJECTION.fields if name != "manager"]
+
+EMPLOYEE_PROJECTION = Projection(
+    EmployeeDB,
+    {
+        "id": column("id", EmployeeDB.id),
+        "counterparty_id": column("counterparty_id", EmployeeDB.counterparty_id),
+        "counterparty_name": column("counterparty_name", CounterpartyDB.short_name, "counterparty"),
+        "person_id": column("person_id", EmployeeDB.person_id),
+        "name": column("name", PersonDB.name, "person"),
+        "last_name": column("last_name", PersonDB.last_naem, "person"),
+        "middle_name": column("middle_name", PersonDB.middle_name, "person"),
+        "position": column("position", EmployeeDB.position),
+        "role": column("role", EmployeeDB.role_type),
+        "phone_work": column("phone_work", EmployeeDB.phone_work),
+        "phone_extra": column("phone_extra", EmployeeDB.phone_extra),
+        "email_work": column("email_work", EmployeeDB.email_work),
+        "email_extra": column("email_extra", EmployeeDB.email_extra),
+        "comment": column("comment", EmployeeDB.comment),
+    },
+    joins={
+        "person": (PersonDB, EmployeeDB.person_id == PersonDB.id, False),
+        "counterparty": (CounterpartyDB, EmployeeDB.counterparty_id == CounterpartyDB.id, False),
+    },
+)
+
+COUNTERPARTY_PROJECTION = Projection(
+    CounterpartyDB,
+    {
+        "id": column("id", CounterpartyDB.id),
+        "type": column("type", CounterpartyDB.type),
+        "short_name": column("short_name", CounterpartyDB.short_name),
+        "full_name": column("full_name", CounterpartyDB.full_name),
+        "is_internal": column("is_internal", CounterpartyDB.is_internal, convert=bool),
+        "contract_prefix": column("contract_prefix", CounterpartyDB.contract_prefix),
+        "created_at": column("created_at", CounterpartyDB.created_at),
+    },
+)
+
+PERSON_PROJECTION = Projection(
+    PersonDB,
+    {
+        "id": column("id", PersonDB.id),
+        "user_id": column("user_id", PersonDB.user_id),
+        "name": column("name", PersonDB.name),
+        "last_name": column("last_name", PersonDB.last_naem),
+        "middle_name": column("middle_name", PersonDB.middle_name),
+        "full_name": Field(
+            {
+                "full_name_last": PersonDB.last_naem,
+                "full_name_first": PersonDB.name,
+                "full_name_middle": PersonDB.middle_name,
+            },
+            lambda row: " ".join(
+                part
+                for part in [row.full_name_last, row.full_name_first, row.full_name_middle]
+                if part
+            ),
+        ),
+        "phone": column("phone", PersonDB.phone_personal),
+        "email": column("email", PersonDB.email_personal),
+        "birth_date": column("birth_date", PersonDB.birth_date),
+    },
+)
+PERSON_FIELDS = [*PERSON_PROJECTION.fields, "companies"]
+
+CONTRACT_PROJECTION = Projection(
+    ContractDB,
+    {
+        "id": column("id", ContractDB.id),
+        "contract_id": column("contract_id", ContractDB.contract_id),
+        "name": column("name", ContractDB.name),
+    },
+)
+
+OBJECT_FILTERS = FilterSet(
+    {
+        "id": Filter(ObjectDB.id),
+        "manager_id": Filter(ObjectDB.manager_id),
+        "short_name": Filter(ObjectDB.short_name, "eq", "prefix"),
+        "created_at": Filter(ObjectDB.created_at, "gte", "lte", convert=timestamp),
+        "is_active": Filter(ObjectDB.is_active, "eq", convert=boolean, indexed=False),
+    },
+    sorts={
+        "id": ObjectDB.id,
+        "short_name": ObjectDB.short_name,
+        "created_at": ObjectDB.created_at,
+    },
+)
+
+COUNTERPARTY_FILTERS = FilterSet(
+    {
+        "id": Filter(CounterpartyDB.id),
+        "type": Filter(CounterpartyDB.type),
+        "short_name": Filter(CounterpartyDB.short_name, "eq", "prefix"),
+        "created_at": Filter(CounterpartyDB.created_at, "gte", "lte", convert=timestamp),
+        "is_internal": Filter(CounterpartyDB.is_internal, "eq", convert=boolean, indexed=False),
+    },
+    sorts={
+        "id": CounterpartyDB.id,
+        "short_name": CounterpartyDB.short_name,
+        "created_at": CounterpartyDB.created_at,
+    },
+)
+
+EMPLOYEE_FILTERS = FilterSet(
+    {
+        "id": Filter(EmployeeDB.id),
+        "counterparty_id": Filter(EmployeeDB.counterparty_id),
+        "person_id": Filter(EmployeeDB.person_id),
+        "role_type": Filter(EmployeeDB.role_type),
+    },
+    sorts={"id": EmployeeDB.id, "role_type": EmployeeDB.role_type},
+)
+
+CONTRACT_FILTERS = FilterSet(
+    {
+        "id": Filter(ContractDB.id),
+        "contract_id": Filter(ContractDB.contract_id),
+    },
+    sorts={"id": ContractDB.id, "contract_id": ContractDB.contract_id},
+    large=False,
+)
+
+WORK_TYPE_PROJECTION = Projection(
+    WorkTypeDB,
+    {
+        "id": column("id", WorkTypeDB.id),
+        "name": column("name", WorkTypeDB.name),
+    },
+)
+
+
+# Общий ограниченный пул для параллельных подзапросов профиля: его соединения
+# заложены в max_overflow пула (см. app.database).
+_query_executor = (
+    ThreadPoolExecutor(max_workers=PROFILE_QUERY_WORKERS, thread_name_prefix="profile-query")
+    if PROFILE_QUERY_WORKERS > 1
+    else None
+)
+
+
+def _employee_of(employees: list, counterparty_id: str):
+    return next((row for row in employees if row.counterparty_id == counterparty_id), None)
+
+
 class ReferenceService:
     def __init__(self, db: Session) -> None:
         self.db = db
+        self.loader = Loader.of(db)
+
+    def _run_concurrently(
+        self, *queries: Callable[[Session], Any], parallel: bool = True
+    ) -> list[Any]:
+        if not parallel or _query_executor is None or len(queries) < 2:
+            return [query(self.db) for query in queries]
+
+        bind = self.db.get_bind()
+
+        def run(query: Callable[[Session], Any]):
+            with Session(bind=bind) as session:
+                return query(session)
+
+        return list(_query_executor.map(run, queries))
 
     def _validate_manager_id(self, manager_id: str | None):
         if manager_id is None:
             return
-        exists = self.db.query(EmployeeDB.id).filter(EmployeeDB.id == manager_id).first()
-        if not exists:
+        if self.loader.load(EmployeeDB, manager_id) is None:
             raise ValueError("manager_id не найден в таблице employees")
 
-    def list_objects(self):
-        rows = (
-            self.db.query(ObjectDB, EmployeeDB, PersonDB)
-            .outerjoin(EmployeeDB, ObjectDB.manager_id == EmployeeDB.id)
-            .outerjoin(PersonDB, EmployeeDB.person_id == PersonDB.id)
-            .all()
-        )
-        result = []
-        for obj, employee, person in rows:
-            manager = None
-            if employee and person:
-                manager = {
-                    "id": employee.id,
-                    "name": person.name,
-                    "last_name": person.last_naem,
-                    "position": employee.position,
-                }
-            result.append(
-                {
-                    "id": obj.id,
-                    "short_name": obj.short_name,
-                    "full_name": obj.full_name,
-                    "address": obj.address,
-                    "is_active": bool(obj.is_active),
-                    "manager": manager,
-                    "created_at": obj.created_at,
-                    "updated_at": obj.updated_at,
-                }
-            )
-        return result
-
-    def get_object(self, object_id: str):
-        row = (
-            self.db.query(ObjectDB, EmployeeDB, PersonDB)
-            .outerjoin(EmployeeDB, ObjectDB.manager_id == EmployeeDB.id)
-            .outerjoin(PersonDB, EmployeeDB.person_id == PersonDB.id)
-            .filter(ObjectDB.id == object_id)
-            .first()
+    def list_objects(
+        self,
+        fields: str | None = None,
+        filters: Mapping[str, str] | None = None,
+        sort: str | None = None,
+    ):
+        selected = OBJECT_PROJECTION.parse(fields)
+        query = OBJECT_FILTERS.apply(OBJECT_PROJECTION.query(self.db, selected), filters, sort)
+        rows = query_cache.all(self.db, query)
+        return [OBJECT_PROJECTION.row(row, selected) for row in rows]
+
+    def get_object(self, object_id: str, fields: str | None = None):
+        selected = OBJECT_PROJECTION.parse(fields)
+        row = query_cache.first(
+            self.db, OBJECT_PROJECTION.query(self.db, selected).filter(ObjectDB.id == object_id)
         )
         if not row:
             return None
-        obj, employee, person = row
-        manager = None
-        if employee and person:
-            manager = {
-                "id": employee.id,
-                "name": person.name,
-                "last_name": person.last_naem,
-                "position": employee.position,
-            }
-        return {
-            "id": obj.id,
-            "short_name": obj.short_name,
-            "full_name": obj.full_name,
-            "address": obj.address,
-            "is_active": bool(obj.is_active),
-            "manager": manager,
-            "created_at": obj.created_at,
-            "updated_at": obj.updated_at,
-        }
+        return OBJECT_PROJECTION.row(row, selected)
 
-    def list_object_levels(self, object_id: str):
-        rows = (
+    def _level_query(self):
+        return (
             self.db.query(ObjectLevelDB, ContractDB, WorkTypeDB)
             .outerjoin(ContractDB, ObjectLevelDB.contract_id == ContractDB.id)
             .outerjoin(WorkTypeDB, ObjectLevelDB.work_type == WorkTypeDB.id)
-            .filter(ObjectLevelDB.object_id == object_id)
             .order_by(ObjectLevelDB.level_number, ObjectLevelDB.created_at)
-            .all()
         )
-        return [
-            {
-                "id": level.id,
-                "object_id": level.object_id,
-                "name": level.name,
-                "level_type": level.level_type,
-                "level_number": level.level_number,
-                "is_active": bool(level.is_active),
-                "work_type_id": level.work_type,
-                "work_type_name": work_type.name if work_type else None,
-                "contract_id": level.contract_id,
-                "contract_name": contract.name if contract else None,
-                "parent_id": level.parent_id,
-                "created_at": level.created_at,
-            }
-            for level, contract, work_type in rows
-        ]
 
-    def get_object_structure(self, object_id: str):
-        obj = self.get_object(object_id)
-        if not obj:
-            return None
+    @staticmethod
+    def _level_row(level: ObjectLevelDB, contract: ContractDB | None, work_type: WorkTypeDB | None):
+        return {
+            "id": level.id,
+            "object_id": level.object_id,
+            "name": level.name,
+            "level_type": level.level_type,
+            "level_number": level.level_number,
+            "is_active": bool(level.is_active),
+            "work_type_id": level.work_type,
+            "work_type_name": work_type.name if work_type else None,
+            "contract_id": level.contract_id,
+            "contract_name": contract.name if contract else None,
+            "parent_id": level.parent_id,
+            "created_at": level.created_at,
+        }
 
-        levels = self.list_object_levels(object_id)
+    @staticmethod
+    def _structure(obj: dict, levels: list[dict]) -> dict:
         nodes = {}
         for item in levels:
             node = dict(item)
@@ -176,62 +361,83 @@ class ReferenceService:
             "children": roots,
         }
 
-    def list_counterparties(self, counterparty_type: str | None, is_internal: bool | None):
-        query = self.db.query(CounterpartyDB)
+    def list_object_levels(self, object_id: str):
+        rows = self._level_query().filter(ObjectLevelDB.object_id == object_id).all()
+        return [self._level_row(*row) for row in rows]
+
+    def get_object_structure(self, object_id: str):
+        obj = self.get_object(object_id)
+        if not obj:
+            return None
+        return self._structure(obj, self.list_object_levels(object_id))
+
+    def get_object_structures(
+        self, object_ids: list[str] | None = None, manager_id: str | None = None
+    ):
+        selected = list(OBJECT_PROJECTION.fields)
+        query = OBJECT_PROJECTION.query(self.db, selected)
+        if object_ids is not None:
+            query = query.filter(ObjectDB.id.in_(object_ids))
+        if manager_id is not None:
+            query = query.filter(ObjectDB.manager_id == manager_id)
+        objects = [OBJECT_PROJECTION.row(row, selected) for row in query.order_by(ObjectDB.id)]
+        if not objects:
+            return []
+
+        levels: dict[str, list[dict]] = {obj["id"]: [] for obj in objects}
+        rows = self._level_query().filter(ObjectLevelDB.object_id.in_(list(levels))).all()
+        for row in rows:
+            level = self._level_row(*row)
+            levels[level["object_id"]].append(level)
+        return [self._structure(obj, levels[obj["id"]]) for obj in objects]
+
+    def list_counterparties(
+        self,
+        counterparty_type: str | None,
+        is_internal: bool | None,
+        fields: str | None = None,
+        filters: Mapping[str, str] | None = None,
+        sort: str | None = None,
+    ):
+        filters = {
+            key: value
+            for key, value in (filters or {}).items()
+            if key not in ("type", "is_internal")
+        }
+        selected = COUNTERPARTY_PROJECTION.parse(fields)
+        query = COUNTERPARTY_PROJECTION.query(self.db, selected)
+        query = COUNTERPARTY_FILTERS.apply(query, filters, sort)
         if counterparty_type:
             query = query.filter(CounterpartyDB.type == counterparty_type)
         if is_internal is not None:
             query = query.filter(CounterpartyDB.is_internal == is_internal)
         return [
-            {
-                "id": cp.id,
-                "type": cp.type,
-                "short_name": cp.short_name,
-                "full_name": cp.full_name,
-                "is_internal": bool(cp.is_internal),
-                "contract_prefix": cp.contract_prefix,
-                "created_at": cp.created_at,
-            }
-            for cp in query.all()
+            COUNTERPARTY_PROJECTION.row(row, selected) for row in query_cache.all(self.db, query)
         ]
 
-    def get_counterparty_llc(self, counterparty_id: str):
-        counterparty = (
-            self.db.query(CounterpartyDB)
-            .filter(CounterpartyDB.id == counterparty_id, CounterpartyDB.type == "LLC")
-            .first()
-        )
-        if not counterparty:
+    def get_counterparty_llc(self, counterparty_id: str, parallel: bool = True):
+        counterparty = self.loader.load(CounterpartyDB, counterparty_id)
+        if not counterparty or counterparty.type != "LLC":
             return None
 
-        details = (
-            self.db.query(DetailsLLCDB)
-            .filter(DetailsLLCDB.counterparties_id == counterparty_id)
-            .first()
+        details = next(
+            iter(self.loader.load_by(DetailsLLCDB, "counterparties_id", counterparty_id)), None
         )
         if not details:
             return None
 
-        additional = (
-            self.db.query(CounterpartyAdditionalDB.additional_okved)
-            .filter(CounterpartyAdditionalDB.counterparty_id == counterparty_id)
-            .all()
-        )
-        additional_okved = [row[0] for row in additional]
-
-        director_person = (
-            self.db.query(PersonDB)
-            .filter(PersonDB.id == details.director_person_id)
-            .first()
-        )
-        director_employee = (
-            self.db.query(EmployeeDB)
-            .filter(
-                EmployeeDB.person_id == details.director_person_id,
-                EmployeeDB.counterparty_id == counterparty_id,
-            )
-            .first()
+        director_person_id = details.director_person_id
+        additional, director_person, director_jobs, bank_accounts = self._run_concurrently(
+            lambda db: Loader.of(db).load_by(
+                CounterpartyAdditionalDB, "counterparty_id", counterparty_id
+            ),
+            lambda db: Loader.of(db).load(PersonDB, director_person_id),
+            lambda db: Loader.of(db).load_by(EmployeeDB, "person_id", director_person_id),
+            lambda db: Loader.of(db).load_by(BankAccountDB, "counterparty_id", counterparty_id),
+            parallel=parallel,
         )
+        additional_okved = [row.additional_okved for row in additional]
+        director_employee = _employee_of(director_jobs, counterparty_id)
 
         director = None
         if director_person:
@@ -245,12 +451,6 @@ class ReferenceService:
                 "email": director_employee.email_work if director_employee else director_person.email_personal,
             }
 
-        bank_accounts = (
-            self.db.query(BankAccountDB)
-            .filter(BankAccountDB.counterparty_id == counterparty_id)
-            .all()
-        )
-
         return {
             "id": counterparty.id,
             "basic_info": {
@@ -293,33 +493,26 @@ class ReferenceService:
             ],
         }
 
-    def get_counterparty_ip(self, counterparty_id: str):
-        counterparty = (
-            self.db.query(CounterpartyDB)
-            .filter(CounterpartyDB.id == counterparty_id, CounterpartyDB.type == "IP")
-            .first()
-        )
-        if not counterparty:
+    def get_counterparty_ip(self, counterparty_id: str, parallel: bool = True):
+        counterparty = self.loader.load(CounterpartyDB, counterparty_id)
+        if not counterparty or counterparty.type != "IP":
             return None
 
-        details = (
-            self.db.query(DetailsIPDB)
-            .filter(DetailsIPDB.counterparty_id == counterparty_id)
-            .first()
+        details = next(
+            iter(self.loader.load_by(DetailsIPDB, "counterparty_id", counterparty_id)), None
         )
         if not details:
             return None
 
-        additional = (
-            self.db.query(CounterpartyAdditionalDB.additional_okved)
-            .filter(CounterpartyAdditionalDB.counterparty_id == counterparty_id)
-            .all()
-        )
-        additional_okved = [row[0] for row in additional]
-
-        owner_person = (
-            self.db.query(PersonDB).filter(PersonDB.id == details.person_id).first()
+        owner_person_id = details.person_id
+        additional, owner_person = self._run_concurrently(
+            lambda db: Loader.of(db).load_by(
+                CounterpartyAdditionalDB, "counterparty_id", counterparty_id
+            ),
+            lambda db: Loader.of(db).load(PersonDB, owner_person_id),
+            parallel=parallel,
         )
+        additional_okved = [row.additional_okved for row in additional]
 
         owner = None
         if owner_person:
@@ -357,36 +550,27 @@ class ReferenceService:
             "owner": owner,
         }
 
-    def get_counterparty_phys(self, counterparty_id: str):
-        counterparty = (
-            self.db.query(CounterpartyDB)
-            .filter(CounterpartyDB.id == counterparty_id, CounterpartyDB.type == "PHYSIC")
-            .first()
-        )
-        if not counterparty:
+    def get_counterparty_phys(self, counterparty_id: str, parallel: bool = True):
+        counterparty = self.loader.load(CounterpartyDB, counterparty_id)
+        if not counterparty or counterparty.type != "PHYSIC":
             return None
 
-        details = (
-            self.db.query(DetailsPhysDB)
-            .filter(DetailsPhysDB.counterparty_id == counterparty_id)
-            .first()
+        details = next(
+            iter(self.loader.load_by(DetailsPhysDB, "counterparty_id", counterparty_id)), None
         )
         if not details:
             return None
 
-        person = self.db.query(PersonDB).filter(PersonDB.id == details.person_id).first()
+        person_id = details.person_id
+        person, jobs = self._run_concurrently(
+            lambda db: Loader.of(db).load(PersonDB, person_id),
+            lambda db: Loader.of(db).load_by(EmployeeDB, "person_id", person_id),
+            parallel=parallel,
+        )
+        employee = _employee_of(jobs, counterparty_id)
         if not person:
             return None
 
-        employee = (
-            self.db.query(EmployeeDB)
-            .filter(
-                EmployeeDB.counterparty_id == counterparty_id,
-                EmployeeDB.person_id == details.person_id,
-            )
-            .first()
-        )
-
         return {
             "id": counterparty.id,
             "basic_info": {
@@ -420,24 +604,7 @@ class ReferenceService:
             },
         }
 
-    def list_persons(self, search: str | None):
-        query = self.db.query(PersonDB)
-        if search:
-            pattern = f"%{search}%"
-            query = query.filter(
-                or_(
-                    PersonDB.name.ilike(pattern),
-                    PersonDB.last_naem.ilike(pattern),
-                    PersonDB.middle_name.ilike(pattern),
-                    PersonDB.phone_personal.ilike(pattern),
-                    PersonDB.email_personal.ilike(pattern),
-                )
-            )
-        persons = query.all()
-        if not persons:
-            return []
-
-        person_ids = [person.id for person in persons]
+    def _companies_by_person(self, person_ids: list[str]) -> dict[str, list[dict]]:
         employees = (
             self.db.query(EmployeeDB, CounterpartyDB)
             .join(CounterpartyDB, EmployeeDB.counterparty_id == CounterpartyDB.id)
@@ -459,63 +626,54 @@ class ReferenceService:
                     "comment": employee.comment,
                 }
             )
+        return employees_by_person
 
-        result = []
-        for person in persons:
-            result.append(
-                {
-                    "id": person.id,
-                    "user_id": person.user_id,
-                    "name": person.name,
-                    "last_name": person.last_naem,
-                    "middle_name": person.middle_name,
-                    "full_name": _full_name(person),
-                    "phone": person.phone_personal,
-                    "email": person.email_personal,
-                    "birth_date": person.birth_date,
-                    "companies": employees_by_person.get(person.id, []),
-                }
+    def list_persons(self, search: str | None, fields: str | None = None):
+        selected = PERSON_PROJECTION.parse(fields, PERSON_FIELDS)
+        query = PERSON_PROJECTION.query(self.db, selected, person_pk=PersonDB.id)
+        if search:
+            pattern = f"%{search}%"
+            query = query.filter(
+                or_(
+                    PersonDB.name.ilike(pattern),
+                    PersonDB.last_naem.ilike(pattern),
+                    PersonDB.middle_name.ilike(pattern),
+                    PersonDB.phone_personal.ilike(pattern),
+                    PersonDB.email_personal.ilike(pattern),
+                )
             )
-        return result
+        rows = query_cache.all(self.db, query)
+        if not rows:
+            return []
 
-    def get_person(self, person_id: str):
-        person = self.db.query(PersonDB).filter(PersonDB.id == person_id).first()
-        if not person:
-            return None
+        with_companies = "companies" in selected
+        employees_by_person = (
+            self._companies_by_person([row.person_pk for row in rows]) if with_companies else {}
+        )
 
-        employees = (
-            self.db.query(EmployeeDB, CounterpartyDB)
-            .join(CounterpartyDB, EmployeeDB.counterparty_id == CounterpartyDB.id)
-            .filter(EmployeeDB.person_id == person_id)
-            .all()
+        result = []
+        for row in rows:
+            item = PERSON_PROJECTION.row(row, selected)
+            if with_companies:
+                item["companies"] = employees_by_person.get(row.person_pk, [])
+            result.append(item)
+        return result
+
+    def get_person(self, person_id: str, fields: str | None = None):
+        selected = PERSON_PROJECTION.parse(fields, PERSON_FIELDS)
+        row = query_cache.first(
+            self.db,
+            PERSON_PROJECTION.query(self.db, selected, person_pk=PersonDB.id).filter(
+                PersonDB.id == person_id
+            ),
         )
-        companies = [
-            {
-                "company_id": counterparty.id,
-                "company_name": counterparty.short_name,
-                "role": employee.role_type,
-                "position": employee.position,
-                "phone_work": employee.phone_work,
-                "phone_extra": employee.phone_extra,
-                "email_work": employee.email_work,
-                "email_extra": employee.email_extra,
-                "comment": employee.comment,
-            }
-            for employee, counterparty in employees
-        ]
+        if not row:
+            return None
 
-        return {
-            "id": person.id,
-            "user_id": person.user_id,
-            "name": person.name,
-            "last_name": person.last_naem,
-            "middle_name": person.middle_name,
-            "full_name": _full_name(person),
-            "phone": person.phone_personal,
-            "email": person.email_personal,
-            "birth_date": person.birth_date,
-            "companies": companies,
-        }
+        result = PERSON_PROJECTION.row(row, selected)
+        if "companies" in selected:
+            result["companies"] = self._companies_by_person([person_id])[person_id]
+        return result
 
     def list_bank_accounts(self, counterparty_id: str):
         accounts = (
@@ -571,6 +729,54 @@ class ReferenceService:
             for cp in counterparties
         ]
 
+    def find_counterparties_by_inn(self, inns: list[str], kpp: str | None = None):
+        llc = select(DetailsLLCDB.counterparties_id).where(DetailsLLCDB.inn.in_(inns))
+        if kpp:
+            return self._full_profiles(self.db.scalars(llc.where(DetailsLLCDB.kpp == kpp)).all())
+        statement = union(
+            llc,
+            select(DetailsIPDB.counterparty_id).where(DetailsIPDB.inn.in_(inns)),
+            select(DetailsPhysDB.counterparty_id).where(DetailsPhysDB.inn.in_(inns)),
+        )
+        return self._full_profiles(self.db.scalars(statement).all())
+
+    def find_counterparties_by_ogrn(self, ogrns: list[str]):
+        statement = union(
+            select(DetailsLLCDB.counterparties_id).where(DetailsLLCDB.ogrn.in_(ogrns)),
+            select(DetailsIPDB.counterparty_id).where(DetailsIPDB.ogrnip.in_(ogrns)),
+        )
+        return self._full_profiles(self.db.scalars(statement).all())
+
+    def _full_profiles(self, counterparty_ids: list[str]) -> list[dict]:
+        counterparty_ids = sorted(set(counterparty_ids))
+        self._prefetch_profiles(counterparty_ids)
+        # Всё уже в загрузчике: профили собираются без запросов.
+        profiles = (
+            self.get_full_profile(counterparty_id, parallel=False)
+            for counterparty_id in counterparty_ids
+        )
+        return [profile for profile in profiles if profile]
+
+    def _prefetch_profiles(self, counterparty_ids: list[str]) -> None:
+        ids_by_type: dict[str, list[str]] = {}
+        for counterparty in self.loader.load_many(CounterpartyDB, counterparty_ids).values():
+            ids_by_type.setdefault(counterparty.type, []).append(counterparty.id)
+        llc_ids = ids_by_type.get("LLC", [])
+        ip_ids = ids_by_type.get("IP", [])
+        phys_ids = ids_by_type.get("PHYSIC", [])
+
+        llc = self.loader.load_many_by(DetailsLLCDB, "counterparties_id", llc_ids)
+        ip = self.loader.load_many_by(DetailsIPDB, "counterparty_id", ip_ids)
+        phys = self.loader.load_many_by(DetailsPhysDB, "counterparty_id", phys_ids)
+        directors = {rows[0].director_person_id for rows in llc.values() if rows}
+        owners = {rows[0].person_id for rows in ip.values() if rows}
+        persons = {rows[0].person_id for rows in phys.values() if rows}
+
+        self.loader.prefetch(PersonDB, directors | owners | persons)
+        self.loader.prefetch_by(EmployeeDB, "person_id", directors | persons)
+        self.loader.prefetch_by(CounterpartyAdditionalDB, "counterparty_id", llc_ids + ip_ids)
+        self.loader.prefetch_by(BankAccountDB, "counterparty_id", llc_ids)
+
     def list_counterparty_employees(self, counterparty_id: str):
         rows = (
             self.db.query(EmployeeDB, PersonDB)
@@ -593,191 +799,71 @@ class ReferenceService:
             for employee, person in rows
         ]
 
-    def list_employees(self):
-        rows = (
-            self.db.query(EmployeeDB, PersonDB, CounterpartyDB)
-            .join(PersonDB, EmployeeDB.person_id == PersonDB.id)
-            .join(CounterpartyDB, EmployeeDB.counterparty_id == CounterpartyDB.id)
-            .all()
+    def list_employees(
+        self,
+        fields: str | None = None,
+        filters: Mapping[str, str] | None = None,
+        sort: str | None = None,
+    ):
+        selected = EMPLOYEE_PROJECTION.parse(fields)
+        query = EMPLOYEE_PROJECTION.query(self.db, selected)
+        rows = query_cache.all(self.db, EMPLOYEE_FILTERS.apply(query, filters, sort))
+        return [EMPLOYEE_PROJECTION.row(row, selected) for row in rows]
+
+    def list_objects_by_employee(self, employee_id: str, fields: str | None = None):
+        selected = OBJECT_PROJECTION.parse(fields, OBJECT_FIELDS_WITHOUT_MANAGER)
+        rows = query_cache.all(
+            self.db,
+            OBJECT_PROJECTION.query(self.db, selected).filter(ObjectDB.manager_id == employee_id),
         )
-        return [
-            {
-                "id": employee.id,
-                "counterparty_id": counterparty.id,
-                "counterparty_name": counterparty.short_name,
-                "person_id": person.id,
-                "name": person.name,
-                "last_name": person.last_naem,
-                "middle_name": person.middle_name,
-                "position": employee.position,
-                "role": employee.role_type,
-                "phone_work": employee.phone_work,
-                "phone_extra": employee.phone_extra,
-                "email_work": employee.email_work,
-                "email_extra": employee.email_extra,
-                "comment": employee.comment,
-            }
-            for employee, person, counterparty in rows
-        ]
-
-    def list_objects_by_employee(self, employee_id: str):
-        objects = self.db.query(ObjectDB).filter(ObjectDB.manager_id == employee_id).all()
-        return [
-            {
-                "id": obj.id,
-                "short_name": obj.short_name,
-                "full_name": obj.full_name,
-                "address": obj.address,
-                "is_active": bool(obj.is_active),
-                "created_at": obj.created_at,
-                "updated_at": obj.updated_at,
-            }
-            for obj in objects
-        ]
+        return [OBJECT_PROJECTION.row(row, selected) for row in rows]
 
-    def get_full_profile(self, counterparty_id: str):
-        counterparty = (
-            self.db.query(CounterpartyDB)
-            .filter(CounterpartyDB.id == counterparty_id)
-            .first()
-        )
+    def get_full_profile(self, counterparty_id: str, parallel: bool = True):
+        counterparty = self.loader.load(CounterpartyDB, counterparty_id)
         if not counterparty:
             return None
 
         if counterparty.type == "LLC":
-            return self.get_counterparty_llc(counterparty_id)
+            return self.get_counterparty_llc(counterparty_id, parallel)
         if counterparty.type == "IP":
-            return self.get_counterparty_ip(counterparty_id)
+            return self.get_counterparty_ip(counterparty_id, parallel)
         if counterparty.type == "PHYSIC":
-            return self.get_counterparty_phys(counterparty_id)
+            return self.get_counterparty_phys(counterparty_id, parallel)
         return None
 
-    def list_counterparty_summaries(self):
-        counterparties = self.db.query(CounterpartyDB).all()
-        if not counterparties:
-            return []
-
-        counterparty_ids = [cp.id for cp in counterparties]
-
-        llc_rows = (
-            self.db.query(DetailsLLCDB)
-            .filter(DetailsLLCDB.counterparties_id.in_(counterparty_ids))
-            .all()
-        )
-        ip_rows = (
-            self.db.query(DetailsIPDB)
-            .filter(DetailsIPDB.counterparty_id.in_(counterparty_ids))
-            .all()
-        )
-        phys_rows = (
-            self.db.query(DetailsPhysDB)
-            .filter(DetailsPhysDB.counterparty_id.in_(counterparty_ids))
-            .all()
+    def list_counterparty_summaries(
+        self,
+        counterparty_type: str | None = None,
+        is_internal: bool | None = None,
+        name_prefix: str | None = None,
+        sort: str | None = None,
+    ):
+        query = self.db.query(
+            CounterpartySummaryDB.short_name,
+            CounterpartySummaryDB.full_name,
+            CounterpartySummaryDB.opf,
+            CounterpartySummaryDB.address,
+            CounterpartySummaryDB.phone,
+            CounterpartySummaryDB.email,
+            CounterpartySummaryDB.inn_ogrn_kpp,
         )
-
-        llc_by_id = {row.counterparties_id: row for row in llc_rows}
-        ip_by_id = {row.counterparty_id: row for row in ip_rows}
-        phys_by_id = {row.counterparty_id: row for row in phys_rows}
-
-        person_ids = set()
-        for row in llc_rows:
-            person_ids.add(row.director_person_id)
-        for row in ip_rows:
-            person_ids.add(row.person_id)
-        for row in phys_rows:
-            person_ids.add(row.person_id)
-
-        persons = (
-            self.db.query(PersonDB).filter(PersonDB.id.in_(person_ids)).all()
-            if person_ids
-            else []
-        )
-        persons_by_id = {person.id: person for person in persons}
-
-        employees = (
-            self.db.query(EmployeeDB)
-            .filter(EmployeeDB.counterparty_id.in_(counterparty_ids))
-            .all()
-        )
-        employees_by_counterparty: dict[str, list[EmployeeDB]] = {}
-        for employee in employees:
-            employees_by_counterparty.setdefault(employee.counterparty_id, []).append(employee)
-
-        def pick_contact(counterparty_id: str, person_id: str | None):
-            if not person_id:
-                return None, None
-            employee_list = employees_by_counterparty.get(counterparty_id, [])
-            preferred = next(
-                (emp for emp in employee_list if emp.person_id == person_id),
-                None,
-            )
-            person = persons_by_id.get(person_id)
-            phone = (
-                preferred.phone_work
-                if preferred and preferred.phone_work
-                else person.phone_personal if person else None
-            )
-            email = (
-                preferred.email_work
-                if preferred and preferred.email_work
-                else person.email_personal if person else None
-            )
-            return phone, email
-
-        result = []
-        for cp in counterparties:
-            opf = {"LLC": "ООО", "IP": "ИП", "PHYSIC": "Физлицо"}.get(cp.type, cp.type)
-
-            address = None
-            inn = None
-            ogrn = None
-            kpp = None
-            person_id = None
-
-            if cp.type == "LLC":
-                details = llc_by_id.get(cp.id)
-                if details:
-                    address = details.legal_address
-                    inn = details.inn
-                    ogrn = details.ogrn
-                    kpp = details.kpp
-                    person_id = details.director_person_id
-            elif cp.type == "IP":
-                details = ip_by_id.get(cp.id)
-                if details:
-                    inn = details.inn
-                    ogrn = details.ogrnip
-                    person_id = details.person_id
-            elif cp.type == "PHYSIC":
-                details = phys_by_id.get(cp.id)
-                if details:
-                    address = details.address_registration
-                    inn = details.inn
-                    person_id = details.person_id
-
-            phone, email = pick_contact(cp.id, person_id)
-            if cp.type == "PHYSIC":
-                details = phys_by_id.get(cp.id)
-                if details:
-                    phone = details.phone or phone
-                    email = details.email or email
-            inn_ogrn_kpp = "/".join(
-                [inn or "-", ogrn or "-", kpp or "-"]
-            )
-
-            result.append(
-                {
-                    "short_name": cp.short_name,
-                    "full_name": cp.full_name,
-                    "opf": opf,
-                    "address": address,
-                    "phone": phone,
-                    "email": email,
-                    "inn_ogrn_kpp": inn_ogrn_kpp,
-                }
+        if counterparty_type:
+            query = query.filter(CounterpartySummaryDB.type == counterparty_type)
+        if is_internal is not None:
+            query = query.filter(CounterpartySummaryDB.is_internal == is_internal)
+        if name_prefix:
+            query = query.filter(
+                CounterpartySummaryDB.short_name.startswith(name_prefix, autoescape=True)
             )
+        if sort:
+            column = SUMMARY_SORT_COLUMNS.get(sort.lstrip("-"))
+            if column is None:
+                raise ValueError("Недопустимое поле сортировки")
+            query = query.order_by(column.desc() if sort.startswith("-") else column)
+        return [dict(row._mapping) for row in query_cache.all(self.db, query)]
 
-        return result
+    def rebuild_counterparty_summaries(self) -> int:
+        return rebuild_counterparty_summaries(self.db)
 
     def create_object(self, payload: ObjectCreate):
         data = payload.model_dump(exclude_none=True)
@@ -791,8 +877,7 @@ class ReferenceService:
         except IntegrityError:
             self.db.rollback()
             raise ValueError("Некорректные данные объекта (проверьте внешние ключи)")
-        self.db.refresh(obj)
-        return self.get_object(obj.id)
+        return self.get_object(data["id"])
 
     def update_object(self, object_id: str, payload: ObjectUpdate):
         obj = self.db.query(ObjectDB).filter(ObjectDB.id == object_id).first()
@@ -816,7 +901,6 @@ class ReferenceService:
         except IntegrityError:
             self.db.rollback()
             raise ValueError("Некорректные данные объекта (проверьте внешние ключи)")
-        self.db.refresh(obj)
         return self.get_object(object_id)
 
     def create_counterparty(self, payload: CounterpartyCreate):
@@ -891,8 +975,7 @@ class ReferenceService:
         person = PersonDB(**data)
         self.db.add(person)
         self.db.commit()
-        self.db.refresh(person)
-        return self.get_person(person.id)
+        return self.get_person(data["id"])
 
     def create_employee(self, payload: EmployeeCreate):
         data = payload.model_dump(exclude_none=True)
@@ -931,17 +1014,26 @@ class ReferenceService:
             "is_main": bool(account.is_main),
         }
 
-    def list_contracts(self):
-        return [
-            {"id": contract.id, "contract_id": contract.contract_id, "name": contract.name}
-            for contract in self.db.query(ContractDB).all()
-        ]
-
-    def get_contract(self, contract_id: str):
-        contract = self.db.query(ContractDB).filter(ContractDB.id == contract_id).first()
-        if not contract:
+    def list_contracts(
+        self,
+        fields: str | None = None,
+        filters: Mapping[str, str] | None = None,
+        sort: str | None = None,
+    ):
+        selected = CONTRACT_PROJECTION.parse(fields)
+        query = CONTRACT_PROJECTION.query(self.db, selected)
+        rows = query_cache.all(self.db, CONTRACT_FILTERS.apply(query, filters, sort))
+        return [CONTRACT_PROJECTION.row(row, selected) for row in rows]
+
+    def get_contract(self, contract_id: str, fields: str | None = None):
+        selected = CONTRACT_PROJECTION.parse(fields)
+        row = query_cache.first(
+            self.db,
+            CONTRACT_PROJECTION.query(self.db, selected).filter(ContractDB.id == contract_id),
+        )
+        if not row:
             return None
-        return {"id": contract.id, "contract_id": contract.contract_id, "name": contract.name}
+        return CONTRACT_PROJECTION.row(row, selected)
 
     def create_contract(self, payload: ContractCreate):
         data = payload.model_dump(exclude_none=True)
@@ -952,17 +1044,20 @@ class ReferenceService:
         self.db.refresh(contract)
         return {"id": contract.id, "contract_id": contract.contract_id, "name": contract.name}
 
-    def list_work_types(self):
-        return [
-            {"id": work_type.id, "name": work_type.name}
-            for work_type in self.db.query(WorkTypeDB).all()
-        ]
+    def list_work_types(self, fields: str | None = None):
+        selected = WORK_TYPE_PROJECTION.parse(fields)
+        rows = query_cache.all(self.db, WORK_TYPE_PROJECTION.query(self.db, selected))
+        return [WORK_TYPE_PROJECTION.row(row, selected) for row in rows]
 
-    def get_work_type(self, work_type_id: str):
-        work_type = self.db.query(WorkTypeDB).filter(WorkTypeDB.id == work_type_id).first()
-        if not work_type:
+    def get_work_type(self, work_type_id: str, fields: str | None = None):
+        selected = WORK_TYPE_PROJECTION.parse(fields)
+        row = query_cache.first(
+            self.db,
+            WORK_TYPE_PROJECTION.query(self.db, selected).filter(WorkTypeDB.id == work_type_id),
+        )
+        if not row:
             return None
-        return {"id": work_type.id, "name": work_type.name}
+        return WORK_TYPE_PROJECTION.row(row, selected)
 
     def create_work_type(self, payload: WorkTypeCreate):
         data = payload.model_dump(exclude_none=True)
@@ -999,6 +1094,86 @@ class ReferenceService:
             "created_at": level.created_at,
         }
 
+    def apply_level_operations(self, object_id: str, operations: list[LevelOperation]):
+        if self.loader.load(ObjectDB, object_id) is None:
+            return None
+
+        rows = (
+            self.db.query(
+                ObjectLevelDB.id,
+                ObjectLevelDB.parent_id,
+                ObjectLevelDB.level_number,
+                ObjectLevelDB.is_active,
+            )
+            .filter(ObjectLevelDB.object_id == object_id)
+            .with_for_update()
+            .all()
+        )
+        original = {
+            "parent_id": {row.id: row.parent_id for row in rows},
+            "level_number": {row.id: row.level_number for row in rows},
+            "is_active": {row.id: bool(row.is_active) for row in rows},
+        }
+        state = {name: dict(values) for name, values in original.items()}
+        parents = state["parent_id"]
+
+        for operation in operations:
+            if operation.level_id not in parents:
+                raise ValueError(f"Уровень {operation.level_id} не найден у объекта")
+            if operation.op == "move":
+                parent_id = operation.parent_id
+                if parent_id is not None and parent_id not in parents:
+                    raise ValueError(f"Родительский уровень {parent_id} не найден у объекта")
+                # Родитель может лежать вне объекта — тогда цепочка здесь обрывается
+                ancestor, seen = parent_id, set()
+                while ancestor is not None and ancestor not in seen:
+                    if ancestor == operation.level_id:
+                        raise ValueError(f"Перемещение уровня {operation.level_id} создаёт цикл")
+                    seen.add(ancestor)
+                    ancestor = parents.get(ancestor)
+                parents[operation.level_id] = parent_id
+            elif operation.op == "renumber":
+                if operation.level_number is None:
+                    raise ValueError("Для renumber нужен level_number")
+                state["level_number"][operation.level_id] = operation.level_number
+            else:
+                level_ids = [operation.level_id]
+                if operation.subtree:
+                    level_ids = self._level_subtree(parents, operation.level_id)
+                for level_id in level_ids:
+                    state["is_active"][level_id] = operation.op == "activate"
+
+        changed_ids = set()
+        for name, values in state.items():
+            groups: dict[Any, list[str]] = {}
+            for level_id, value in values.items():
+                if value != original[name][level_id]:
+                    groups.setdefault(value, []).append(level_id)
+            for value, level_ids in groups.items():
+                self.db.execute(
+                    update(ObjectLevelDB)
+                    .where(ObjectLevelDB.id.in_(level_ids))
+                    .values({name: value})
+                    .execution_options(synchronize_session=False)
+                )
+                changed_ids.update(level_ids)
+
+        if changed_ids:
+            record_changes(self.db, "level", sorted(changed_ids))
+            invalidate_tables(self.db, ObjectLevelDB.__tablename__)
+        self.db.commit()
+        return self.get_object_structure(object_id)
+
+    @staticmethod
+    def _level_subtree(parents: dict[str, str | None], root_id: str) -> list[str]:
+        children: dict[str | None, list[str]] = {}
+        for level_id, parent_id in parents.items():
+            children.setdefault(parent_id, []).append(level_id)
+        result = [root_id]
+        for level_id in result:
+            result.extend(children.get(level_id, ()))
+        return result
+
     def list_internal_employees(self, auth_db: Session):
         rows = (
             self.db.query(InternalEmployeeDB, CounterpartyDB)
@@ -1035,12 +1210,7 @@ class ReferenceService:
         director_person_ids = {
             item.director_person_id for item in llc_details if item.director_person_id
         }
-        director_persons = (
-            self.db.query(PersonDB).filter(PersonDB.id.in_(director_person_ids)).all()
-            if director_person_ids
-            else []
-        )
-        director_persons_by_id = {person.id: person for person in director_persons}
+        director_persons_by_id = self.loader.load_many(PersonDB, director_person_ids)
 
         director_employees = (
             self.db.query(EmployeeDB)
@@ -1101,3 +1271,73 @@ class ReferenceService:
             .all()
         )
         return [row[0] or "Без отдела" for row in rows]
+
+    def list_changes(self, since: int, limit: int, entity: str | None = None):
+        query = self.db.query(ChangeLogDB).filter(ChangeLogDB.id > since)
+        if entity:
+            if entity not in ENTITY_MODELS.values():
+                raise ValueError("Неизвестный тип сущности")
+            query = query.filter(ChangeLogDB.entity == entity)
+        query = self._settled(query)
+
+        rows = query.order_by(ChangeLogDB.id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "changes": [
+                {
+                    "cursor": row.id,
+                    "entity": row.entity,
+                    "id": row.entity_id,
+                    "action": row.action,
+                    "changed_at": row.changed_at,
+                }
+                for row in rows
+            ],
+            "next_cursor": rows[-1].id if rows else since,
+            "has_more": has_more,
+        }
+
+    def compact_changes(self, older_than: datetime) -> int:
+        latest = (
+            select(func.max(ChangeLogDB.id).label("id"))
+            .group_by(ChangeLogDB.entity, ChangeLogDB.entity_id)
+            .subquery()
+        )
+        result = self.db.execute(
+            delete(ChangeLogDB)
+            .where(ChangeLogDB.changed_at < older_than)
+            .where(ChangeLogDB.id.not_in(select(latest.c.id)))
+        )
+        self.db.commit()
+        return result.rowcount
+
+    @staticmethod
+    def _settled(query):
+        if CHANGE_FEED_SETTLE_SECONDS > 0:
+            horizon = datetime.utcnow() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+            query = query.filter(ChangeLogDB.changed_at <= horizon)
+        return query
+
+    def change_cursor(self) -> int:
+        query = self._settled(self.db.query(ChangeLogDB.id))
+        return query.order_by(ChangeLogDB.id.desc()).limit(1).scalar() or 0
+
+    def _table_rows(self, model) -> list[dict]:
+        table = model.__table__
+        query = select(*table.columns).order_by(*table.primary_key.columns)
+        return [dict(row) for row in self.db.execute(query).mappings()]
+
+    def build_snapshot(self, version: int) -> dict:
+        snapshot: dict[str, Any] = {"version": version, "generated_at": datetime.utcnow()}
+        for name, model in SNAPSHOT_TABLES.items():
+            snapshot[name] = self._table_rows(model)
+
+        objects = self._table_rows(ObjectDB)
+        levels: dict[str, list[dict]] = {obj["id"]: [] for obj in objects}
+        for level in self._table_rows(ObjectLevelDB):
+            levels.setdefault(level["object_id"], []).append(level)
+        for obj in objects:
+            obj["levels"] = levels[obj["id"]]
+        snapshot["objects"] = objects
+        return snapshot
@@ -0,0 +1,199 @@
+import logging
+import math
+import os
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import text
+
+from app.database import auth_engine
+from app.lifespan import register_warmup
+from app.metrics import register_metrics
+from app.single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+SESSION_FILTER_ENABLED = os.getenv("SESSION_FILTER_ENABLED", "0") == "1"
+SESSION_FILTER_FP_RATE = float(os.getenv("SESSION_FILTER_FP_RATE", "0.01"))
+SESSION_FILTER_MIN_CAPACITY = int(os.getenv("SESSION_FILTER_MIN_CAPACITY", "1024"))
+SESSION_FILTER_REBUILD_INTERVAL = float(os.getenv("SESSION_FILTER_REBUILD_INTERVAL", "300"))
+SESSION_FILTER_REFRESH_INTERVAL = float(os.getenv("SESSION_FILTER_REFRESH_INTERVAL", "5"))
+SESSION_FILTER_MIN_TTL = float(os.getenv("SESSION_FILTER_MIN_TTL", "0"))
+SESSION_FILTER_CLOCK_SKEW = float(os.getenv("SESSION_FILTER_CLOCK_SKEW", "5"))
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, token_hash: str):
+        first = int(token_hash[:16], 16)
+        second = int(token_hash[16:32], 16) | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def add(self, token_hash: str) -> None:
+        for position in self._positions(token_hash):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, token_hash: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(token_hash)
+        )
+
+
+class SessionFilter:
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.bloom: BloomFilter | None = None
+        self.loaded_at: datetime | None = None
+        self.refreshed_at = float("-inf")
+        self.attempted_at = float("-inf")
+        self.rejected = 0
+        self.passed = 0
+        self.confirmed = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def _load(self, expiring_after: datetime) -> list[str]:
+        query = text("SELECT token_hash FROM sessions WHERE expires_at > :expiring_after")
+        with auth_engine.connect() as conn:
+            return conn.execute(query, {"expiring_after": expiring_after}).scalars().all()
+
+    def rebuild(self) -> None:
+        refreshed_at = time.monotonic()
+        loaded_at = datetime.now(UTC)
+        hashes = self._load(loaded_at)
+        bloom = BloomFilter(
+            max(len(hashes) * 2, SESSION_FILTER_MIN_CAPACITY), SESSION_FILTER_FP_RATE
+        )
+        for token_hash in hashes:
+            bloom.add(token_hash)
+        with self._lock:
+            self.bloom = bloom
+            self.loaded_at = loaded_at
+            self.refreshed_at = refreshed_at
+            self.rebuilds += 1
+
+    def refresh(self) -> None:
+        refreshed_at = time.monotonic()
+        loaded_at = datetime.now(UTC)
+        # Сессия, созданная после прошлой загрузки, истекает не раньше чем через
+        # минимальный срок жизни от неё: только такие и нужно догрузить.
+        expiring_after = (
+            self.loaded_at + timedelta(seconds=SESSION_FILTER_MIN_TTL - SESSION_FILTER_CLOCK_SKEW)
+            if self.loaded_at is not None
+            else loaded_at
+        )
+        if self.bloom is None or expiring_after <= loaded_at:
+            self.rebuild()
+            return
+        hashes = self._load(expiring_after)
+        bloom = self.bloom
+        if bloom.count + len(hashes) > bloom.capacity:
+            self.rebuild()
+            return
+        for token_hash in hashes:
+            bloom.add(token_hash)
+        with self._lock:
+            self.loaded_at = loaded_at
+            self.refreshed_at = refreshed_at
+            self.refreshes += 1
+
+    def _stale(self) -> bool:
+        last = max(self.refreshed_at, self.attempted_at)
+        return time.monotonic() - last >= SESSION_FILTER_REFRESH_INTERVAL
+
+    def _refresh_if_stale(self) -> None:
+        if self._stale():
+            self.attempted_at = time.monotonic()
+            self.refresh()
+
+    def might_contain(self, token_hash: str) -> bool:
+        bloom = self.bloom
+        if not self.enabled or bloom is None:
+            return True
+        if token_hash not in bloom and self._stale():
+            # Новые сессии догружает фоновый поток; запрос сам обновляет фильтр
+            # не чаще раза в SESSION_FILTER_REFRESH_INTERVAL, если поток отстал.
+            try:
+                single_flight.do("session_filter#refresh", self._refresh_if_stale)
+            except Exception as exc:
+                self.failures += 1
+                logger.warning("Не удалось обновить фильтр сессий: %s", exc)
+                return True
+            bloom = self.bloom
+        if token_hash in bloom:
+            self.passed += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def observe(self, valid: bool) -> None:
+        if not self.enabled or self.bloom is None:
+            return
+        if valid:
+            self.confirmed += 1
+        else:
+            self.false_positives += 1
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+
+        def run() -> None:
+            rebuilt_at = float("-inf")
+            while True:
+                try:
+                    if time.monotonic() - rebuilt_at >= SESSION_FILTER_REBUILD_INTERVAL:
+                        self.rebuild()
+                        rebuilt_at = time.monotonic()
+                    else:
+                        single_flight.do("session_filter#refresh", self.refresh)
+                except Exception as exc:
+                    self.failures += 1
+                    logger.warning("Не удалось обновить фильтр сессий: %s", exc)
+                time.sleep(SESSION_FILTER_REFRESH_INTERVAL)
+
+        self._thread = threading.Thread(target=run, name="session-filter", daemon=True)
+        self._thread.start()
+
+    def as_dict(self) -> dict:
+        bloom = self.bloom
+        return {
+            "enabled": self.enabled,
+            "ready": bloom is not None,
+            "tokens": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "bytes": len(bloom.bits) if bloom else 0,
+            "rejected": self.rejected,
+            "passed": self.passed,
+            "confirmed": self.confirmed,
+            "false_positives": self.false_positives,
+            "false_positive_rate": round(self.false_positives / self.passed, 6)
+            if self.passed
+            else 0.0,
+            "rebuilds": self.rebuilds,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+session_filter = SessionFilter(SESSION_FILTER_ENABLED)
+
+register_metrics("session_filter", session_filter.as_dict)
+
+
+@register_warmup
+def start_session_filter() -> None:
+    session_filter.start()
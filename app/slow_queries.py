@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.database import auth_engine, reference_engine, replica_engines
+from app.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+SLOW_QUERY_EXPLAIN_TTL = float(os.getenv("SLOW_QUERY_EXPLAIN_TTL", "600"))
+SLOW_QUERY_FINGERPRINTS = int(os.getenv("SLOW_QUERY_FINGERPRINTS", "200"))
+SLOW_QUERY_SAMPLES = int(os.getenv("SLOW_QUERY_SAMPLES", "500"))
+
+_STARTED_KEY = "slow_query_started"
+_SKIP_KEY = "slow_query_skip"
+
+current_scope: ContextVar[dict | None] = ContextVar("current_scope", default=None)
+
+_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%\(\w+\)s|%s|:\w+|\?|\$\d+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE), "IN (?+)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize(statement: str) -> str:
+    for pattern, replacement in _PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def params_shape(parameters, executemany: bool):
+    if executemany and isinstance(parameters, list | tuple):
+        return {"executemany": len(parameters), "row": params_shape(parameters[0], False)}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, list | tuple):
+        return sorted(Counter(type(value).__name__ for value in parameters).items())
+    return None
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class QueryStats:
+    def __init__(self, fingerprint: str, sql: str) -> None:
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.params = None
+        self.routes: Counter[str] = Counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.durations: deque[float] = deque(maxlen=SLOW_QUERY_SAMPLES)
+        self.last_seen = 0.0
+        self.plan: list | str | None = None
+        self.explained_at = 0.0
+        self.explaining = False
+
+    def as_dict(self) -> dict:
+        ordered = sorted(self.durations)
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.sql,
+            "params": self.params,
+            "routes": dict(self.routes.most_common(10)),
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "p50_ms": round(percentile(ordered, 0.5), 3),
+            "p95_ms": round(percentile(ordered, 0.95), 3),
+            "p99_ms": round(percentile(ordered, 0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "last_seen": self.last_seen,
+            "plan": self.plan,
+        }
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float) -> None:
+        self.threshold_ms = threshold_ms
+        self.queries: OrderedDict[str, QueryStats] = OrderedDict()
+        self.recorded = 0
+        self.explained = 0
+        self.explain_failed = 0
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get(_SKIP_KEY):
+            conn.info.setdefault(_STARTED_KEY, []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get(_STARTED_KEY)
+        if not started:
+            return
+        elapsed = (time.perf_counter() - started.pop()) * 1000
+        if elapsed >= self.threshold_ms:
+            self.record(conn.engine, statement, parameters, executemany, elapsed)
+
+    def record(self, engine: Engine, statement: str, parameters, executemany: bool, elapsed: float):
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        scope = current_scope.get()
+        route = getattr(scope.get("route"), "path", None) if scope else None
+        route = route or (scope["path"] if scope else "-")
+
+        with self._lock:
+            stats = self.queries.get(key)
+            if stats is None:
+                stats = self.queries[key] = QueryStats(key, normalized)
+                while len(self.queries) > SLOW_QUERY_FINGERPRINTS:
+                    self.queries.popitem(last=False)
+            self.queries.move_to_end(key)
+            stats.params = params_shape(parameters, executemany)
+            stats.routes[route] += 1
+            stats.count += 1
+            stats.total_ms += elapsed
+            stats.max_ms = max(stats.max_ms, elapsed)
+            stats.durations.append(elapsed)
+            stats.last_seen = time.time()
+            self.recorded += 1
+            explain = (
+                SLOW_QUERY_EXPLAIN
+                and not executemany
+                and not stats.explaining
+                and time.time() - stats.explained_at > SLOW_QUERY_EXPLAIN_TTL
+                and normalized.lstrip("( ").upper().startswith(("SELECT", "WITH"))
+            )
+            if explain:
+                stats.explaining = True
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="slow-query-explain"
+                    )
+
+        logger.warning(
+            "Медленный запрос %s %.1f мс (%s): %s", key, elapsed, route, normalized[:200]
+        )
+        if explain:
+            self._executor.submit(self._explain, engine, stats, statement, parameters)
+
+    def _explain(self, engine: Engine, stats: QueryStats, statement: str, parameters) -> None:
+        prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            with engine.connect() as conn:
+                conn.info[_SKIP_KEY] = True
+                try:
+                    result = conn.exec_driver_sql(prefix + statement, parameters)
+                    plan = [dict(row) for row in result.mappings()]
+                finally:
+                    conn.info.pop(_SKIP_KEY, None)
+            stats.plan = plan
+            self.explained += 1
+        except Exception as exc:
+            stats.plan = f"EXPLAIN не выполнен: {exc}"
+            self.explain_failed += 1
+        finally:
+            stats.explained_at = time.time()
+            stats.explaining = False
+
+    def report(self) -> list[dict]:
+        with self._lock:
+            queries = list(self.queries.values())
+        return [
+            stats.as_dict()
+            for stats in sorted(queries, key=lambda stats: stats.total_ms, reverse=True)
+        ]
+
+    def as_dict(self) -> dict:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "recorded": self.recorded,
+            "fingerprints": len(self.queries),
+            "explained": self.explained,
+            "explain_failed": self.explain_failed,
+        }
+
+
+class RouteContext:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_THRESHOLD_MS)
+
+if slow_query_log.enabled:
+    for engine in {reference_engine, auth_engine, *replica_engines}:
+        slow_query_log.install(engine)
+
+register_metrics("slow_queries", slow_query_log.as_dict)
@@ -0,0 +1,43 @@
+import gzip
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+from app.compression import GZIP_LEVEL, render_json
+from app.single_flight import single_flight
+
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", "snapshots"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+
+
+def snapshot_path(version: int) -> Path:
+    return SNAPSHOT_DIR / f"snapshot-{version}.json.gz"
+
+
+def ensure_snapshot(version: int, build: Callable[[], object]) -> Path:
+    path = snapshot_path(version)
+    if path.exists():
+        return path
+    return single_flight.do(f"snapshot#{version}", lambda: _write(path, build))
+
+
+def _write(path: Path, build: Callable[[], object]) -> Path:
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    body = gzip.compress(render_json(build()), compresslevel=GZIP_LEVEL, mtime=0)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(body)
+    os.replace(temporary, path)
+    _prune(path.parent)
+    return path
+
+
+def _version(path: Path) -> int:
+    return int(path.name.removeprefix("snapshot-").removesuffix(".json.gz"))
+
+
+def _prune(directory: Path) -> None:
+    snapshots = sorted(directory.glob("snapshot-*.json.gz"), key=_version, reverse=True)
+    for path in snapshots[SNAPSHOT_KEEP:]:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,143 @@
+import hashlib
+import hmac
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from urllib.parse import parse_qsl
+
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "")
+TRAFFIC_CAPTURE_SAMPLE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", "1"))
+TRAFFIC_CAPTURE_MAX_BODY = int(os.getenv("TRAFFIC_CAPTURE_MAX_BODY", "65536"))
+# Ключ псевдонимов идентификаторов; пусто — свой случайный у каждого процесса
+TRAFFIC_CAPTURE_SALT = os.getenv("TRAFFIC_CAPTURE_SALT", "").encode() or secrets.token_bytes(16)
+
+SENSITIVE_KEYS = frozenset({"session", "token", "password", "secret", "profile"})
+# Параметры, значения которых пишутся как есть: форма запроса, а не данные.
+# Остальные (search, q, id, inn и т. п.) заменяются псевдонимами
+PUBLIC_QUERY_KEYS = frozenset(
+    {"fields", "sort", "type", "is_internal", "is_active", "created_at", "since", "limit", "entity"}
+)
+
+
+def body_shape(value):
+    if isinstance(value, dict):
+        return {key: body_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [body_shape(value[0])] if value else []
+    if value is None:
+        return "null"
+    return type(value).__name__
+
+
+def pseudonym(value: str) -> str:
+    if not value:
+        return value
+    digest = hmac.new(TRAFFIC_CAPTURE_SALT, value.encode(), hashlib.sha256).hexdigest()
+    return f"~{digest[:12]}"
+
+
+def _query_value(key: str, value: str) -> str:
+    name = key.lower()
+    if name in SENSITIVE_KEYS:
+        return "***"
+    if name.partition("__")[0] in PUBLIC_QUERY_KEYS:
+        return value
+    return ",".join(pseudonym(part) for part in value.split(","))
+
+
+def sanitize_query(query_string: bytes) -> list[list[str]]:
+    return [
+        [key, _query_value(key, value)]
+        for key, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    ]
+
+
+# Идентификаторы в пути заменяются псевдонимами: у найденного маршрута —
+# значения параметров пути, иначе любой сегмент с цифрой. Псевдонимы
+# параметров возвращаются отдельно — replay.py подставит свои идентификаторы
+def sanitize_path(path: str, path_params: dict | None) -> tuple[str, dict]:
+    if path_params:
+        params = {name: pseudonym(str(value)) for name, value in path_params.items()}
+        masked = {str(value): params[name] for name, value in path_params.items()}
+        segments = [masked.get(segment, segment) for segment in path.split("/")]
+        return "/".join(segments), params
+    segments = [
+        pseudonym(segment) if any(char.isdigit() for char in segment) else segment
+        for segment in path.split("/")
+    ]
+    return "/".join(segments), {}
+
+
+class TrafficLog:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+
+class TrafficCapture:
+    def __init__(self, app, path: str = TRAFFIC_CAPTURE_PATH) -> None:
+        self.app = app
+        self.log = TrafficLog(path)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= TRAFFIC_CAPTURE_SAMPLE:
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        status = 500
+        started_at = time.time()
+        started = time.perf_counter()
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request" and len(body) <= TRAFFIC_CAPTURE_MAX_BODY:
+                body.extend(message.get("body", b""))
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            duration = time.perf_counter() - started
+            route = scope.get("route")
+            path, params = sanitize_path(scope["path"], scope.get("path_params"))
+            record = {
+                "ts": round(started_at, 6),
+                "method": scope["method"],
+                "path": path,
+                "route": getattr(route, "path", None),
+                "params": params,
+                "query": sanitize_query(scope.get("query_string", b"")),
+                "body": self._shape(body),
+                "body_bytes": len(body),
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+            }
+            self.log.write(record)
+
+    @staticmethod
+    def _shape(body: bytearray):
+        if not body or len(body) > TRAFFIC_CAPTURE_MAX_BODY:
+            return None
+        try:
+            return body_shape(json.loads(body))
+        except ValueError:
+            return "binary"
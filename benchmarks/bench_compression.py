@@ -0,0 +1,57 @@
+import argparse
+import gzip
+import random
+import time
+
+from app.compression import GZIP_LEVEL, EncodedBody, render_json
+
+
+def summary_payload(count: int) -> list[dict]:
+    random.seed(1)
+    opf = ["ООО", "ИП", "Физлицо"]
+    return [
+        {
+            "short_name": f"ООО Контрагент {index}",
+            "full_name": f"Общество с ограниченной ответственностью «Контрагент {index}»",
+            "opf": random.choice(opf),
+            "address": f"г. Москва, ул. Строителей, д. {index % 200}, офис {index % 50}",
+            "phone": f"+7 (495) {random.randint(100, 999)}-{random.randint(10, 99)}-{random.randint(10, 99)}",
+            "email": f"info{index}@example.ru",
+            "inn_ogrn_kpp": f"77{index:08d}/10277{index:08d}/770101001",
+        }
+        for index in range(count)
+    ]
+
+
+def measure(func, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Размер и стоимость сжатия JSON-ответов")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    raw = render_json(summary_payload(args.rows))
+    print(f"rows={args.rows} raw={len(raw)} bytes")
+    print(f"{'level':>5} {'bytes':>10} {'ratio':>7} {'cpu ms':>8}")
+    for level in (1, 6, 9):
+        size = len(gzip.compress(raw, compresslevel=level, mtime=0))
+        cpu = measure(
+            lambda level=level: gzip.compress(raw, compresslevel=level, mtime=0), args.repeat
+        )
+        print(f"{level:>5} {size:>10} {size / len(raw):>7.3f} {cpu:>8.2f}")
+
+    cached = EncodedBody(raw)
+    print(f"gzip={len(cached.gzipped)} bytes at level {GZIP_LEVEL}")
+    first = measure(lambda: EncodedBody(raw).gzipped, args.repeat)
+    repeat = measure(lambda: cached.gzipped, args.repeat)
+    print(f"cache miss cpu={first:.2f} ms, cache hit cpu={repeat:.4f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+
+STARTED = time.perf_counter()
+
+LOOKUPS = {
+    "object": ("SELECT id FROM objects ORDER BY id", "/api/ref/objects/{}"),
+    "llc": (
+        "SELECT counterparties_id FROM details_llc ORDER BY 1",
+        "/api/ref/counterparties/llc/{}",
+    ),
+    "by-inn": ("SELECT inn FROM details_llc ORDER BY inn", "/api/ref/counterparties/by-inn/{}"),
+}
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def sample(query: str, limit: int) -> list[str]:
+    from sqlalchemy import text
+
+    from app.database import reference_engine
+
+    with reference_engine.connect() as connection:
+        return [str(value) for value in connection.execute(text(query)).scalars()][:limit]
+
+
+def measure_service(identifiers: dict[str, list[str]], repeat: int) -> dict[str, list[float]]:
+    from app.database import ReferenceSessionLocal
+    from app.services.reference_service import ReferenceService
+
+    calls = {
+        "object": lambda service, key: service.get_object(key),
+        "llc": lambda service, key: service.get_counterparty_llc(key, parallel=False),
+        "by-inn": lambda service, key: service.find_counterparties_by_inn([key]),
+    }
+    results = {}
+    for name, keys in identifiers.items():
+        latencies = []
+        for index in range(repeat):
+            started = time.perf_counter()
+            with ReferenceSessionLocal() as db:
+                calls[name](ReferenceService(db), keys[index % len(keys)])
+            latencies.append((time.perf_counter() - started) * 1000)
+        results[name] = latencies
+    return results
+
+
+async def measure_http(app, identifiers: dict[str, list[str]], repeat: int) -> dict:
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://edge") as client:
+        for name, keys in identifiers.items():
+            latencies = []
+            for index in range(repeat):
+                path = LOOKUPS[name][1].format(keys[index % len(keys)])
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise SystemExit(f"{path}: {response.status_code}")
+            results[name] = latencies
+    return results
+
+
+async def run(repeat: int, keys: int) -> None:
+    from app.api import app
+    from app.lifespan import startup_state
+    from app.middleware.auth_middleware import get_session
+
+    imported = time.perf_counter()
+    app.dependency_overrides[get_session] = lambda: "bench"
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        print(
+            f"startup: import={imported - STARTED:.3f} s lifespan={startup_state.startup_seconds:.3f} s "
+            f"ready={ready - STARTED:.3f} s"
+        )
+        for name, seconds in startup_state.timings.items():
+            print(f"  {name:<40} {seconds:.4f} s")
+
+        identifiers = {name: sample(query, keys) for name, (query, _) in LOOKUPS.items()}
+        identifiers = {name: values for name, values in identifiers.items() if values}
+        service = await asyncio.to_thread(measure_service, identifiers, repeat)
+        http = await measure_http(app, identifiers, repeat)
+
+    print(f"{'lookup':<10} {'layer':<8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name in identifiers:
+        for layer, results in (("service", service), ("http", http)):
+            latencies = results[name]
+            print(
+                f"{name:<10} {layer:<8} {percentile(latencies, 0.5):>8.3f} "
+                f"{percentile(latencies, 0.99):>8.3f} {max(latencies):>8.3f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Время старта и задержка чтения на узле-копии")
+    parser.add_argument("database", type=Path, help="SQLite из manage.py edge-sync")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=200, help="сколько разных записей читать")
+    args = parser.parse_args()
+    if not args.database.exists():
+        parser.error(f"нет базы {args.database}: сначала manage.py edge-sync")
+
+    os.environ.update(
+        EDGE_DATABASE=str(args.database.resolve()),
+        EDGE_UPSTREAM_URL="",
+        EDGE_POLL_INTERVAL="0",
+        TRAFFIC_CAPTURE_PATH="",
+        DB_SCHEMA_MODE="check",
+    )
+    asyncio.run(run(args.repeat, args.keys))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from urllib.parse import urlencode
+
+READ_METHODS = ("GET", "HEAD")
+SAMPLE_VALUES = {"str": "x", "int": 1, "float": 1.0, "bool": False, "null": None}
+# Откуда брать идентификаторы вместо псевдонимов из параметров пути
+PARAM_SOURCES = {
+    "object_id": "SELECT id FROM objects ORDER BY id",
+    "person_id": "SELECT id FROM persons ORDER BY id",
+    "employee_id": "SELECT id FROM employees ORDER BY id",
+    "contract_id": "SELECT id FROM contracts ORDER BY id",
+    "work_type_id": "SELECT id FROM work_types ORDER BY id",
+    "counterparty_id": "SELECT id FROM counterparties ORDER BY id",
+    "inn": "SELECT inn FROM details_llc ORDER BY inn",
+    "ogrn": "SELECT ogrn FROM details_llc ORDER BY ogrn",
+}
+
+
+def load_records(path: Path, writes: bool) -> list[dict]:
+    records = []
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if writes or record["method"] in READ_METHODS:
+                records.append(record)
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def sample_body(shape):
+    if isinstance(shape, dict):
+        return {key: sample_body(item) for key, item in shape.items()}
+    if isinstance(shape, list):
+        return [sample_body(item) for item in shape]
+    return SAMPLE_VALUES.get(shape)
+
+
+def _convert(column, value):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(str(value))
+    return value
+
+
+def seed_database(database: Path, snapshot: Path) -> None:
+    from sqlalchemy import create_engine, insert, text
+    from sqlalchemy.orm import Session
+
+    from app.database import Base
+    from app.models.reference import ObjectDB, ObjectLevelDB
+    from app.services.counterparty_summary import rebuild_counterparty_summaries
+    from app.services.reference_service import SNAPSHOT_TABLES
+
+    database.unlink(missing_ok=True)
+    with gzip.open(snapshot, "rt", encoding="utf-8") as file:
+        data = json.load(file)
+
+    levels = [level for obj in data["objects"] for level in obj.pop("levels")]
+    tables = {
+        **{model.__table__: data[name] for name, model in SNAPSHOT_TABLES.items()},
+        ObjectDB.__table__: data["objects"],
+        ObjectLevelDB.__table__: levels,
+    }
+
+    engine = create_engine(f"sqlite:///{database}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE users (id CHAR(36) PRIMARY KEY, name VARCHAR(100), "
+                "surname VARCHAR(100), patronymic VARCHAR(100))"
+            )
+        )
+        for table in Base.metadata.sorted_tables:
+            rows = tables.get(table)
+            if not rows:
+                continue
+            connection.execute(
+                insert(table),
+                [
+                    {
+                        column.name: _convert(column, row.get(column.name))
+                        for column in table.columns
+                    }
+                    for row in rows
+                ],
+            )
+        user_ids = {row["user_id"] for row in data["internal_employees"]}
+        if user_ids:
+            connection.execute(
+                text("INSERT INTO users (id, name, surname) VALUES (:id, :name, :surname)"),
+                [
+                    {"id": user_id, "name": "Пользователь", "surname": user_id[:8]}
+                    for user_id in user_ids
+                ],
+            )
+    with Session(engine) as session:
+        summaries = rebuild_counterparty_summaries(session)
+    engine.dispose()
+    print(
+        f"seeded {database} from snapshot version {data['version']}, "
+        f"{summaries} counterparty summaries"
+    )
+
+
+def load_identifiers() -> dict[str, list[str]]:
+    from sqlalchemy import text
+
+    from app.database import reference_engine
+
+    with reference_engine.connect() as connection:
+        return {
+            name: [str(value) for value in connection.execute(text(query)).scalars()]
+            for name, query in PARAM_SOURCES.items()
+        }
+
+
+def request_path(record: dict, identifiers: dict[str, list[str]]) -> str:
+    # Один и тот же псевдоним всегда даёт один и тот же идентификатор,
+    # так что повторные обращения к записи сохраняются
+    params, route = record.get("params"), record.get("route")
+    if not params or not route:
+        return record["path"]
+    values = {}
+    for name, alias in params.items():
+        pool = identifiers.get(name)
+        if pool and alias.startswith("~"):
+            values[name] = pool[int(alias[1:], 16) % len(pool)]
+        else:
+            values[name] = alias
+    return route.format(**values)
+
+
+async def replay(records: list[dict], speed: float) -> dict[str, list]:
+    import httpx
+
+    from app.api import app
+    from app.middleware.auth_middleware import get_session
+
+    app.dependency_overrides[get_session] = lambda: "replay"
+    results: dict[str, list] = defaultdict(list)
+    first = records[0]["ts"]
+    identifiers = load_identifiers()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            started = time.perf_counter()
+
+            async def send(record: dict) -> None:
+                if speed > 0:
+                    delay = (record["ts"] - first) / speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                body = record.get("body")
+                query = urlencode([tuple(pair) for pair in record["query"]])
+                request_started = time.perf_counter()
+                try:
+                    response = await client.request(
+                        record["method"],
+                        request_path(record, identifiers) + (f"?{query}" if query else ""),
+                        json=sample_body(body) if isinstance(body, dict | list) else None,
+                    )
+                    status = response.status_code
+                except Exception:
+                    status = None
+                elapsed = (time.perf_counter() - request_started) * 1000
+                key = f"{record['method']} {record.get('route') or record['path']}"
+                results[key].append((elapsed, status, record.get("duration_ms")))
+
+            await asyncio.gather(*(send(record) for record in records))
+            results["__wall__"] = [(time.perf_counter() - started) * 1000, None, None]
+    return results
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def report(results: dict[str, list]) -> None:
+    wall = results.pop("__wall__")[0]
+    total = sum(len(items) for items in results.values())
+    print(
+        f"requests={total} wall={wall / 1000:.2f} s rate={total / max(wall / 1000, 1e-9):.1f} req/s"
+    )
+    print(
+        f"{'route':<55} {'count':>6} {'5xx':>5} {'4xx':>5} {'p50':>8} {'p95':>8} "
+        f"{'p99':>8} {'max':>8} {'orig p50':>9}"
+    )
+    for key in sorted(results, key=lambda key: -len(results[key])):
+        items = results[key]
+        latencies = [elapsed for elapsed, _, _ in items]
+        original = [duration for _, _, duration in items if duration is not None]
+        errors = sum(1 for _, status, _ in items if status is None or status >= 500)
+        rejected = sum(1 for _, status, _ in items if status is not None and 400 <= status < 500)
+        print(
+            f"{key[:55]:<55} {len(items):>6} {errors:>5} {rejected:>5} "
+            f"{percentile(latencies, 0.5):>8.1f} {percentile(latencies, 0.95):>8.1f} "
+            f"{percentile(latencies, 0.99):>8.1f} {max(latencies):>8.1f} "
+            f"{percentile(original, 0.5):>9.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Воспроизведение записанного трафика")
+    parser.add_argument("capture", type=Path, help="JSONL из TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--database", type=Path, default=Path("replay.db"))
+    parser.add_argument(
+        "--snapshot", type=Path, help="снимок /api/ref/snapshot для заполнения базы"
+    )
+    parser.add_argument("--speed", type=float, default=1.0, help="множитель темпа, 0 — без пауз")
+    parser.add_argument("--writes", action="store_true", help="воспроизводить и изменяющие запросы")
+    parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{args.database.resolve()}"
+    os.environ.update(
+        REFERENCE_DB_URL=url,
+        AUTH_DB_URL=url,
+        REFERENCE_REPLICA_URLS="",
+        TRAFFIC_CAPTURE_PATH="",
+        DB_SCHEMA_MODE="create",
+    )
+    if args.snapshot:
+        seed_database(args.database, args.snapshot)
+    elif not args.database.exists():
+        parser.error("нет базы для воспроизведения: укажите --snapshot")
+
+    records = load_records(args.capture, args.writes)
+    if args.limit:
+        records = records[: args.limit]
+    if not records:
+        parser.error("в журнале нет запросов для воспроизведения")
+    report(asyncio.run(replay(records, args.speed)))
+
+
+if __name__ == "__main__":
+    main()
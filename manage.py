@@ -0,0 +1,95 @@
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, inspect
+
+from app.database import EDGE_DATABASE, Base, ReferenceSessionLocal, reference_engine
+from app.edge import sync, target_engine
+from app.services.reference_service import ReferenceService
+
+
+def compact_changes(args: argparse.Namespace) -> None:
+    older_than = datetime.utcnow() - timedelta(days=args.days)
+    with ReferenceSessionLocal() as db:
+        deleted = ReferenceService(db).compact_changes(older_than)
+    print(f"Удалено записей ленты изменений: {deleted}")
+
+
+def rebuild_summaries(args: argparse.Namespace) -> None:
+    with ReferenceSessionLocal() as db:
+        count = ReferenceService(db).rebuild_counterparty_summaries()
+    print(f"Пересчитано сводок контрагентов: {count}")
+
+
+def create_indexes(args: argparse.Namespace) -> None:
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name == "sessions":
+            continue
+        for index in table.indexes:
+            with reference_engine.begin() as conn:
+                existing = {item["name"] for item in inspect(conn).get_indexes(table.name)}
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+    print(f"Создано индексов: {len(created)}")
+    for name in created:
+        print(f"  {name}")
+
+
+def edge_sync(args: argparse.Namespace) -> None:
+    if not args.source or not args.target:
+        raise SystemExit("Укажите --source и --target (или EDGE_SOURCE_URL и EDGE_DATABASE)")
+    source = create_engine(args.source, pool_pre_ping=True)
+    auth_source = create_engine(args.auth_source, pool_pre_ping=True) if args.auth_source else None
+    target = target_engine(args.target)
+    full = args.full
+    while True:
+        started = time.perf_counter()
+        result = sync(source, target, auth_source, full)
+        print(f"Синхронизация {args.target} за {time.perf_counter() - started:.2f} с: {result}")
+        full = False
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обслуживание ReferenceService")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compact = commands.add_parser(
+        "compact-changes",
+        help="Оставить в старой части ленты только последнее событие по каждой сущности",
+    )
+    compact.add_argument("--days", type=int, default=30)
+    compact.set_defaults(handler=compact_changes)
+
+    rebuild = commands.add_parser(
+        "rebuild-summaries", help="Полностью пересчитать таблицу counterparty_summaries"
+    )
+    rebuild.set_defaults(handler=rebuild_summaries)
+
+    indexes = commands.add_parser(
+        "create-indexes", help="Создать недостающие индексы из описания моделей"
+    )
+    indexes.set_defaults(handler=create_indexes)
+
+    edge = commands.add_parser(
+        "edge-sync", help="Выгрузить справочники в локальный SQLite и догонять ленту изменений"
+    )
+    edge.add_argument("--source", default=os.getenv("EDGE_SOURCE_URL"))
+    edge.add_argument("--auth-source", default=os.getenv("EDGE_AUTH_SOURCE_URL"))
+    edge.add_argument("--target", default=EDGE_DATABASE)
+    edge.add_argument("--full", action="store_true", help="выгрузить всё заново")
+    edge.add_argument("--interval", type=float, default=0, help="повторять каждые N секунд")
+    edge.set_defaults(handler=edge_sync)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,61 @@
+import argparse
+import os
+
 import uvicorn
+from dotenv import load_dotenv
 
 
-if __name__ == "__main__":
-    uvicorn.run(
-        "app.api:app",
-        host="0.0.0.0",
-        port=8388,
-        reload=True,
-        log_level="info",
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ReferenceService")
+    parser.add_argument("--dev", action="store_true", help="Один процесс с автоперезагрузкой")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8388")))
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1),
+    )
+    parser.add_argument(
+        "--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE_TIMEOUT", "15"))
+    )
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("BACKLOG", "2048")))
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30"))
     )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = parse_args()
+
+    if args.dev:
+        os.environ.setdefault("APP_DEBUG", "1")
+        uvicorn.run(
+            "app.api:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info",
+        )
+    else:
+        # Сброс кэша в памяти из одного воркера не виден остальным.
+        if args.workers > 1 and os.getenv("RESPONSE_CACHE_BACKEND", "sqlite") == "memory":
+            raise SystemExit(
+                "RESPONSE_CACHE_BACKEND=memory несовместим с несколькими воркерами: "
+                "используйте sqlite или redis"
+            )
+        uvicorn.run(
+            "app.api:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            loop="auto",
+            http="auto",
+            timeout_keep_alive=args.keep_alive,
+            backlog=args.backlog,
+            timeout_graceful_shutdown=args.graceful_timeout,
+            proxy_headers=True,
+            access_log=False,
+            log_level="info",
+        )
@@ -0,0 +1,197 @@
+import os
+import tempfile
+from datetime import datetime
+
+TMP_DIR = tempfile.mkdtemp(prefix="reference-tests-")
+DB_URL = f"sqlite:///{os.path.join(TMP_DIR, 'reference.db')}"
+PROFILE_TOKEN = "test-profile-token"
+
+for name in ("REFERENCE_REPLICA_URLS", "EDGE_DATABASE", "TRAFFIC_CAPTURE_PATH"):
+    os.environ.pop(name, None)
+os.environ.update(
+    REFERENCE_DB_URL=DB_URL,
+    AUTH_DB_URL=DB_URL,
+    RESPONSE_CACHE_BACKEND="sqlite",
+    RESPONSE_CACHE_URL=os.path.join(TMP_DIR, "response_cache.db"),
+    DB_SCHEMA_MODE="create",
+    DB_WARMUP_CONNECTIONS="0",
+    RESPONSE_CACHE_WARMUP="0",
+    SWR_SCHEDULER_INTERVAL="0",
+    CHANGE_FEED_SETTLE_SECONDS="0",
+    SESSION_FILTER_ENABLED="0",
+    PROFILE_TOKEN=PROFILE_TOKEN,
+)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+from app.api import app  # noqa: E402
+from app.cache import invalidate_tags  # noqa: E402
+from app.database import Base, ReferenceSessionLocal, reference_engine  # noqa: E402
+from app.middleware.auth_middleware import get_session  # noqa: E402
+from app.models import (  # noqa: E402
+    BankAccountDB,
+    ContractDB,
+    CounterpartyAdditionalDB,
+    CounterpartyDB,
+    DetailsIPDB,
+    DetailsLLCDB,
+    DetailsPhysDB,
+    EmployeeDB,
+    InternalEmployeeDB,
+    ObjectDB,
+    ObjectLevelDB,
+    PersonDB,
+    WorkTypeDB,
+)
+from app.services.counterparty_summary import rebuild_counterparty_summaries  # noqa: E402
+
+
+def seed() -> None:
+    Base.metadata.drop_all(reference_engine)
+    Base.metadata.create_all(reference_engine)
+    created_at = datetime(2024, 1, 1)
+    with ReferenceSessionLocal() as db:
+        db.add_all(
+            [
+                PersonDB(
+                    id="p1",
+                    name="Иван",
+                    last_naem="Иванов",
+                    phone_personal="+7 900 000-00-01",
+                    email_personal="ivanov@example.com",
+                ),
+                PersonDB(id="p2", name="Пётр", last_naem="Петров"),
+                PersonDB(id="p3", name="Анна", last_naem="Смирнова"),
+                PersonDB(id="p4", name="Олег", last_naem="Сидоров"),
+                CounterpartyDB(
+                    id="c1",
+                    type="LLC",
+                    short_name="ООО Ромашка",
+                    full_name="Общество с ограниченной ответственностью «Ромашка»",
+                    is_internal=True,
+                    created_at=created_at,
+                ),
+                CounterpartyDB(
+                    id="c2",
+                    type="IP",
+                    short_name="ИП Петров",
+                    full_name="Индивидуальный предприниматель Петров",
+                    is_internal=False,
+                    created_at=created_at,
+                ),
+                CounterpartyDB(
+                    id="c3",
+                    type="PHYSIC",
+                    short_name="Смирнова А.",
+                    full_name="Смирнова Анна",
+                    is_internal=False,
+                    created_at=created_at,
+                ),
+                DetailsLLCDB(
+                    id=1,
+                    counterparties_id="c1",
+                    inn="7700000001",
+                    kpp="770001001",
+                    ogrn="1027700000001",
+                    legal_address="Москва",
+                    actual_address="Москва",
+                    postal_address="Москва",
+                    director_person_id="p1",
+                ),
+                DetailsIPDB(
+                    id=1,
+                    counterparty_id="c2",
+                    inn="500000000002",
+                    ogrnip="304500000000002",
+                    person_id="p2",
+                ),
+                DetailsPhysDB(
+                    counterparty_id="c3",
+                    person_id="p3",
+                    inn="770000000003",
+                    address_registration="Тверь",
+                ),
+                CounterpartyAdditionalDB(counterparty_id="c1", additional_okved="62.01"),
+                BankAccountDB(
+                    id="b1",
+                    counterparty_id="c1",
+                    bank_name="Банк",
+                    bik="044525000",
+                    correspondent_account="30101810000000000000",
+                    account_number="40702810000000000001",
+                    account_name="Основной",
+                    is_treasury=False,
+                    is_main=True,
+                ),
+                EmployeeDB(
+                    id="e1",
+                    counterparty_id="c1",
+                    person_id="p1",
+                    position="Директор",
+                    phone_work="+7 495 000-00-01",
+                    role_type="director",
+                ),
+                EmployeeDB(id="e2", counterparty_id="c2", person_id="p2", position="ИП"),
+                EmployeeDB(id="e3", counterparty_id="c1", person_id="p4", position="Инженер"),
+                InternalEmployeeDB(
+                    id="i1", user_id="u1", counterparty_id="c1", position="Инженер", department="ИТ"
+                ),
+                ObjectDB(
+                    id="o1", short_name="Объект", manager_id="e1", is_active=True, created_at=created_at
+                ),
+                ContractDB(id="k1", name="Договор 1"),
+                WorkTypeDB(id="w1", name="Монтаж"),
+                ObjectLevelDB(
+                    id="l1",
+                    object_id="o1",
+                    name="Секция",
+                    level_type="section",
+                    level_number=1,
+                    is_active=True,
+                    created_at=created_at,
+                ),
+                ObjectLevelDB(
+                    id="l2",
+                    object_id="o1",
+                    name="Монтаж",
+                    level_type="worktype",
+                    level_number=2,
+                    is_active=True,
+                    work_type="w1",
+                    contract_id="k1",
+                    parent_id="l1",
+                    created_at=created_at,
+                ),
+            ]
+        )
+        db.commit()
+        rebuild_counterparty_summaries(db)
+        db.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS users "
+                "(id CHAR(36) PRIMARY KEY, name TEXT, surname TEXT, patronymic TEXT)"
+            )
+        )
+        db.execute(text("DELETE FROM users"))
+        db.execute(text("INSERT INTO users VALUES ('u1', 'Анна', 'Смирнова', 'Петровна')"))
+        db.commit()
+    invalidate_tags(Base.metadata.tables)
+
+
+@pytest.fixture
+def db():
+    seed()
+    with ReferenceSessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def client(db):
+    app.dependency_overrides[get_session] = lambda: "test-session"
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_session, None)
@@ -0,0 +1,45 @@
+import pytest
+from conftest import PROFILE_TOKEN
+
+from app import metrics
+
+METRICS_TOKEN = "test-metrics-token"
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "wrong"}])
+def test_slow_queries_require_profile_token(client, headers):
+    assert client.get("/slow-queries", headers=headers).status_code == 403
+
+
+def test_slow_queries_accept_profile_token(client):
+    assert client.get("/slow-queries", headers={"X-Profile": PROFILE_TOKEN}).status_code == 200
+
+
+def test_metrics_open_without_token(client):
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "query_cache" in response.json()
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {},
+        {"X-Profile": PROFILE_TOKEN},
+        {"Authorization": "Bearer wrong"},
+        {"Authorization": METRICS_TOKEN},
+    ],
+)
+def test_metrics_require_metrics_token(client, monkeypatch, headers):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", METRICS_TOKEN)
+
+    assert client.get("/metrics", headers=headers).status_code == 403
+
+
+def test_metrics_accept_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", METRICS_TOKEN)
+
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {METRICS_TOKEN}"})
+
+    assert response.status_code == 200
@@ -0,0 +1,39 @@
+import threading
+
+import pytest
+
+from app.database import AuthSessionLocal
+from app.routes import batch_routes
+
+REQUESTS = [
+    {"id": "summary", "path": "/api/ref/counterparties/summary"},
+    {"id": "internal", "path": "/api/ref/employees/internal"},
+    {"id": "object", "path": "/api/ref/objects/o1"},
+]
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_batch_runs_every_request(client, parallel):
+    response = client.post("/api/ref/batch", json={"requests": REQUESTS, "parallel": parallel})
+
+    assert response.status_code == 200
+    assert [(item["id"], item["status"]) for item in response.json()] == [
+        ("summary", 200),
+        ("internal", 200),
+        ("object", 200),
+    ]
+
+
+def test_parallel_batch_opens_auth_session_only_when_needed(client, monkeypatch):
+    opened = []
+
+    def auth_session():
+        opened.append(threading.current_thread().name)
+        return AuthSessionLocal()
+
+    monkeypatch.setattr(batch_routes, "AuthSessionLocal", auth_session)
+
+    response = client.post("/api/ref/batch", json={"requests": REQUESTS, "parallel": True})
+
+    assert response.status_code == 200
+    assert len(opened) == 1 and opened[0].startswith("batch")
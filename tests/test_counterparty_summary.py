@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, event
+from sqlalchemy.dialects import mysql
+
+from app.api import app
+from app.database import reference_engine
+from app.models import CounterpartySummaryDB, EmployeeDB
+from app.services.counterparty_summary import refresh_counterparty_summaries
+
+
+def test_empty_summary_table_is_backfilled_on_startup(client, db):
+    db.execute(delete(CounterpartySummaryDB))
+    db.commit()
+
+    with TestClient(app) as restarted:
+        response = restarted.get("/api/ref/counterparties/summary")
+
+    assert response.status_code == 200
+    assert {row["short_name"] for row in response.json()} == {
+        "ООО Ромашка",
+        "ИП Петров",
+        "Смирнова А.",
+    }
+
+
+def summary_phone(db, counterparty_id: str) -> str | None:
+    db.expire_all()
+    return db.get(CounterpartySummaryDB, counterparty_id).phone
+
+
+def test_moving_employee_refreshes_previous_counterparty(db):
+    assert summary_phone(db, "c1") == "+7 495 000-00-01"
+
+    db.get(EmployeeDB, "e1").counterparty_id = "c2"
+    db.commit()
+
+    assert summary_phone(db, "c1") == "+7 900 000-00-01"
+
+
+def test_deleting_employee_refreshes_counterparty(db):
+    db.delete(db.get(EmployeeDB, "e1"))
+    db.commit()
+
+    assert summary_phone(db, "c1") == "+7 900 000-00-01"
+
+
+def test_refresh_locks_counterparty_rows(db):
+    compiled = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        compiled.append(str(context.compiled.statement.compile(dialect=mysql.dialect())))
+
+    event.listen(reference_engine, "before_cursor_execute", record)
+    try:
+        refresh_counterparty_summaries(db, {"c1"})
+    finally:
+        event.remove(reference_engine, "before_cursor_execute", record)
+    db.commit()
+
+    assert compiled[0].startswith("SELECT counterparties.id") and compiled[0].endswith("FOR UPDATE")
+    reads = [statement for statement in compiled[1:] if statement.startswith("SELECT")]
+    assert reads and all(statement.endswith("LOCK IN SHARE MODE") for statement in reads)
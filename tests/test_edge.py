@@ -0,0 +1,101 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import edge
+from app.api import app
+from app.database import reference_engine
+from app.edge import EdgeMode, apply_changes, full_export, get_state, target_engine
+from app.models import CounterpartyDB, CounterpartySummaryDB, ObjectDB
+from app.services.reference_service import ReferenceService
+
+
+@pytest.fixture
+def target(db, tmp_path):
+    engine = target_engine(str(tmp_path / "edge.db"))
+    yield engine
+    engine.dispose()
+
+
+def count(engine, model) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+def test_full_export_copies_reference_tables(target):
+    copied = full_export(reference_engine, target)
+
+    assert copied > 0
+    for model in (CounterpartyDB, ObjectDB, CounterpartySummaryDB):
+        assert count(target, model) == count(reference_engine, model)
+    with target.connect() as conn:
+        state = get_state(conn)
+    assert state["version"] == "1"
+    with Session(target) as session:
+        assert ReferenceService(session).get_counterparty_llc("c1", parallel=False)["id"] == "c1"
+
+
+def test_apply_changes_follows_change_feed(client, target):
+    full_export(reference_engine, target)
+    with target.connect() as conn:
+        before = get_state(conn)
+    created = client.post("/api/ref/objects", json={"short_name": "Новый", "manager_id": "e1"})
+
+    assert apply_changes(reference_engine, target) == 1
+    assert apply_changes(reference_engine, target) == 0
+    with target.connect() as conn:
+        state = get_state(conn)
+        names = conn.execute(select(ObjectDB.short_name).where(ObjectDB.id == created.json()["id"]))
+        assert names.scalar_one() == "Новый"
+    assert int(state["cursor"]) > int(before["cursor"])
+    assert state["version"] == "2"
+
+
+def test_read_only_edge_rejects_writes(client, monkeypatch):
+    monkeypatch.setattr(edge, "EDGE_UPSTREAM_URL", "")
+    edge_client = TestClient(EdgeMode(app))
+
+    response = edge_client.post("/api/ref/objects", json={"short_name": "Новый"})
+
+    assert response.status_code == 405
+    assert response.headers["Allow"] == "GET, HEAD"
+    assert edge_client.get("/api/ref/objects/o1").status_code == 200
+    assert edge_client.post("/api/ref/batch", json={"requests": []}).status_code != 405
+
+
+def test_edge_forwards_writes_upstream(client, monkeypatch):
+    monkeypatch.setattr(edge, "EDGE_UPSTREAM_URL", "http://upstream")
+    forwarded = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        forwarded.append(request)
+        return httpx.Response(201, json={"id": "o9"}, headers={"X-Upstream": "1"})
+
+    middleware = EdgeMode(app)
+    middleware._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+
+    response = TestClient(middleware).post(
+        "/api/ref/objects?source=edge", json={"short_name": "Новый"}, headers={"X-Session": "s1"}
+    )
+
+    assert response.status_code == 201
+    assert response.json() == {"id": "o9"}
+    assert response.headers["X-Upstream"] == "1"
+    [request] = forwarded
+    assert str(request.url) == "http://upstream/api/ref/objects?source=edge"
+    assert request.headers["X-Session"] == "s1"
+    assert request.content == '{"short_name":"Новый"}'.encode()
+
+
+def test_edge_reports_unavailable_upstream(client, monkeypatch):
+    monkeypatch.setattr(edge, "EDGE_UPSTREAM_URL", "http://upstream")
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("down", request=request)
+
+    middleware = EdgeMode(app)
+    middleware._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+
+    assert TestClient(middleware).delete("/api/ref/objects/o1").status_code == 502
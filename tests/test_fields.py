@@ -0,0 +1,14 @@
+import pytest
+
+from app.models import EmployeeDB
+
+
+@pytest.mark.parametrize("fields", ["id", "id,position", "id,name", "id,counterparty_name"])
+def test_employee_rows_do_not_depend_on_fields(client, db, fields):
+    db.add(EmployeeDB(id="e4", counterparty_id="c1", person_id="missing", position="Инженер"))
+    db.commit()
+
+    full = client.get("/api/ref/employees").json()
+    sparse = client.get(f"/api/ref/employees?fields={fields}").json()
+
+    assert [row["id"] for row in sparse] == [row["id"] for row in full] == ["e1", "e2", "e3"]
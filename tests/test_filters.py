@@ -0,0 +1,35 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/ref/objects?manager=e9",
+        "/api/ref/objects?manager_id=e1&sort__in=id",
+        "/api/ref/employees?counterparty=c1",
+        "/api/ref/contracts?contract=1",
+        "/api/ref/counterparties?kind=LLC",
+    ],
+)
+def test_unknown_filter_is_rejected(client, path):
+    response = client.get(path)
+
+    assert response.status_code == 400
+    assert "Неизвестный фильтр" in response.json()["detail"]
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/ref/objects?manager_id=e1&fields=id,short_name&sort=-id",
+        "/api/ref/employees?counterparty_id=c1&sort=id",
+        "/api/ref/counterparties?type=LLC&is_internal=false&fields=id",
+    ],
+)
+def test_route_parameters_are_not_filters(client, path):
+    assert client.get(path).status_code == 200
+
+
+def test_filter_narrows_objects(client):
+    assert [row["id"] for row in client.get("/api/ref/objects?manager_id=e9").json()] == []
+    assert [row["id"] for row in client.get("/api/ref/objects?manager_id=e1").json()] == ["o1"]
@@ -0,0 +1,84 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import ObjectDB, ObjectLevelDB
+
+BULK = "/api/ref/objects/o1/levels/bulk"
+
+
+def levels(structure: dict) -> dict[str, dict]:
+    result = {}
+    pending = list(structure["children"])
+    for node in pending:
+        result[node["id"]] = node
+        pending.extend(node["children"])
+    return result
+
+
+@pytest.mark.parametrize(("level_id", "parent_id"), [("l1", "l2"), ("l1", "l1")])
+def test_move_into_own_subtree_is_rejected(client, level_id, parent_id):
+    response = client.post(
+        BULK, json={"operations": [{"op": "move", "level_id": level_id, "parent_id": parent_id}]}
+    )
+
+    assert response.status_code == 400
+    assert "цикл" in response.json()["detail"]
+    assert levels(client.get("/api/ref/objects/o1/structure").json())["l2"]["parent_id"] == "l1"
+
+
+def test_move_under_level_with_foreign_parent(client, db):
+    created_at = datetime(2024, 1, 1)
+    db.add_all(
+        [
+            ObjectDB(id="o2", short_name="Другой", manager_id="e1", created_at=created_at),
+            ObjectLevelDB(
+                id="m1",
+                object_id="o2",
+                name="Чужой",
+                level_type="section",
+                level_number=1,
+                created_at=created_at,
+            ),
+            ObjectLevelDB(
+                id="l3",
+                object_id="o1",
+                name="Перенесённый",
+                level_type="section",
+                level_number=2,
+                parent_id="m1",
+                created_at=created_at,
+            ),
+        ]
+    )
+    db.commit()
+
+    response = client.post(
+        BULK, json={"operations": [{"op": "move", "level_id": "l1", "parent_id": "l3"}]}
+    )
+
+    assert response.status_code == 200
+    assert levels(response.json())["l1"]["parent_id"] == "l3"
+
+
+def test_subtree_toggles(client):
+    response = client.post(
+        BULK, json={"operations": [{"op": "deactivate", "level_id": "l1", "subtree": True}]}
+    )
+    assert response.status_code == 200
+    assert {key: row["is_active"] for key, row in levels(response.json()).items()} == {
+        "l1": False,
+        "l2": False,
+    }
+
+    response = client.post(BULK, json={"operations": [{"op": "activate", "level_id": "l1"}]})
+    assert {key: row["is_active"] for key, row in levels(response.json()).items()} == {
+        "l1": True,
+        "l2": False,
+    }
+
+
+def test_unknown_operation_is_rejected(client):
+    response = client.post(BULK, json={"operations": [{"op": "delete", "level_id": "l1"}]})
+
+    assert response.status_code == 422
@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+
+from app.database import reference_engine
+from app.services import reference_service
+
+PROFILES = [
+    "/api/ref/counterparties/llc/c1",
+    "/api/ref/counterparties/ip/c2",
+    "/api/ref/counterparties/phys/c3",
+]
+
+
+@pytest.mark.parametrize("path", PROFILES)
+def test_parallel_subqueries_use_shared_executor(client, monkeypatch, path):
+    sequential = client.get(path).json()
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="profile-query-test")
+    monkeypatch.setattr(reference_service, "_query_executor", executor)
+    threads_used = set()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        threads_used.add(threading.current_thread().name)
+
+    event.listen(reference_engine, "before_cursor_execute", record)
+    try:
+        responses = []
+
+        def fetch() -> None:
+            responses.append(client.get(path).json())
+
+        threads = [threading.Thread(target=fetch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+    finally:
+        event.remove(reference_engine, "before_cursor_execute", record)
+        executor.shutdown()
+
+    assert responses == [sequential] * 4
+    assert any(name.startswith("profile-query-test") for name in threads_used)
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import Column, MetaData, Table, Text, create_engine, event, text
+
+from app.cache import QueryResultCache
+from app.database import reference_engine
+from app.models import WorkTypeDB
+from app.replication import ReplicaRouter, RoutingSession
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(reference_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(reference_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize(("shared", "queries"), [(True, 1), (False, 2)])
+def test_query_cache_requires_shared_backend(db, statements, shared, queries):
+    cache = QueryResultCache(100, 100, 60, shared=shared)
+    query = db.query(WorkTypeDB.id, WorkTypeDB.name)
+
+    assert cache.all(db, query) == cache.all(db, query)
+    assert len(statements) == queries
+    assert cache.as_dict()["enabled"] is shared
+
+
+def test_primary_read_does_not_hit_replica_rows(tmp_path):
+    engines = {}
+    for name in ("primary", "replica"):
+        engines[name] = create_engine(f"sqlite:///{tmp_path / name}.db")
+        with engines[name].begin() as conn:
+            conn.execute(text("CREATE TABLE marker (value TEXT)"))
+            conn.execute(text("INSERT INTO marker VALUES (:value)"), {"value": name})
+    router = ReplicaRouter(engines["primary"], [engines["replica"]], 5, 60, 5)
+    cache = QueryResultCache(100, 100, 60, shared=True)
+    marker = Table("marker", MetaData(), Column("value", Text))
+
+    with RoutingSession(router=router, bind=engines["primary"]) as db:
+        db.use_replica()
+        assert cache.all(db, db.query(marker.c.value)) == [("replica",)]
+        db.use_primary()
+        assert cache.all(db, db.query(marker.c.value)) == [("primary",)]
@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.database import reference_engine
+from app.models import CounterpartyDB, DetailsLLCDB, EmployeeDB
+from app.services.loader import Loader
+
+BY_INN = "/api/ref/counterparties/by-inn/7700000001,500000000002,770000000003"
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(reference_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(reference_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "body", "queries"),
+    [
+        ("GET", "/api/ref/counterparties/llc/c1", None, 6),
+        ("GET", "/api/ref/counterparties/ip/c2", None, 4),
+        ("GET", "/api/ref/counterparties/phys/c3", None, 4),
+        ("GET", "/api/ref/counterparties/c1/full-profile", None, 6),
+        ("GET", BY_INN, None, 9),
+        ("GET", "/api/ref/employees/internal", None, 4),
+        ("POST", "/api/ref/objects", {"short_name": "Новый", "manager_id": "e1"}, 4),
+    ],
+)
+def test_statements_per_endpoint(client, statements, method, path, body, queries):
+    response = client.request(method, path, json=body)
+
+    assert response.status_code == 200
+    assert len(statements) == queries
+
+
+def test_counterparties_loaded_in_one_batch(client, statements):
+    assert len(client.get(BY_INN).json()) == 3
+    assert sum("FROM counterparties " in statement for statement in statements) == 1
+
+
+def test_profile_lookup_statements_do_not_grow_with_matches(client, db, statements):
+    client.get("/api/ref/counterparties/by-inn/7700000001")
+    single = len(statements)
+    inns = []
+    for number in range(4, 9):
+        db.add_all(
+            [
+                CounterpartyDB(
+                    id=f"c{number}",
+                    type="LLC",
+                    short_name=f"ООО {number}",
+                    full_name=f"ООО {number}",
+                    is_internal=False,
+                    created_at=datetime(2024, 1, 1),
+                ),
+                DetailsLLCDB(
+                    id=number,
+                    counterparties_id=f"c{number}",
+                    inn=f"770000000{number}",
+                    kpp="770001001",
+                    ogrn=f"10277000000{number}",
+                    legal_address="Москва",
+                    actual_address="Москва",
+                    postal_address="Москва",
+                    director_person_id="p1",
+                ),
+            ]
+        )
+        inns.append(f"770000000{number}")
+    db.commit()
+    statements.clear()
+
+    profiles = client.get(f"/api/ref/counterparties/by-inn/7700000001,{','.join(inns)}").json()
+
+    assert len(profiles) == 6
+    assert len(statements) == single
+
+
+def test_loader_batches_foreign_key_lookups(db, statements):
+    loader = Loader.of(db)
+    loader.prefetch_by(EmployeeDB, "counterparty_id", ["c1", "c2", "c3"])
+
+    assert [row.id for row in loader.load_by(EmployeeDB, "counterparty_id", "c1")] == ["e1", "e3"]
+    assert [row.id for row in loader.load_by(EmployeeDB, "counterparty_id", "c2")] == ["e2"]
+    assert loader.load_by(EmployeeDB, "counterparty_id", "c3") == []
+    assert loader.load(EmployeeDB, "e2").person_id == "p2"
+    assert len(statements) == 1
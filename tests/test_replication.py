@@ -0,0 +1,114 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app import cache, database, replication
+from app.cache import cached_response, invalidate_tables, invalidate_tags
+from app.database import DbSession
+from app.replication import ReplicaRouter, RoutingSession
+
+
+def sqlite_engine(path: str, value: str | None = None):
+    engine = create_engine(f"sqlite:///{path}")
+    if value is not None:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE marker (value TEXT)"))
+            conn.execute(text("INSERT INTO marker VALUES (:value)"), {"value": value})
+    return engine
+
+
+@pytest.fixture
+def routed(tmp_path, monkeypatch):
+    def build(replica_path: str | None = None) -> tuple[TestClient, ReplicaRouter]:
+        primary = sqlite_engine(str(tmp_path / "primary.db"), "primary")
+        if replica_path is None:
+            replica = sqlite_engine(str(tmp_path / "replica.db"), "replica")
+        else:
+            replica = sqlite_engine(replica_path)
+        router = ReplicaRouter(
+            primary=primary,
+            replicas=[replica],
+            max_lag_seconds=5,
+            check_interval=60,
+            read_your_writes_seconds=5,
+        )
+        monkeypatch.setattr(database, "replica_router", router)
+        monkeypatch.setattr(cache, "replica_router", router)
+        invalidate_tags(["marker"])
+        monkeypatch.setattr(
+            database,
+            "ReferenceSessionLocal",
+            sessionmaker(class_=RoutingSession, router=router, bind=primary),
+        )
+
+        app = FastAPI()
+
+        @app.get("/value")
+        def read(db: DbSession):
+            return db.execute(text("SELECT value FROM marker")).scalar()
+
+        @app.get("/cached")
+        def cached(request: Request, db: DbSession):
+            return cached_response(
+                request,
+                db,
+                ("marker",),
+                lambda: db.execute(text("SELECT value FROM marker")).scalar(),
+            )
+
+        @app.post("/value")
+        def write(db: DbSession):
+            db.execute(text("UPDATE marker SET value = 'written'"))
+            invalidate_tables(db, "marker")
+            db.commit()
+
+        return TestClient(app), router
+
+    return build
+
+
+def test_reads_go_to_replica_without_probing_on_request(routed, monkeypatch):
+    client, _ = routed()
+
+    def probe(engine):
+        raise AssertionError("проверка отставания на пути запроса")
+
+    monkeypatch.setattr(replication, "replica_lag_seconds", probe)
+
+    assert client.get("/value").json() == "replica"
+
+
+def test_read_after_write_goes_to_primary(routed):
+    client, _ = routed()
+
+    assert client.post("/value").cookies.get(replication.READ_YOUR_WRITES_COOKIE)
+    assert client.get("/value").json() == "written"
+
+    client.cookies.clear()
+    assert client.get("/value").json() == "replica"
+
+
+def test_replica_error_retries_on_primary(routed, tmp_path):
+    client, router = routed(str(tmp_path / "missing" / "replica.db"))
+
+    assert client.get("/value").json() == "primary"
+    assert router.read_engine() is router.primary
+
+    router.check()
+    assert router.read_engine() is router.primary
+
+
+def test_writer_does_not_read_replica_response_from_cache(routed):
+    writer, _ = routed()
+    writer.post("/value")
+
+    # Другой клиент кладёт в кэш ответ отстающей реплики уже после записи.
+    other = TestClient(writer.app)
+    assert other.get("/cached").json() == "replica"
+    assert other.get("/cached").headers["X-Cache"] == "HIT"
+
+    response = writer.get("/cached")
+    assert response.json() == "written"
+    assert response.headers["X-Cache"] == "BYPASS"
@@ -0,0 +1,126 @@
+import re
+
+import pytest
+from sqlalchemy import event, update
+
+from app.database import Base, ReferenceSessionLocal, reference_engine
+from app.models import (
+    BankAccountDB,
+    ContractDB,
+    CounterpartyAdditionalDB,
+    CounterpartyDB,
+    CounterpartySummaryDB,
+    DetailsIPDB,
+    DetailsLLCDB,
+    DetailsPhysDB,
+    EmployeeDB,
+    InternalEmployeeDB,
+    ObjectDB,
+    ObjectLevelDB,
+    PersonDB,
+    WorkTypeDB,
+)
+from app.routes.reference_routes import (
+    INTERNAL_EMPLOYEE_TABLES,
+    PROFILE_TABLES,
+    STRUCTURE_TABLES,
+    SUMMARY_TABLES,
+)
+from app.services.reference_service import ReferenceService
+
+CACHED_ENDPOINTS = [
+    ("/api/ref/objects/o1/structure", STRUCTURE_TABLES),
+    ("/api/ref/objects/structures?ids=o1", STRUCTURE_TABLES),
+    ("/api/ref/counterparties/c1/full-profile", PROFILE_TABLES),
+    ("/api/ref/counterparties/c2/full-profile", PROFILE_TABLES),
+    ("/api/ref/counterparties/c3/full-profile", PROFILE_TABLES),
+    ("/api/ref/counterparties/by-inn/7700000001", PROFILE_TABLES),
+    ("/api/ref/counterparties/summary", SUMMARY_TABLES),
+    ("/api/ref/employees/internal", INTERNAL_EMPLOYEE_TABLES),
+]
+
+# Изменение, которое затрагивает данные каждого закэшированного ответа.
+WRITES = {
+    "objects": (ObjectDB, "o1", "short_name", "Объект (ред.)"),
+    "object_levels": (ObjectLevelDB, "l1", "name", "Секция (ред.)"),
+    "employees": (EmployeeDB, "e1", "phone_work", "+7 495 000-00-99"),
+    "persons": (PersonDB, "p1", "middle_name", "Иванович"),
+    "contracts": (ContractDB, "k1", "name", "Договор 1 (ред.)"),
+    "work_types": (WorkTypeDB, "w1", "name", "Монтаж (ред.)"),
+    "counterparties": (CounterpartyDB, "c1", "short_name", "ООО Ромашка (ред.)"),
+    "details_llc": (DetailsLLCDB, 1, "legal_address", "Санкт-Петербург"),
+    "details_ip": (DetailsIPDB, 1, "ogrnip", "304500000000099"),
+    "details_phys": (DetailsPhysDB, ("c3", "p3"), "address_registration", "Тула"),
+    "counterparties_additional": (
+        CounterpartyAdditionalDB,
+        ("c1", "62.01"),
+        "additional_okved",
+        "62.02",
+    ),
+    "bank_accounts": (BankAccountDB, "b1", "bank_name", "Другой банк"),
+    "internal_employees": (InternalEmployeeDB, "i1", "department", "Бухгалтерия"),
+    "counterparty_summaries": (CounterpartySummaryDB, "c1", "phone", "+7 000"),
+}
+
+
+def write(table: str) -> None:
+    model, key, attribute, value = WRITES[table]
+    with ReferenceSessionLocal() as db:
+        setattr(db.get(model, key), attribute, value)
+        db.commit()
+
+
+def tables_read(client, path: str) -> set[str]:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(reference_engine, "before_cursor_execute", record)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(reference_engine, "before_cursor_execute", record)
+    assert response.headers["X-Cache"] == "MISS"
+    sql = "\n".join(statements)
+    return {name for name in Base.metadata.tables if re.search(rf"\b{name}\b", sql)}
+
+
+@pytest.mark.parametrize(("path", "tags"), CACHED_ENDPOINTS)
+def test_tags_cover_tables_read_by_builder(client, path, tags):
+    assert tables_read(client, path) <= set(tags)
+
+
+@pytest.mark.parametrize(
+    ("path", "table"),
+    [(path, table) for path, tags in CACHED_ENDPOINTS for table in tags],
+)
+def test_write_to_dependent_table_misses(client, path, table):
+    assert client.get(path).headers["X-Cache"] == "MISS"
+    assert client.get(path).headers["X-Cache"] == "HIT"
+
+    write(table)
+
+    assert client.get(path).headers["X-Cache"] == "MISS"
+
+
+
+def test_summary_reflects_employee_phone(client):
+    before = client.get("/api/ref/counterparties/summary?name=ООО").json()
+    assert before[0]["phone"] == "+7 495 000-00-01"
+
+    write("employees")
+
+    response = client.get("/api/ref/counterparties/summary?name=ООО")
+    assert response.headers["X-Cache"] == "MISS"
+    assert response.json()[0]["phone"] == "+7 495 000-00-99"
+
+
+def test_summary_rebuild_invalidates_cached_rows(client, db):
+    assert client.get("/api/ref/counterparties/summary").headers["X-Cache"] == "MISS"
+    db.execute(update(CounterpartyDB).where(CounterpartyDB.id == "c2").values(short_name="ИП Петров П."))
+    ReferenceService(db).rebuild_counterparty_summaries()
+
+    response = client.get("/api/ref/counterparties/summary")
+    assert response.headers["X-Cache"] == "MISS"
+    assert "ИП Петров П." in {row["short_name"] for row in response.json()}
@@ -0,0 +1,74 @@
+import hashlib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import session_filter as module
+from app.database import AuthSessionLocal, auth_engine
+from app.models import SessionDB
+from app.session_filter import SessionFilter
+
+GARBAGE = hashlib.sha256(b"garbage").hexdigest()
+
+
+def add_session(token: str, ttl: timedelta) -> str:
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    with AuthSessionLocal() as db:
+        db.add(SessionDB(token_hash=token_hash, expires_at=datetime.utcnow() + ttl))
+        db.commit()
+    return token_hash
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(auth_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(auth_engine, "before_cursor_execute", record)
+
+
+def test_garbage_token_is_rejected_without_queries(db, statements):
+    sessions = SessionFilter(enabled=True)
+    sessions.rebuild()
+    statements.clear()
+
+    for _ in range(10):
+        assert not sessions.might_contain(GARBAGE)
+
+    assert statements == []
+    assert sessions.rejected == 10
+
+
+@pytest.mark.parametrize("min_ttl", [0, 3600])
+def test_short_lived_session_added_after_longer_one_is_accepted(db, monkeypatch, min_ttl):
+    monkeypatch.setattr(module, "SESSION_FILTER_MIN_TTL", min_ttl)
+    sessions = SessionFilter(enabled=True)
+    add_session("long", timedelta(days=30))
+    sessions.rebuild()
+
+    short = add_session("short", timedelta(hours=1, minutes=1))
+    sessions.refresh()
+
+    assert sessions.might_contain(short)
+    assert not sessions.might_contain(GARBAGE)
+    assert sessions.rebuilds == (2 if min_ttl == 0 else 1)
+
+
+def test_stale_filter_refreshes_once_per_interval(db, statements):
+    sessions = SessionFilter(enabled=True)
+    sessions.rebuild()
+    token_hash = add_session("fresh", timedelta(hours=1))
+    sessions.refreshed_at -= module.SESSION_FILTER_REFRESH_INTERVAL
+    statements.clear()
+
+    assert sessions.might_contain(token_hash)
+    refreshed = len(statements)
+    assert refreshed == 1
+
+    assert not sessions.might_contain(GARBAGE)
+    assert len(statements) == refreshed
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app.database import reference_engine
+from app.single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def run_callers(flight: SingleFlight, func) -> list:
+    outcomes = [None] * CALLERS
+
+    def call(index: int) -> None:
+        try:
+            outcomes[index] = flight.do("key", func)
+        except Exception as exc:
+            outcomes[index] = exc
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def blocking(result):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    return func, started, release, calls
+
+
+@pytest.mark.parametrize("result", ["value", ValueError("boom")])
+def test_concurrent_callers_share_one_computation(result):
+    flight = SingleFlight()
+    func, started, release, calls = blocking(result)
+
+    outcomes = []
+    runner = threading.Thread(target=lambda: outcomes.extend(run_callers(flight, func)))
+    runner.start()
+    assert started.wait(5)
+    # Все остальные вызовы должны встать в ожидание ведущего.
+    for _ in range(500):
+        if flight.coalesced == CALLERS - 1:
+            break
+        time.sleep(0.01)
+    release.set()
+    runner.join(5)
+
+    assert len(calls) == 1
+    assert flight.leaders == 1 and flight.coalesced == CALLERS - 1
+    assert all(outcome is result for outcome in outcomes)
+    assert flight.as_dict()["in_flight"] == 0
+
+
+@pytest.mark.parametrize("result", ["value", ValueError("boom")])
+def test_concurrent_async_callers_share_one_computation(result):
+    flight = SingleFlight()
+    calls = []
+
+    async def func():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def call():
+        try:
+            return await flight.do_async("key", func)
+        except ValueError as exc:
+            return exc
+
+    async def main():
+        return await asyncio.gather(*(call() for _ in range(CALLERS)))
+
+    outcomes = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert flight.leaders == 1 and flight.coalesced == CALLERS - 1
+    assert all(outcome is result for outcome in outcomes)
+    assert flight.as_dict()["in_flight"] == 0
+
+
+def test_concurrent_summary_requests_run_one_query(client):
+    summary_queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM counterparty_summaries" in statement and not statement.startswith("EXPLAIN"):
+            summary_queries.append(statement)
+            # Держим ведущий запрос, пока остальные не встанут в ожидание.
+            time.sleep(0.2)
+
+    event.listen(reference_engine, "before_cursor_execute", record)
+    try:
+        responses = []
+        threads = [
+            threading.Thread(
+                target=lambda: responses.append(client.get("/api/ref/counterparties/summary"))
+            )
+            for _ in range(CALLERS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+    finally:
+        event.remove(reference_engine, "before_cursor_execute", record)
+
+    assert [response.status_code for response in responses] == [200] * CALLERS
+    assert len({response.content for response in responses}) == 1
+    assert len(summary_queries) == 1
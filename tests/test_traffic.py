@@ -0,0 +1,60 @@
+import json
+from urllib.parse import urlencode
+
+from fastapi.testclient import TestClient
+
+from app.api import app
+from app.traffic import TrafficCapture, pseudonym, sanitize_path, sanitize_query
+from benchmarks.replay import request_path
+
+
+def test_query_keeps_only_request_shape():
+    query_string = urlencode(
+        {
+            "search": "Иванов",
+            "q": "ООО Ромашка",
+            "manager_id": "e1,e2",
+            "fields": "id",
+            "sort": "-id",
+            "token": "abc",
+        }
+    )
+
+    query = sanitize_query(query_string.encode())
+
+    assert query == [
+        ["search", pseudonym("Иванов")],
+        ["q", pseudonym("ООО Ромашка")],
+        ["manager_id", f"{pseudonym('e1')},{pseudonym('e2')}"],
+        ["fields", "id"],
+        ["sort", "-id"],
+        ["token", "***"],
+    ]
+    assert "Иванов" not in json.dumps(query, ensure_ascii=False)
+
+
+def test_path_identifiers_are_masked():
+    path, params = sanitize_path("/api/ref/counterparties/by-inn/7700000001", {"inn": "7700000001"})
+
+    assert path == f"/api/ref/counterparties/by-inn/{pseudonym('7700000001')}"
+    assert params == {"inn": pseudonym("7700000001")}
+    assert sanitize_path("/api/ref/unknown/c42/x", None)[0] == (
+        f"/api/ref/unknown/{pseudonym('c42')}/x"
+    )
+
+
+def test_capture_writes_no_identifiers(client, tmp_path):
+    capture = tmp_path / "traffic.jsonl"
+    with TestClient(TrafficCapture(app, str(capture))) as capturing:
+        assert capturing.get("/api/ref/counterparties/c1/full-profile").status_code == 200
+        assert capturing.get("/api/ref/persons?search=Иван").status_code == 200
+
+    lines = capture.read_text(encoding="utf-8")
+    record, search = [json.loads(line) for line in lines.splitlines()]
+    assert "/c1/" not in record["path"] and record["params"]["counterparty_id"] != "c1"
+    assert "Иван" not in lines and search["query"] == [["search", pseudonym("Иван")]]
+    assert record["route"] == "/api/ref/counterparties/{counterparty_id}/full-profile"
+
+    path = request_path(record, {"counterparty_id": ["c1", "c2", "c3"]})
+    assert path.startswith("/api/ref/counterparties/c")
+    assert path == request_path(record, {"counterparty_id": ["c1", "c2", "c3"]})
@@ -0,0 +1,20 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import routes
+from app.api import app
+from app.middleware.auth_middleware import get_session
+
+
+@pytest.mark.parametrize("path", ["/api/ref/counterparties/summary", "/api/ref/employees/internal"])
+def test_startup_builds_heavy_responses_into_cache(db, monkeypatch, path):
+    monkeypatch.setattr(routes, "RESPONSE_CACHE_WARMUP", True)
+    app.dependency_overrides[get_session] = lambda: "test-session"
+    try:
+        with TestClient(app) as client:
+            response = client.get(path)
+    finally:
+        app.dependency_overrides.pop(get_session, None)
+
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "HIT"